@@ -51,6 +51,9 @@ async def main():
             cr: CaptchaResponse = agent.cr_list[-1]
             print(json.dumps(cr.model_dump(by_alias=True), indent=2, ensure_ascii=False))
 
+        # Release the AI providers' HTTP clients once the agent is no longer needed
+        await agent.aclose()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
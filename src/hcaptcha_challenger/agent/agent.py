@@ -1,15 +1,59 @@
 # -*- coding: utf-8 -*-
 import asyncio
+import random
+import sys
 import time
-from typing import List
+from typing import Any, List, Optional, Tuple
 from contextlib import suppress
-from playwright.async_api import Page
+from playwright.async_api import Error as PlaywrightError, Page
 
 from hcaptcha_challenger.models import ChallengeSignal, ChallengeTypeEnum, RequestType
 from hcaptcha_challenger.agent.config import AgentConfig, SolveState
-from hcaptcha_challenger.agent.logger import LoggerHelper, log_captcha_payload, log_method_call
+from hcaptcha_challenger.agent.logger import LoggerHelper, flush_logs, log_captcha_payload, log_method_call
 from .robotic_arm import RoboticArm
 
+
+# Lê o token de sucesso numa única ida ao navegador
+_READ_TOKEN_JS = "() => document.querySelector('[name=\"h-captcha-response\"]')?.value"
+
+# Estados que encerram o laço principal
+_TERMINAL_STATES = frozenset({SolveState.SUCCESS, SolveState.FAILURE})
+
+# Iframe do hCaptcha que indica que o widget voltou a ser montado após um reload
+_HCAPTCHA_IFRAME_SELECTOR = "iframe[src*='hcaptcha.com/captcha/v1/']"
+
+
+async def _run_with_timeout(aw, seconds: float):
+    """
+    Aguarda `aw` com prazo máximo de `seconds`.
+    No Python 3.11+ usa `asyncio.timeout`, que reaproveita a task atual em vez de
+    criar uma task auxiliar como `asyncio.wait_for`.
+    """
+    if sys.version_info >= (3, 11):
+        async with asyncio.timeout(seconds):
+            return await aw
+    return await asyncio.wait_for(aw, timeout=seconds)
+
+
+def _drain_queue(q: asyncio.Queue) -> None:
+    """
+    Esvazia a fila de uma só vez, sem pagar um get_nowait() por item.
+    Cai no laço tradicional caso os atributos internos do asyncio.Queue mudem.
+    """
+    try:
+        if not q._queue:  # type: ignore[attr-defined]
+            return
+        q._queue.clear()  # type: ignore[attr-defined]
+        q._unfinished_tasks = 0  # type: ignore[attr-defined]
+        q._finished.set()  # type: ignore[attr-defined]
+    except AttributeError:
+        while not q.empty():
+            try:
+                q.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+
+
 class AgentV:
     """
     Agente principal que gerencia o fluxo completo de resolução do hCaptcha.
@@ -31,16 +75,172 @@ class AgentV:
         # Lista de respostas válidas
         self.cr_list: List = []
 
+        # Gerador próprio para o jitter do backoff entre tentativas
+        self._rng = random.Random()
+
+        # Tabela de despacho: cada handler devolve o próximo estado.
+        # CHALLENGING só é visto se um fluxo for interrompido; retoma como pendente.
+        self._handlers = {
+            SolveState.INIT: self._handle_pending,
+            SolveState.CHALLENGE_PENDING: self._handle_pending,
+            SolveState.CHALLENGING: self._handle_pending,
+            SolveState.SUBMITTED: self._handle_submitted,
+        }
+
+    async def aclose(self):
+        """Libera os clientes HTTP dos provedores de IA. Chame ao encerrar o uso do agente."""
+        await self.arm.aclose()
+        flush_logs()
+
+    async def __aenter__(self) -> "AgentV":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _reset_queues(self):
+        """Descarta respostas e payloads pendentes de uma sessão anterior."""
+        _drain_queue(self.core.captcha_response_queue)
+        _drain_queue(self.core.captcha_payload_queue)
+
+    def _reset_response_queue(self):
+        """Descarta respostas pendentes antes de uma nova tentativa."""
+        _drain_queue(self.core.captcha_response_queue)
+
     async def _check_ignore_list(self):
         """Verifica se o desafio está na lista de ignore (Python 3.8+ compatible)."""
-        if self.config.ignore_request_questions and self.arm.captcha_payload:
-            for q in self.config.ignore_request_questions:
-                if q in self.arm.captcha_payload.get_requester_question():
-                    await asyncio.sleep(2)
-                    await self.arm.navigation.refresh_challenge()
-                    return False
+        ignore_questions = self.config.ignore_questions
+        if ignore_questions and self.arm.captcha_payload:
+            question = self.arm.captcha_payload.get_requester_question()
+            if any(q in question for q in ignore_questions):
+                await asyncio.sleep(2)
+                await self.arm.navigation.refresh_challenge()
+                return False
         return True
 
+    async def _retry_backoff(self):
+        """
+        Backoff exponencial com "full jitter" antes de uma nova tentativa:
+        espalha os retries de agentes concorrentes em vez de martelar o hCaptcha
+        todos ao mesmo tempo.
+        """
+        ceiling = min(
+            self.config.RETRY_BACKOFF_CAP,
+            self.config.RETRY_BACKOFF_BASE * (1 << min(self.reset_count, 4)),
+        )
+        await asyncio.sleep(self._rng.uniform(0, ceiling))
+
+    async def _await_page_ready(self, timeout: float = 4.0):
+        """
+        Aguarda o DOM e o iframe do hCaptcha após um reload, em vez de dormir
+        um tempo fixo. Estoura silenciosamente: o fluxo seguinte já lida com
+        um widget ausente.
+        """
+        with suppress(PlaywrightError):
+            await self.page.wait_for_load_state("domcontentloaded", timeout=timeout * 1000)
+            await self.page.locator(_HCAPTCHA_IFRAME_SELECTOR).first.wait_for(
+                state="attached", timeout=timeout * 1000
+            )
+
+    async def _await_verdict(self) -> Optional[Tuple[str, Any]]:
+        """
+        Aguarda o veredito usando o Event compartilhado do core, em vez de
+        disputar duas tasks de Queue.get().
+        Retorna ("response", CaptchaResponse) ou ("payload", CaptchaPayload),
+        ou None se nada chegar dentro de RESPONSE_TIMEOUT.
+        """
+        responses = self.core.captcha_response_queue
+        payloads = self.core.captcha_payload_queue
+        event = self.core.verdict_event
+        deadline = time.monotonic() + self.config.RESPONSE_TIMEOUT
+
+        while True:
+            if not responses.empty():
+                return "response", responses.get_nowait()
+            if not payloads.empty():
+                return "payload", payloads.get_nowait()
+
+            # Sem await entre a checagem e o clear: nenhum put pode se perder aqui
+            event.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                await _run_with_timeout(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+
+    async def _handle_pending(self) -> SolveState:
+        """Estados INIT/CHALLENGE_PENDING: resolve o desafio e decide o próximo estado."""
+        # Limpar fila de respostas
+        self._reset_response_queue()
+
+        # Log do payload se disponível (Soul Alignment)
+        if self.arm.captcha_payload:
+            log_captcha_payload(self.arm.captcha_payload)
+
+        # Resolver o captcha
+        try:
+            timeout_seconds = 120
+            result = await _run_with_timeout(self._solve_captcha_flow(), timeout_seconds)
+            if result:
+                return SolveState.SUBMITTED
+
+            self.reset_count += 1
+            if self.reset_count > self.config.MAX_RESETS:
+                LoggerHelper.log_error(f"Limite de resets ({self.config.MAX_RESETS})", emoji='boom')
+                return SolveState.FAILURE
+
+            LoggerHelper.log_warning(f"Tentativa {self.reset_count}/{self.config.MAX_RESETS} falhou.", emoji='refresh')
+            await self._retry_backoff()
+            await self.page.reload(wait_until="domcontentloaded")
+            await self._await_page_ready()
+            try:
+                await self.arm.actions.click_checkbox()
+            except PlaywrightError:
+                pass
+            return SolveState.INIT
+        except asyncio.TimeoutError:
+            LoggerHelper.log_warning("Timeout na resolução. Reiniciando...", emoji='refresh')
+        except Exception as err:
+            LoggerHelper.log_error(f"Erro crítico: {err}")
+
+        await self._retry_backoff()
+        await self.page.reload(wait_until="domcontentloaded")
+        await self._await_page_ready()
+        return SolveState.INIT
+
+    async def _handle_submitted(self) -> SolveState:
+        """Estado SUBMITTED: aguarda o veredito do hCaptcha ou uma nova rodada."""
+        LoggerHelper.log_info("Aguardando veredito do hCaptcha...", emoji='hourglass')
+
+        # Aguardar resposta ou novo payload
+        try:
+            verdict = await self._await_verdict()
+            if verdict is None:
+                return SolveState.FAILURE
+
+            kind, item = verdict
+            if kind == "payload":
+                # Novo payload recebido (outra rodada)
+                self.reset_count += 1
+                if self.reset_count > self.config.MAX_RESETS:
+                    return SolveState.FAILURE
+                self.arm.captcha_payload = item
+                return SolveState.CHALLENGE_PENDING
+
+            cr = item
+            if cr and cr.is_pass:
+                self.core.cache_validated_response(cr)
+                return SolveState.SUCCESS
+            if self.config.RETRY_ON_FAILURE:
+                await self._retry_backoff()
+                return SolveState.INIT
+            return SolveState.FAILURE
+
+        except Exception:
+            return SolveState.FAILURE
+
     @log_method_call(emoji='🚀', color='green')
     async def wait_for_challenge(self) -> ChallengeSignal:
         """
@@ -53,19 +253,23 @@ class AgentV:
         self.challenge_attempts = 0
         self.last_payload = None
         
+        # Atalho: token aprovado ainda presente e não consumido no widget desta página.
+        # Verificado antes de limpar as filas: um payload que acabou de chegar invalida o atalho
+        start_time_total = time.monotonic()
+        if await self.core.take_fresh_cached_response():
+            LoggerHelper.log_success("Token recente ainda válido, reaproveitando.", emoji='key')
+            tracker = self.arm.challenges.get_tracker()
+            tracker.start_challenge("Token reaproveitado")
+            tracker.print_summary()
+            self.metrics.log_challenge_result(True, time.monotonic() - start_time_total)
+            return ChallengeSignal.SUCCESS
+
         # Soul Alignment: Resetar payload do braço robótico para evitar vazamento entre sessões
         self.arm.captcha_payload = None
         
         # Limpar filas (Portabilidade Premium: Garante que não há lixo radioativo no pipeline)
-        while not self.core.captcha_response_queue.empty():
-            try: self.core.captcha_response_queue.get_nowait()
-            except: break
-            
-        while not self.core.captcha_payload_queue.empty():
-            try: self.core.captcha_payload_queue.get_nowait()
-            except: break
+        self._reset_queues()
         
-        start_time_total = time.time()
         LoggerHelper.log_info("🚀 INICIANDO NOVA SESSÃO (Estado resetado)", emoji='🔄')
         
         # DEBUG: Verificar integridade da sessão
@@ -76,110 +280,24 @@ class AgentV:
             LoggerHelper.log_error("Bypass impossível: Captcha não detectado!", emoji='skull')
             return ChallengeSignal.FAILURE
         
-        while self.state not in [SolveState.SUCCESS, SolveState.FAILURE]:
-            self.challenge_attempts += 1
-            if self.challenge_attempts > self.config.MAX_CHALLENGE_ATTEMPTS:
-                LoggerHelper.log_error(f"Limite de tentativas ({self.config.MAX_CHALLENGE_ATTEMPTS})", emoji='boom')
-                self.state = SolveState.FAILURE
-                break
-
-            if self.state in [SolveState.INIT, SolveState.CHALLENGE_PENDING]:
-                # Limpar fila de respostas
-                while not self.core.captcha_response_queue.empty():
-                    self.core.captcha_response_queue.get_nowait()
-                
-                # Log do payload se disponível (Soul Alignment)
-                if self.arm.captcha_payload:
-                    log_captcha_payload(self.arm.captcha_payload)
-                
-                # Resolver o captcha
-                try:
-                    timeout_seconds = 120
-                    result = await asyncio.wait_for(self._solve_captcha_flow(), timeout=timeout_seconds)
-                    if result:
-                        self.state = SolveState.SUBMITTED
-                    else:
-                        self.reset_count += 1
-                        if self.reset_count > self.config.MAX_RESETS:
-                            LoggerHelper.log_error(f"Limite de resets ({self.config.MAX_RESETS})", emoji='boom')
-                            self.state = SolveState.FAILURE
-                            continue
-                        
-                        LoggerHelper.log_warning(f"Tentativa {self.reset_count}/{self.config.MAX_RESETS} falhou.", emoji='refresh')
-                        await self.page.reload()
-                        await asyncio.sleep(2)
-                        try:
-                            await self.arm.actions.click_checkbox()
-                        except:
-                            pass
-                        self.state = SolveState.INIT
-                        continue
-                except asyncio.TimeoutError:
-                    LoggerHelper.log_warning("Timeout na resolução. Reiniciando...", emoji='refresh')
-                    await self.page.reload()
-                    await asyncio.sleep(2)
-                    self.state = SolveState.INIT
-                    continue
-                except Exception as err:
-                    LoggerHelper.log_error(f"Erro crítico: {err}")
-                    await self.page.reload()
-                    await asyncio.sleep(2)
-                    self.state = SolveState.INIT
-                    continue
-            
-            if self.state == SolveState.SUBMITTED:
-                LoggerHelper.log_info("Aguardando veredito do hCaptcha...", emoji='hourglass')
-                
-                # Aguardar resposta ou novo payload
-                res_task = asyncio.create_task(self.core.captcha_response_queue.get())
-                pay_task = asyncio.create_task(self.core.captcha_payload_queue.get())
-                
-                try:
-                    done, pending = await asyncio.wait(
-                        [res_task, pay_task], 
-                        timeout=self.config.RESPONSE_TIMEOUT, 
-                        return_when=asyncio.FIRST_COMPLETED
-                    )
-                    
-                    for t in pending: 
-                        t.cancel()
-                    
-                    if not done:
-                        self.state = SolveState.FAILURE
-                        continue
-                    
-                    if pay_task in done:
-                        # Novo payload recebido (outra rodada)
-                        self.reset_count += 1
-                        if self.reset_count > self.config.MAX_RESETS:
-                            self.state = SolveState.FAILURE
-                        else:
-                            self.arm.captcha_payload = pay_task.result()
-                            self.state = SolveState.CHALLENGE_PENDING
-                        continue
-                    
-                    if res_task in done:
-                        cr = res_task.result()
-                        if cr and cr.is_pass:
-                            self.core.cache_validated_response(cr)
-                            self.state = SolveState.SUCCESS
-                        else:
-                            if self.config.RETRY_ON_FAILURE:
-                                await asyncio.sleep(2)
-                                self.state = SolveState.INIT
-                            else:
-                                self.state = SolveState.FAILURE
-                
-                except Exception:
+        try:
+            while self.state not in _TERMINAL_STATES:
+                self.challenge_attempts += 1
+                if self.challenge_attempts > self.config.MAX_CHALLENGE_ATTEMPTS:
+                    LoggerHelper.log_error(f"Limite de tentativas ({self.config.MAX_CHALLENGE_ATTEMPTS})", emoji='boom')
                     self.state = SolveState.FAILURE
+                    break
+
+                self.state = await self._handlers[self.state]()
+        finally:
+            # Cancelamento no meio de um round não pode deixar a barra Live presa no terminal
+            LoggerHelper.end_step()
+
+        duration = time.monotonic() - start_time_total
         
-        duration = time.time() - start_time_total
-        
-        if self.state == SolveState.SUCCESS:
+        if self.state is SolveState.SUCCESS:
             # Obter token de sucesso
-            token = await self.page.evaluate(
-                "() => document.querySelector('[name=\"h-captcha-response\"]')?.value"
-            )
+            token = await self.page.evaluate(_READ_TOKEN_JS)
             if token:
                 LoggerHelper.log_success(f"Bypass confirmado! Token: {token[:24]}...", emoji='key')
             
@@ -206,7 +324,7 @@ class AgentV:
         Fluxo principal de resolução.
         Combina review_challenge_type e solve_captcha do original.
         """
-        start_time = time.time()
+        start_time = time.monotonic()
         # 1. Determinar tipo de desafio
         challenge_type = await self.core.review_challenge_type()
         if not challenge_type:
@@ -232,10 +350,7 @@ class AgentV:
         # 3. Verificar ignore list (Python 3.8+ compatible)
         try:
             # Timeout de 5 segundos para verificação de ignore list
-            should_continue = await asyncio.wait_for(
-                self._check_ignore_list(),
-                timeout=5.0
-            )
+            should_continue = await _run_with_timeout(self._check_ignore_list(), 5.0)
             if not should_continue:
                 return False
         except asyncio.TimeoutError:
@@ -246,7 +361,7 @@ class AgentV:
             await self.core.solve_captcha(challenge_type)
             return True
         except Exception as err:
-            duration = time.time() - start_time
+            duration = time.monotonic() - start_time
             LoggerHelper.log_error(f"Fluxo interrompido ({duration:.1f}s): {err}")
             return False
 
@@ -4,18 +4,17 @@ import re
 import time
 from asyncio import Queue
 from contextlib import suppress
-from datetime import datetime
 from pathlib import Path
 from typing import List, Tuple
 
 import httpx
-import msgpack
 from loguru import logger
 from playwright.async_api import Page, Response, Locator, TimeoutError, expect
 from pydantic import Field, BaseModel
 
+from hcaptcha_challenger.agent.pilot.core import hsw_decode
 from hcaptcha_challenger.models import RequestType, CaptchaPayload, CaptchaResponse
-from hcaptcha_challenger.utils import SiteKey
+from hcaptcha_challenger.utils import SiteKey, loads_msgpack, timestamp_key
 
 
 class CollectorConfig(BaseModel):
@@ -173,26 +172,10 @@ class Collector:
                 )
 
                 if has_hsw:
-                    result = await self.page.evaluate(
-                        f"""
-                        async () => {{
-                            const byteArray = new Uint8Array({list(raw_data)});
-                            console.log('Data has been converted to Uint8Array, length:', byteArray.length);
-
-                            try {{
-                                const hswResult = await hsw(0, byteArray);
-                                return Array.from(hswResult);
-                            }} catch (e) {{
-                                return {{error: e.toString()}};
-                            }}
-                        }}
-                        """
-                    )
-
-                    if isinstance(result, list) and not any(
-                        isinstance(x, dict) and "error" in x for x in result
-                    ):
-                        unpacked_data = msgpack.unpackb(bytes(result))
+                    decoded = await hsw_decode(self.page, raw_data)
+
+                    if decoded is not None:
+                        unpacked_data = loads_msgpack(decoded)
                         captcha_payload = CaptchaPayload(**unpacked_data)
                         self._captcha_payload_queue.put_nowait(captcha_payload)
                         return
@@ -214,11 +197,10 @@ class Collector:
         """
         request_type = captcha_payload.request_type.value
         prompt = captcha_payload.get_requester_question()
-        current_datetime = datetime.now()
-        current_time = current_datetime.strftime("%Y%m%d/%Y%m%d%H%M%S%f")
+        current_time = timestamp_key()
 
         cache_key = self.config.dataset_dir.joinpath(request_type, prompt, current_time)
-        crt = current_datetime.strftime("%Y%m%d%H%M%S%f")
+        crt = current_time.rpartition("/")[2]
 
         return crt, cache_key
 
@@ -1,8 +1,11 @@
+import atexit
 import os
+import queue
+import threading
 from enum import Enum
 from pathlib import Path
-from typing import Any, List, Tuple, Union
-from pydantic import Field, field_validator, SecretStr
+from typing import Any, Dict, List, Tuple, Union
+from pydantic import Field, PrivateAttr, field_validator, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from hcaptcha_challenger.models import (
     RequestType,
@@ -16,12 +19,69 @@ from hcaptcha_challenger.models import (
     CaptchaPayload,
     INV
 )
+from hcaptcha_challenger.utils import dumps_json, timestamp_key, zstandard
 
 VERSION = "0.20.0"
 
 SINGLE_IGNORE_TYPE = Union[IGNORE_REQUEST_TYPE_LITERAL, RequestType, ChallengeTypeEnum]
 IGNORE_REQUEST_TYPE_LIST = List[SINGLE_IGNORE_TYPE]
 
+# Tabela de remoção dos caracteres proibidos em nomes de diretórios (INV é constante)
+_PROMPT_SANITIZE_TRANS = str.maketrans("", "", "".join(INV))
+# Prompts ASCII (o caso comum) seguem pelo bytes.translate, implementado em C sem tabela de mapeamento
+_PROMPT_SANITIZE_ASCII = "".join(ch for ch in INV if ord(ch) < 128).encode("ascii")
+
+# Escritor em segundo plano para o JSON do payload: o disco não bloqueia o fluxo do desafio
+_payload_write_queue: "queue.SimpleQueue[Tuple[Path, Any] | None]" = queue.SimpleQueue()
+_payload_writer: threading.Thread | None = None
+_payload_writer_lock = threading.Lock()
+
+
+def _payload_writer_loop():
+    for payload_path, payload_data in iter(_payload_write_queue.get, None):
+        try:
+            payload_path.parent.mkdir(parents=True, exist_ok=True)
+            if not isinstance(payload_data, bytes):
+                payload_data = dumps_json(payload_data)
+            payload_path.write_bytes(payload_data)
+        except Exception:
+            pass
+
+
+def _stop_payload_writer():
+    """Sinaliza o fim da fila e aguarda as escritas pendentes na saída do processo."""
+    if _payload_writer is not None:
+        _payload_write_queue.put(None)
+        _payload_writer.join(timeout=5)
+
+
+def _payload_json(captcha_payload: CaptchaPayload) -> bytes:
+    """Serializa o payload uma única vez e reaproveita o resultado nas rodadas seguintes."""
+    dump = captcha_payload._cached_json
+    if dump is None:
+        dump = dumps_json(captcha_payload.model_dump(mode="json"))
+        captcha_payload._cached_json = dump
+    return dump
+
+
+def _submit_payload_write(payload_path: Path, payload_data: Any):
+    global _payload_writer
+    if _payload_writer is None:
+        with _payload_writer_lock:
+            if _payload_writer is None:
+                _payload_writer = threading.Thread(
+                    target=_payload_writer_loop, name="hc-payload-writer", daemon=True
+                )
+                _payload_writer.start()
+                atexit.register(_stop_payload_writer)
+    _payload_write_queue.put((payload_path, payload_data))
+
+
+def _parse_keys(raw: str) -> List[str]:
+    """Split a comma-separated key string in a single pass, dropping blanks."""
+    return [k for k in (s.strip() for s in raw.split(",")) if k]
+
+
 class SolveState(Enum):
     INIT = "init"
     CHALLENGE_PENDING = "challenge_pending"
@@ -31,7 +91,7 @@ class SolveState(Enum):
     FAILURE = "failure"
 
 class AgentConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_file=".env", env_ignore_empty=True, extra="ignore")
+    model_config = SettingsConfigDict(env_file=".env", env_ignore_empty=True, extra="ignore", frozen=True)
 
     GEMINI_API_KEYS: Any = Field(
         default=None,
@@ -53,6 +113,10 @@ class AgentConfig(BaseSettings):
     cache_dir: Path = Path("tmp/.cache")
     challenge_dir: Path = Path("tmp/.challenge")
     captcha_response_dir: Path = Path("tmp/.captcha")
+    compress_captcha_responses: bool = Field(
+        default=False,
+        description="Store validated tokens as zstd-compressed `.json.zst` files (requires zstandard)",
+    )
     ignore_request_types: IGNORE_REQUEST_TYPE_LIST | None = Field(default_factory=list)
     ignore_request_questions: List[str] | None = Field(default_factory=list)
 
@@ -99,6 +163,14 @@ class AgentConfig(BaseSettings):
     RETRY_ON_FAILURE: bool = Field(
         default=True, description="Re-execute the challenge when it fails"
     )
+    RETRY_BACKOFF_BASE: float = Field(
+        default=0.5,
+        description="Base delay of the exponential backoff between retries [unit: second]",
+    )
+    RETRY_BACKOFF_CAP: float = Field(
+        default=8.0,
+        description="Upper bound of the (fully jittered) backoff between retries [unit: second]",
+    )
     WAIT_FOR_CHALLENGE_VIEW_TO_RENDER_MS: int = Field(
         default=1500,
         description="When your local network is poor, increase this value appropriately [unit: millisecond]",
@@ -137,6 +209,16 @@ class AgentConfig(BaseSettings):
     )
     skills_update_branch: str = Field(default="main", description="GitHub branch for skills update")
 
+    _ignore_questions_tuple: Tuple[str, ...] = PrivateAttr(default=())
+    _key_index: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, context: Any, /) -> None:
+        self._ignore_questions_tuple = tuple(self.ignore_request_questions or ())
+        # Posição (1-based) de cada chave Gemini, para os logs de erro sem varrer a lista
+        for i, k in enumerate(self.GEMINI_API_KEYS or (), start=1):
+            val = k.get_secret_value() if hasattr(k, "get_secret_value") else str(k)
+            self._key_index.setdefault(val, i)
+
     @field_validator('GEMINI_API_KEYS', mode="before")
     @classmethod
     def validate_api_keys(cls, v: Any) -> List[SecretStr]:
@@ -145,28 +227,41 @@ class AgentConfig(BaseSettings):
         Supports comma-separated strings (from env) or lists.
         """
         # 1. Handle string input (e.g. from environment variable)
-        if isinstance(v, str):
-            v = [k.strip() for k in v.split(",") if k.strip()]
-        
+        keys = _parse_keys(v) if isinstance(v, str) else (v or [])
+
         # 2. Fallback to environment variables if still empty
-        if not v:
-            env_keys = os.environ.get("GEMINI_API_KEYS", "")
-            if env_keys:
-                v = [k.strip() for k in env_keys.split(",") if k.strip()]
-            else:
-                single_key = os.environ.get("GEMINI_API_KEY")
-                if single_key:
-                    v = [single_key]
-        
+        if not keys:
+            keys = _parse_keys(os.environ.get("GEMINI_API_KEYS", ""))
+        if not keys:
+            single_key = os.environ.get("GEMINI_API_KEY")
+            if single_key:
+                keys = [single_key]
+
         # 3. Final validation
-        if not v:
+        if not keys:
             raise ValueError(
                 "GEMINI_API_KEYS is required but not provided. "
                 "Please set the GEMINI_API_KEYS (comma-separated) or GEMINI_API_KEY environment variable."
             )
             
         # 4. Ensure everything is a SecretStr
-        return [SecretStr(k) if isinstance(k, str) else k for k in v]
+        return [SecretStr(k) if isinstance(k, str) else k for k in keys]
+
+    @field_validator("compress_captcha_responses")
+    @classmethod
+    def validate_compress_captcha_responses(cls, v: bool) -> bool:
+        if v and zstandard is None:
+            raise ValueError("compress_captcha_responses requires the zstandard package")
+        return v
+
+    @property
+    def ignore_questions(self) -> Tuple[str, ...]:
+        """Padrões de `ignore_request_questions` já normalizados para tupla."""
+        return self._ignore_questions_tuple
+
+    def key_position(self, key: str) -> int:
+        """Posição 1-based da chave em GEMINI_API_KEYS (1 quando desconhecida)."""
+        return self._key_index.get(key, 1)
 
     @property
     def spatial_grid_cache(self):
@@ -182,15 +277,14 @@ class AgentConfig(BaseSettings):
         Cria uma chave de cache estruturada e descritiva.
         Portado das linhas 231-278 do baseline original.
         """
-        import json
-        from datetime import datetime
-        
-        current_datetime = datetime.now()
         # Formato: 20240108/20240108185504123456
-        current_time = current_datetime.strftime("%Y%m%d/%Y%m%d%H%M%S%f")
+        current_time = timestamp_key()
 
         # Limpar o prompt para ser usado em nomes de diretórios
-        prompt = prompt.translate(str.maketrans("", "", "".join(INV)))
+        if prompt.isascii():
+            prompt = prompt.encode("ascii").translate(None, _PROMPT_SANITIZE_ASCII).decode("ascii")
+        else:
+            prompt = prompt.translate(_PROMPT_SANITIZE_TRANS)
 
         if not captcha_payload:
             cache_key = self.challenge_dir.joinpath(request_type, prompt, current_time)
@@ -201,18 +295,13 @@ class AgentConfig(BaseSettings):
         question = captcha_payload.get_requester_question()
         
         # Estrutura: tmp/.challenge / request_type / prompt / current_time
-        cache_key = self.challenge_dir.joinpath(job_type, question, current_time)
+        cache_key = self.challenge_dir / job_type / question / current_time
 
         try:
             # Salvar o payload original para depuração (Soul Alignment)
-            payload_path = cache_key.joinpath(f"{cache_key.name}_captcha.json")
-            payload_path.parent.mkdir(parents=True, exist_ok=True)
-
-            payload_data = captcha_payload.model_dump(mode="json")
-            payload_path.write_text(
-                json.dumps(payload_data, indent=2, ensure_ascii=False), 
-                encoding="utf8"
-            )
+            # A escrita acontece na thread de segundo plano; o JSON é memoizado no payload
+            payload_path = cache_key / f"{current_time.rsplit('/', 1)[-1]}_captcha.json"
+            _submit_payload_write(payload_path, _payload_json(captcha_payload))
         except Exception:
             pass
 
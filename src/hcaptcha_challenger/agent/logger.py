@@ -1,7 +1,18 @@
+import asyncio
+import atexit
+import functools
+import math
 import os
-import json
+import queue
+import re
+import sys
+import threading
 import time
-from typing import Any, List, Dict
+import traceback
+from array import array
+from bisect import bisect_left
+from types import MappingProxyType
+from typing import Any, Callable, List, Dict, Literal, Tuple
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
@@ -10,6 +21,17 @@ from rich.theme import Theme
 from rich.box import ROUNDED
 from rich.progress import Progress, BarColumn, TextColumn, SpinnerColumn
 
+from hcaptcha_challenger.utils import dumps_json
+
+# Log level gate (HC_LOG_LEVEL=DEBUG|INFO|WARNING|ERROR), parsed once at import
+_DEBUG, _INFO, _WARNING, _ERROR = 10, 20, 30, 40
+_LEVEL = {"DEBUG": _DEBUG, "INFO": _INFO, "WARNING": _WARNING, "ERROR": _ERROR}.get(
+    os.getenv("HC_LOG_LEVEL", "INFO").strip().upper(), _INFO
+)
+
+# log_method_call only instruments methods when HC_TRACE=1
+_TRACE = os.getenv("HC_TRACE") == "1"
+
 # Force terminal colors if the environment variable is set
 force_color = os.getenv("FORCE_COLOR") == "1"
 
@@ -26,22 +48,222 @@ custom_theme = Theme({
     "network": "cyan"
 })
 
-console = Console(theme=custom_theme, force_terminal=force_color if force_color else None)
+# Background writer: callers only enqueue, a single daemon thread renders and writes to stdout
+_log_queue: "queue.SimpleQueue[Tuple[Callable, tuple, dict] | None]" = queue.SimpleQueue()
+_log_writer: threading.Thread | None = None
+_log_writer_lock = threading.Lock()
+
+
+def _log_writer_loop():
+    while True:
+        batch = [_log_queue.get()]
+        while True:
+            try:
+                batch.append(_log_queue.get_nowait())
+            except queue.Empty:
+                break
+        # flush_logs() markers are released only once the batch has reached stdout
+        flushed: List[threading.Event] = []
+        # The whole batch is rendered inside one console buffer, so a burst of
+        # log lines reaches stdout in a single write + flush.
+        with console:
+            for item in batch:
+                if item is None:
+                    return
+                if isinstance(item, threading.Event):
+                    flushed.append(item)
+                    continue
+                fn, args, kwargs = item
+                try:
+                    fn(*args, **kwargs)
+                except Exception:
+                    # Never let one bad record kill the writer, but do not lose it silently either
+                    try:
+                        traceback.print_exc(file=sys.__stderr__)
+                    except Exception:
+                        pass
+        for done in flushed:
+            done.set()
+
+
+def flush_logs(timeout: float = 5.0) -> None:
+    """Block until every log line queued so far has been written to stdout."""
+    writer = _log_writer
+    if writer is None or threading.current_thread() is writer or not writer.is_alive():
+        return
+    done = threading.Event()
+    _log_queue.put_nowait(done)
+    done.wait(timeout)
+
+
+def _flush_logs_first(hook: Callable) -> Callable:
+    """Wrap an excepthook so the log lines leading up to a crash print before its traceback."""
+
+    @functools.wraps(hook)
+    def wrapper(*args):
+        flush_logs()
+        hook(*args)
+
+    return wrapper
+
+
+def _stop_log_writer():
+    """Flush pending log lines and stop the writer thread at interpreter exit."""
+    if _log_writer is not None:
+        _log_queue.put(None)
+        _log_writer.join(timeout=5)
+
+
+def _submit_log(fn: Callable, *args: Any, **kwargs: Any):
+    """Run `fn` on the log writer thread, in order with every queued print."""
+    _ensure_log_writer()
+    _log_queue.put_nowait((fn, args, kwargs))
+
+
+def _ensure_log_writer():
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                _log_writer = threading.Thread(
+                    target=_log_writer_loop, name="hc-log-writer", daemon=True
+                )
+                _log_writer.start()
+                atexit.register(_stop_log_writer)
+                sys.excepthook = _flush_logs_first(sys.excepthook)
+                threading.excepthook = _flush_logs_first(threading.excepthook)
+
+
+def _print_json(json_str: str, title: str | None):
+    syntax = Syntax(json_str, "json", theme="monokai", line_numbers=False)
+    if title:
+        console.print(Panel(syntax, title=title, border_style="blue", box=ROUNDED))
+    else:
+        console.print(syntax)
+
+
+class BufferedConsole(Console):
+    """
+    Console that accumulates markup fragments via write() and renders them
+    with a single print() on writeln(), so multi-part log events pay for one
+    markup parse / ANSI render instead of one per fragment.
+
+    print() itself only enqueues: rendering happens on the background writer
+    thread, keeping stdout syscalls off the event loop while preserving order.
+    print_now() is the synchronous path for errors: queued lines first, then the
+    message itself before returning, so it survives a crash right after.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # write()/writeln() fragments, one buffer per thread
+        self._fragments = threading.local()
+
+    def print(self, *objects: Any, **kwargs: Any) -> None:
+        # Rich internals (e.g. Live refresh) print from the writer thread itself
+        if threading.current_thread() is _log_writer:
+            Console.print(self, *objects, **kwargs)
+        else:
+            _submit_log(Console.print, self, *objects, **kwargs)
+
+    def print_now(self, *objects: Any, **kwargs: Any) -> None:
+        flush_logs()
+        Console.print(self, *objects, **kwargs)
+
+    def _line_buffer(self) -> List[str]:
+        buffer = getattr(self._fragments, "buffer", None)
+        if buffer is None:
+            buffer = self._fragments.buffer = []
+        return buffer
+
+    def write(self, text: str) -> None:
+        self._line_buffer().append(text)
+
+    def writeln(self, text: str = "", **kwargs) -> None:
+        buffer = self._line_buffer()
+        if text:
+            buffer.append(text)
+        buffered = "".join(buffer)
+        buffer.clear()
+        self.print(buffered, **kwargs)
+
+
+console = BufferedConsole(theme=custom_theme, force_terminal=force_color if force_color else None)
+
+# Quota errors and their suggested retry delay, for log_provider_error
+_QUOTA_MARKERS = ("429", "quota", "exhausted")
+_SERVER_MARKERS = ("500", "internal")
+_RETRY_RE = re.compile(r"retry in (\d+\.?\d*)s|retryDelay':\s*'(\d+)s'")
+
+
+def classify_error(exc: BaseException) -> Literal["quota", "server", "timeout", "other"]:
+    """
+    Kind of a provider error, from its HTTP status when the exception carries one
+    (google-genai `code`, httpx `response.status_code`). Only exceptions without a
+    status fall back to scanning the message. A tenacity RetryError is classified by
+    the exception of its last attempt.
+    """
+    last_attempt = getattr(exc, "last_attempt", None)
+    if last_attempt is not None and (inner := last_attempt.exception()) is not None:
+        return classify_error(inner)
+    code = getattr(exc, "code", None)
+    if not isinstance(code, int):
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(code, int):
+        if code == 429:
+            return "quota"
+        return "server" if code >= 500 else "other"
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    lowered = str(exc).lower()
+    if any(marker in lowered for marker in _QUOTA_MARKERS):
+        return "quota"
+    if any(marker in lowered for marker in _SERVER_MARKERS):
+        return "server"
+    return "timeout" if "timeout" in lowered else "other"
+
+
+# log_ai_performance tiers: (<=15s], (15s, 30s], (>30s) -> (style, icon, label)
+_AI_BUCKETS = (15.0, 30.0)
+_AI_LABELS = (
+    ("ai_fast", "⚡", "Rápido"),
+    ("warning", "🐢", "Lento"),
+    ("ai_slow", "🐌", "EXTREMAMENTE LENTO"),
+)
+
+# Mouse action icons and labels for log_mouse_action
+_MOUSE_EMOJI = MappingProxyType({
+    "click": "🖱️",
+    "move": "↗️",
+    "drag": "🔀",
+    "hover": "👆"
+})
+_MOUSE_ACTION_TEXT = MappingProxyType({action: action.upper() for action in _MOUSE_EMOJI})
+
+# Progress bars for log_step, one per 5% bucket
+_BARS = tuple("█" * i + "░" * (20 - i) for i in range(21))
 
 class NetworkLogger:
     """Aggregates repetitive background task logs into summaries"""
     
+    # Clock is only sampled once every 16 requests (request_count & 0xF == 0)
+    _SAMPLE_MASK = 0xF
+
     def __init__(self, interval_seconds: float = 5.0):
         self.interval = interval_seconds
+        self.interval_ns = int(interval_seconds * 1e9)
         self.request_count = 0
-        self.last_log_time = time.time()
+        self.last_log_ns = time.monotonic_ns()
         self.active = True
 
     def log_request(self):
         self.request_count += 1
-        now = time.time()
-        if now - self.last_log_time >= self.interval:
-            duration = now - self.last_log_time
+        if self.request_count & self._SAMPLE_MASK:
+            return
+        now_ns = time.monotonic_ns()
+        elapsed_ns = now_ns - self.last_log_ns
+        if elapsed_ns >= self.interval_ns:
+            duration = elapsed_ns / 1e9
             reqs_per_sec = self.request_count / duration
             # Cleaner network log with no dim style or confusing ANSI sequences
             console.print(
@@ -49,38 +271,54 @@ class NetworkLogger:
                 highlight=False
             )
             self.request_count = 0
-            self.last_log_time = now
+            self.last_log_ns = now_ns
 
 class ChallengeTracker:
     """Tracks per-round and per-challenge performance metrics"""
     
     def __init__(self):
-        self.rounds: List[Dict[str, Any]] = []
+        self._reset_rounds()
         self.start_time = None
         self.challenge_name = "Desafio"
 
+    def _reset_rounds(self):
+        # Columnar storage: one compact array per field instead of a dict per round
+        self.round_nums = array("i")
+        self.success_flags = bytearray()
+        self.durations = array("d")
+        self.ai_times = array("d")
+        self.points = array("i")
+
     def start_challenge(self, name: str):
         self.challenge_name = name
         self.start_time = time.time()
-        self.rounds = []
+        self._reset_rounds()
 
     def log_round(self, round_num: int, success: bool, duration: float, ai_time: float, points: int):
-        self.rounds.append({
-            "round": round_num,
-            "success": success,
-            "duration": duration,
-            "ai_time": ai_time,
-            "points": points
-        })
+        self.round_nums.append(round_num)
+        self.success_flags.append(bool(success))
+        self.durations.append(duration)
+        self.ai_times.append(ai_time)
+        self.points.append(points)
+
+    @property
+    def rounds(self) -> List[Dict[str, Any]]:
+        """Row view of the recorded rounds, built on demand"""
+        return [
+            {"round": r, "success": bool(ok), "duration": d, "ai_time": ai, "points": p}
+            for r, ok, d, ai, p in zip(self.round_nums, self.success_flags, self.durations, self.ai_times, self.points)
+        ]
 
     def print_summary(self):
-        if not self.rounds:
+        # End of the challenge: release the in-place progress line before printing below it
+        LoggerHelper.end_step()
+        if not self.round_nums:
             return
             
         total_time = time.time() - self.start_time
-        ai_total = sum(r['ai_time'] for r in self.rounds)
-        success_count = sum(1 for r in self.rounds if r['success'])
-        success_rate = (success_count / len(self.rounds)) * 100
+        ai_total = math.fsum(self.ai_times)
+        success_count = sum(self.success_flags)
+        success_rate = (success_count / len(self.round_nums)) * 100
         
         table = Table(title=f"📊 RESUMO: {self.challenge_name}", box=ROUNDED, border_style="magenta")
         table.add_column("Round", style="cyan")
@@ -89,14 +327,14 @@ class ChallengeTracker:
         table.add_column("IA", style="dim")
         table.add_column("Pontos", style="white")
         
-        for r in self.rounds:
-            status = "[green]✅ ROUND OK[/]" if r['success'] else "[red]❌ FALHA NO ROUND[/]"
+        for r, ok, d, ai, p in zip(self.round_nums, self.success_flags, self.durations, self.ai_times, self.points):
+            status = "[green]✅ ROUND OK[/]" if ok else "[red]❌ FALHA NO ROUND[/]"
             table.add_row(
-                str(r['round']),
+                str(r),
                 status,
-                f"{r['duration']:.2f}s",
-                f"{r['ai_time']:.2f}s",
-                str(r['points'])
+                f"{d:.2f}s",
+                f"{ai:.2f}s",
+                str(p)
             )
             
         console.print(table)
@@ -143,45 +381,59 @@ class LoggerHelper:
     @staticmethod
     def log_section(title: str, style: str = "bold cyan"):
         """Prints a section header using a Panel"""
+        if _LEVEL > _INFO:
+            return
         console.print(Panel(f"[{style}]{title}[/]", border_style=style, box=ROUNDED))
 
     @staticmethod
     def log_info(message: str, emoji: str = "info"):
         """Prints an info message"""
-        icon = LoggerHelper.EMOJIS.get(emoji, emoji) or LoggerHelper.EMOJIS['info']
-        console.print(f"{icon} {message}", style="info")
+        if _LEVEL > _INFO:
+            return
+        console.print(_PREFIX[(emoji, "info")] + message, style="info")
 
     @staticmethod
     def log_warning(message: str, emoji: str = "warning"):
         """Prints a warning message"""
-        icon = LoggerHelper.EMOJIS.get(emoji, emoji) or LoggerHelper.EMOJIS['warning']
-        console.print(f"{icon} {message}", style="warning")
+        if _LEVEL > _WARNING:
+            return
+        console.print(_PREFIX[(emoji, "warning")] + message, style="warning")
 
     @staticmethod
     def log_error(message: str, emoji: str = "error"):
-        """Prints an error message"""
-        icon = LoggerHelper.EMOJIS.get(emoji, emoji) or LoggerHelper.EMOJIS['error']
-        console.print(f"{icon} {message}", style="error")
+        """Prints an error message, synchronously and after every queued line"""
+        console.print_now(_PREFIX[(emoji, "error")] + message, style="error")
+
+    @staticmethod
+    def log_debug(message: str, emoji: str = "debug"):
+        """Prints a debug message (only with HC_LOG_LEVEL=DEBUG)"""
+        if _LEVEL > _DEBUG:
+            return
+        console.print(_PREFIX[(emoji, "debug")] + message, style="dim")
 
     @staticmethod
     def log_provider_error(attempt: int, total: int, exception: Exception):
         """Log de erro de provedor (Gemini/Groq) de forma limpa sem JSON verboso"""
-        error_msg = str(exception)
-        
+        if _LEVEL > _WARNING:
+            return
+        kind = classify_error(exception)
+
         # Extrair mensagem principal se for um erro de quota/429
-        clean_msg = "Erro desconhecido"
-        if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
+        if kind == "quota":
             clean_msg = "[bold red]Limite de Quota Excedido (429)[/]"
             # Tentar extrair o tempo de espera
-            import re
-            match = re.search(r"retry in (\d+\.?\d*)s|retryDelay':\s*'(\d+)s'", error_msg)
+            match = _RETRY_RE.search(str(exception))
             if match:
                 seconds = match.group(1) or match.group(2)
                 clean_msg += f" - Aguarde [yellow]{seconds}s[/]"
-        elif "500" in error_msg:
-            clean_msg = "[bold yellow]Erro Interno do Servidor (500)[/] - Instabilidade temporária"
+        elif kind == "server":
+            code = getattr(exception, "code", None)
+            clean_msg = f"[bold yellow]Erro Interno do Servidor ({code if isinstance(code, int) else 500})[/] - Instabilidade temporária"
+        elif kind == "timeout":
+            clean_msg = "[bold yellow]Tempo limite excedido[/]"
         else:
             # Encurtar mensagens genéricas
+            error_msg = str(exception)
             clean_msg = error_msg[:100] + "..." if len(error_msg) > 100 else error_msg
 
         LoggerHelper.log_warning(
@@ -192,37 +444,57 @@ class LoggerHelper:
     @staticmethod
     def log_success(message: str, emoji: str = "success"):
         """Prints a success message"""
-        icon = LoggerHelper.EMOJIS.get(emoji, emoji) or LoggerHelper.EMOJIS['success']
-        console.print(f"{icon} {message}", style="success")
+        if _LEVEL > _INFO:
+            return
+        console.print(_PREFIX[(emoji, "success")] + message, style="success")
 
     @staticmethod
     def log_step(step: int, total: int, message: str):
-        """Prints a step progress message"""
-        percentage = (step / total) * 100
-        bar = "█" * int(percentage / 5) + "░" * (20 - int(percentage / 5))
-        console.print(f"[step]🔄 Progresso: {bar} {percentage:.0f}% (Round {step}/{total})[/] - [italic]{message}[/]")
+        """Prints a step progress message (redrawn in place on interactive terminals)"""
+        if _LEVEL > _INFO:
+            return
+        if console.is_terminal:
+            _step_progress.update(step, total, message)
+            return
+        bar = _BARS[min(max((step * 20) // total, 0), 20)]
+        percentage = round(step * 100 / total)
+        console.print(f"[step]🔄 Progresso: {bar} {percentage}% (Round {step}/{total})[/] - [italic]{message}[/]")
+
+    @staticmethod
+    def end_step():
+        """
+        Stops the in-place progress bar of log_step, e.g. when a challenge ends before its
+        last round, and waits for the queued lines: output is in order at challenge boundaries
+        """
+        if console.is_terminal:
+            _submit_log(_step_progress.stop)
+        flush_logs()
 
     @staticmethod
     def log_key_value(key: str, value: Any, emoji: str = None):
         """Prints a key-value pair"""
+        if _LEVEL > _INFO:
+            return
         icon = f"{LoggerHelper.EMOJIS.get(emoji, emoji)} " if emoji else ""
         console.print(f"{icon}[bold]{key}:[/] [highlight]{value}[/]")
 
     @staticmethod
     def log_json(data: Any, title: str = None):
         """Prints JSON data with syntax highlighting"""
-        json_str = json.dumps(data, indent=2, ensure_ascii=False)
-        syntax = Syntax(json_str, "json", theme="monokai", line_numbers=False)
-        if title:
-            console.print(Panel(syntax, title=title, border_style="blue", box=ROUNDED))
-        else:
-            console.print(syntax)
+        if _LEVEL > _INFO:
+            return
+        # Serialized here, so errors reach the caller and later mutations of `data` cannot race
+        # the writer; only the highlighting and panel rendering run on the writer thread
+        json_str = dumps_json(data).decode("utf-8")
+        _submit_log(_print_json, json_str, title)
 
     # --- Semantic Logging Methods ---
 
     @staticmethod
     def log_challenge_start(challenge_type: str, round_index: int, total_rounds: int, prompt: str = None, timeout: int = 60):
         """Log semântico para início de desafio com visual premium"""
+        if _LEVEL > _INFO:
+            return
         content = f"🔀 [bold cyan]Tipo:[/] [yellow]{challenge_type}[/]\n"
         content += f"📝 [bold magenta]Prompt:[/] [italic cyan]\"{prompt[:80]}...\"[/]\n"
         content += f"⏱️  [bold white]Tempo limite:[/] [green]{timeout}s[/]"
@@ -243,45 +515,34 @@ class LoggerHelper:
     @staticmethod
     def log_ai_performance(model: str, duration: float, points: int):
         """Log de performance da IA com contexto de velocidade e diagnósticos"""
-        if duration > 30:
-            status = "ai_slow"
-            speed_icon = LoggerHelper.EMOJIS['slow']
-            speed_text = "EXTREMAMENTE LENTO"
-        elif duration > 15:
-            status = "warning"
-            speed_icon = LoggerHelper.EMOJIS['normal']
-            speed_text = "Lento"
-        else:
-            status = "ai_fast"
-            speed_icon = LoggerHelper.EMOJIS['fast']
-            speed_text = "Rápido"
-            
-        console.print(
+        if _LEVEL > _INFO:
+            return
+        status, speed_icon, speed_text = _AI_LABELS[bisect_left(_AI_BUCKETS, duration)]
+
+        console.write(
             f"  {speed_icon} [{status}]{speed_text} IA ({model}):[/] "
             f"[bold]{duration:.2f}s[/] | "
-            f"[bold]Resultado:[/][cyan] {points} pontos encontrados[/]",
-            highlight=False
+            f"[bold]Resultado:[/][cyan] {points} pontos encontrados[/]"
         )
         
         # Alertas de performance lenta solicitados pelo usuário
         if duration > 15:
-            LoggerHelper.log_warning(f"IA lenta ({duration:.1f}s). Possíveis causas:", emoji='slow')
-            console.print("    • [dim]Rate limit da API ou quota excedida[/]")
-            console.print("    • [dim]Modelo sob alta carga (Busy)[/]")
-            console.print("    • [dim]Complexidade alta do desafio[/]")
-            LoggerHelper.log_info("Tentando otimizar próxima chamada...", emoji='refresh')
+            console.write(
+                f"\n[warning]{LoggerHelper.EMOJIS['slow']} IA lenta ({duration:.1f}s). Possíveis causas:[/]"
+                "\n    • [dim]Rate limit da API ou quota excedida[/]"
+                "\n    • [dim]Modelo sob alta carga (Busy)[/]"
+                "\n    • [dim]Complexidade alta do desafio[/]"
+                f"\n[info]{LoggerHelper.EMOJIS['refresh']} Tentando otimizar próxima chamada...[/]"
+            )
+        console.writeln(highlight=False)
 
     @staticmethod
     def log_mouse_action(action: str, x: int, y: int, element: str = None, duration: float = None):
         """Log de ação do mouse aprimorado"""
-        emoji = {
-            "click": "🖱️",
-            "move": "↗️",
-            "drag": "🔀",
-            "hover": "👆"
-        }.get(action, "⚫")
-        
-        action_text = action.upper()
+        if _LEVEL > _INFO:
+            return
+        emoji = _MOUSE_EMOJI.get(action, "⚫")
+        action_text = _MOUSE_ACTION_TEXT.get(action) or action.upper()
         coord_text = f"({x}, {y})"
         elem_text = f" em [bold]{element}[/]" if element else ""
         dur_text = f" em [yellow]{duration:.1f}s[/]" if duration else ""
@@ -298,7 +559,7 @@ class LoggerHelper:
         content += f"🔄 [bold magenta]Tentativa:[/] [white]{retry_count}/{total_retries}[/]\n"
         content += f"🎯 [bold cyan]Ação:[/] [bold italic]{action}[/]"
         
-        console.print(Panel(
+        console.print_now(Panel(
             content, 
             title="❌ FALHA NO DESAFIO", 
             border_style="red", 
@@ -307,42 +568,134 @@ class LoggerHelper:
         ))
 
 
+class _StepProgress:
+    """
+    Single Rich Progress bar shared by log_step: on a terminal each round
+    updates the same line instead of printing a new one. Refresh is manual and
+    every Live operation runs on the log writer thread, so the bar stays in
+    order with the queued log lines.
+    """
+
+    def __init__(self):
+        self._progress: Progress | None = None
+        self._task_id = None
+        self._total = None
+
+    def update(self, step: int, total: int, message: str):
+        _submit_log(self._update, step, total, message)
+
+    def _update(self, step: int, total: int, message: str):
+        if self._progress is None or total != self._total or step <= 1:
+            self.stop()
+            self._progress = Progress(
+                SpinnerColumn(),
+                TextColumn("[step]🔄 Progresso:"),
+                BarColumn(bar_width=20),
+                TextColumn("[step]{task.percentage:>3.0f}% (Round {task.completed}/{task.total})[/] - [italic]{task.description}[/]"),
+                console=console,
+                auto_refresh=False,
+            )
+            self._task_id = self._progress.add_task(message, total=total)
+            self._total = total
+            self._progress.start()
+
+        self._progress.update(self._task_id, completed=step, description=message)
+        self._progress.refresh()
+        if step >= total:
+            self.stop()
+
+    def stop(self):
+        if self._progress is not None:
+            self._progress.stop()
+            self._progress = None
+            self._task_id = None
+            self._total = None
+
+
+_step_progress = _StepProgress()
+
+
+class _PrefixTable(dict):
+    """(emoji, level) -> "icon " prefix; unknown keys are formatted once and memoized."""
+
+    def __missing__(self, key):
+        emoji, level = key
+        icon = LoggerHelper.EMOJIS.get(emoji, emoji) or LoggerHelper.EMOJIS[level]
+        prefix = self[key] = f"{icon} "
+        return prefix
+
+
+_PREFIX = _PrefixTable(
+    ((name, level), f"{icon} ")
+    for name, icon in LoggerHelper.EMOJIS.items()
+    for level in ("debug", "info", "warning", "error", "success")
+)
+
+
+class _Counters:
+    """Contadores planos da sessão (um atributo por métrica, sem dicts aninhados)"""
+    __slots__ = ("challenges_total", "challenges_success", "challenges_failed", "ai_total", "ai_time", "start")
+
+    def __init__(self):
+        self.challenges_total = 0
+        self.challenges_success = 0
+        self.challenges_failed = 0
+        self.ai_total = 0
+        self.ai_time = 0.0
+        self.start = time.time()
+
+
 class MetricsLogger:
     """Logger de métricas para estatísticas da sessão"""
     
     def __init__(self):
-        self.metrics = {
-            "challenges": {"total": 0, "success": 0, "failed": 0},
-            "ai_calls": {"total": 0, "total_time": 0.0},
-            "errors": {}
+        self.counters = _Counters()
+        self.errors: Dict[str, int] = {}
+
+    @property
+    def start_time(self) -> float:
+        return self.counters.start
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """Visão no formato antigo (dict aninhado), montada sob demanda"""
+        c = self.counters
+        return {
+            "challenges": {"total": c.challenges_total, "success": c.challenges_success, "failed": c.challenges_failed},
+            "ai_calls": {"total": c.ai_total, "total_time": c.ai_time},
+            "errors": self.errors
         }
-        self.start_time = time.time()
 
     def log_challenge_result(self, success: bool, duration: float):
-        self.metrics["challenges"]["total"] += 1
-        key = "success" if success else "failed"
-        self.metrics["challenges"][key] += 1
+        c = self.counters
+        c.challenges_total += 1
+        if success:
+            c.challenges_success += 1
+        else:
+            c.challenges_failed += 1
         
         status = "✅ SUCESSO" if success else "❌ FALHA"
         color = "green" if success else "red"
         console.print(f"[{color}][bold]{status}[/] em {duration:.2f}s[/]")
 
     def log_ai_call(self, duration: float):
-        self.metrics["ai_calls"]["total"] += 1
-        self.metrics["ai_calls"]["total_time"] += duration
+        c = self.counters
+        c.ai_total += 1
+        c.ai_time += duration
 
     def log_error(self, error_type: str):
-        self.metrics["errors"][error_type] = self.metrics["errors"].get(error_type, 0) + 1
+        self.errors[error_type] = self.errors.get(error_type, 0) + 1
 
     def print_summary(self):
         """Imprime resumo da sessão com Rich Table"""
-        duration = time.time() - self.start_time
+        c = self.counters
+        duration = time.time() - c.start
         
-        total_challenges = self.metrics["challenges"]["total"]
-        success_rate = (self.metrics["challenges"]["success"] / total_challenges * 100) if total_challenges > 0 else 0
+        total_challenges = c.challenges_total
+        success_rate = (c.challenges_success / total_challenges * 100) if total_challenges > 0 else 0
         
-        total_ai = self.metrics["ai_calls"]["total"]
-        avg_ai = (self.metrics["ai_calls"]["total_time"] / total_ai) if total_ai > 0 else 0
+        total_ai = c.ai_total
+        avg_ai = (c.ai_time / total_ai) if total_ai > 0 else 0
         
         table = Table(title="📊 ESTATÍSTICAS DA SESSÃO", box=ROUNDED, border_style="magenta")
         table.add_column("Métrica", style="cyan")
@@ -352,15 +705,22 @@ class MetricsLogger:
         table.add_row("Desafios", f"{total_challenges} ({success_rate:.1f}% sucesso)")
         table.add_row("Chamadas IA", f"{total_ai} (média: {avg_ai:.2f}s)")
         
-        if self.metrics["errors"]:
-            error_summary = ", ".join([f"{k}: {v}" for k, v in self.metrics["errors"].items()])
+        if self.errors:
+            error_summary = ", ".join([f"{k}: {v}" for k, v in self.errors.items()])
             table.add_row("Erros", f"[red]{error_summary}[/]")
             
         console.print(table)
 
 def log_method_call(emoji: str = None, color: str = 'blue'):
-    """Decorador para logar chamadas de métodos importantes"""
+    """
+    Decorador para logar chamadas de métodos importantes.
+    Só instrumenta com HC_TRACE=1; caso contrário devolve a função intacta (custo zero).
+    """
+    if not _TRACE:
+        return lambda func: func
+
     def decorator(func):
+        @functools.wraps(func)
         async def async_wrapper(*args, **kwargs):
             instance = args[0] if args else None
             class_name = instance.__class__.__name__ if instance else 'Unknown'
@@ -371,23 +731,23 @@ def log_method_call(emoji: str = None, color: str = 'blue'):
                 emoji=emoji or 'debug'
             )
             
-            start_time = time.time()
+            start_ns = time.perf_counter_ns()
             try:
                 result = await func(*args, **kwargs)
-                elapsed = time.time() - start_time
+                elapsed_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
                 
                 # Log de sucesso
                 LoggerHelper.log_success(
-                    f"[bold {color}]{class_name}.{func.__name__}()[/] - Concluído em {elapsed:.2f}s",
+                    f"[bold {color}]{class_name}.{func.__name__}()[/] - Concluído em {elapsed_ms / 1000:.2f}s",
                     emoji='success'
                 )
                 return result
             except Exception as e:
-                elapsed = time.time() - start_time
+                elapsed_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
                 
                 # Log de erro
                 LoggerHelper.log_error(
-                    f"[bold {color}]{class_name}.{func.__name__}()[/] - Falhou após {elapsed:.2f}s: {str(e)[:100]}",
+                    f"[bold {color}]{class_name}.{func.__name__}()[/] - Falhou após {elapsed_ms / 1000:.2f}s: {str(e)[:100]}",
                     emoji='error'
                 )
                 raise
@@ -2,15 +2,33 @@ import asyncio
 import random
 from typing import Tuple, Optional
 from playwright.async_api import Page, Locator
-from hcaptcha_challenger.agent.utils import _generate_bezier_trajectory, _generate_dynamic_delays
+from hcaptcha_challenger.agent.utils import (
+    _generate_bezier_trajectory,
+    _generate_dynamic_delays,
+    _generate_drag_noise,
+)
+
+# Menor atraso (ms) que justifica um asyncio.sleep próprio durante o arraste
+_MIN_SLEEP_MS = 2.0
+
+# Iframe do checkbox do hCaptcha (CSS é resolvido mais rápido que XPath pelo Playwright)
+_CHECKBOX_FRAME_SELECTOR = "iframe[src^='https://newassets.hcaptcha.com/captcha/v1/'][src*='frame=checkbox']"
+
+# Gerador próprio do módulo: evita o lookup em `random` e o lock do Random global
+_rng = random.Random()
+
 
 class PilotActions:
     def __init__(self, page: Page, arm):
         self.page = page
         self.arm = arm
+        # Locators são preguiçosos e resolvidos a cada uso: seguros para reaproveitar após reloads
+        self._checkbox_locator: Optional[Locator] = None
 
     async def click_by_mouse(self, locator: Optional[Locator] = None, coords: Optional[Tuple[float, float]] = None):
-        if locator:
+        # Coordenadas explícitas dispensam o bounding_box(); sem elas o bbox é sempre consultado,
+        # pois reloads, reflow e re-renderização do frame movem o elemento
+        if coords is None:
             bbox = await locator.bounding_box()
             if not bbox: return
             x = bbox['x'] + bbox['width'] / 2
@@ -19,11 +37,12 @@ class PilotActions:
             x, y = coords
 
         # Jitter sutil para humanização (Premium Parity)
-        jx = x + random.uniform(-2, 2)
-        jy = y + random.uniform(-2, 2)
+        ru, ri = _rng.uniform, _rng.randint
+        jx = x + ru(-2, 2)
+        jy = y + ru(-2, 2)
         
-        await self.page.mouse.move(jx, jy, steps=random.randint(5, 10))
-        await self.page.mouse.click(jx, jy, delay=random.randint(150, 250))
+        await self.page.mouse.move(jx, jy, steps=ri(5, 10))
+        await self.page.mouse.click(jx, jy, delay=ri(150, 250))
 
     async def perform_drag_drop(self, path, delay_ms: int = 15, steps: int = 25):
         # Validação de integridade do objeto path (Portabilidade Final)
@@ -33,11 +52,13 @@ class PilotActions:
         start_x, start_y = path.start_point.x, path.start_point.y
         end_x, end_y = path.end_point.x, path.end_point.y
         
+        ru = _rng.uniform
+
         # Move to the starting position
         await self.page.mouse.move(start_x, start_y)
 
         # Small random delay before pressing down (human reaction time)
-        await asyncio.sleep(random.uniform(0.05, 0.15))
+        await asyncio.sleep(ru(0.05, 0.15))
 
         # Press the mouse button down
         await self.page.mouse.down()
@@ -47,33 +68,37 @@ class PilotActions:
         # Add velocity variation (slow start, fast middle, slow end)
         delays = _generate_dynamic_delays(steps, base_delay=delay_ms)
 
+        # Add slight "noise" to the path (more pronounced near the end)
+        points += _generate_drag_noise(steps)
+
         # Perform the drag with human-like movement
-        for i, ((current_x, current_y), delay) in enumerate(zip(points, delays)):
-            # Add slight "noise" to the path (more pronounced near the end)
-            if i > steps * 0.7:  # In the last 30% of the movement
-                # More micro-adjustments near the end
-                noise_factor = 0.5 if i > steps * 0.9 else 0.2
-                current_x += random.uniform(-noise_factor, noise_factor)
-                current_y += random.uniform(-noise_factor, noise_factor)
-            
-            await self.page.mouse.move(current_x, current_y)
-            await asyncio.sleep(delay / 1000)
+        # Delays below _MIN_SLEEP_MS are coalesced into the next step to spare timer wakeups
+        # Colunas convertidas uma vez para floats nativos; o laço só indexa
+        xs, ys, ds = points[:, 0].tolist(), points[:, 1].tolist(), delays.tolist()
+        pending_ms = 0.0
+        for i in range(len(ds)):
+            await self.page.mouse.move(xs[i], ys[i])
+            pending_ms += ds[i]
+            if pending_ms >= _MIN_SLEEP_MS:
+                await asyncio.sleep(pending_ms / 1000)
+                pending_ms = 0.0
+        if pending_ms:
+            await asyncio.sleep(pending_ms / 1000)
 
         # Ensure we end exactly at the target position
         await self.page.mouse.move(end_x, end_y)
         
         # Small pause before releasing (human precision adjustment)
-        await asyncio.sleep(random.uniform(0.05, 0.1))
+        await asyncio.sleep(ru(0.05, 0.1))
         
         # Release the mouse button at the destination
         await self.page.mouse.up()
         
         # Small pause between drag operations
-        await asyncio.sleep(random.uniform(0.08, 0.12))
+        await asyncio.sleep(ru(0.08, 0.12))
 
     async def click_checkbox(self):
         """Localiza e clica no checkbox inicial (Portado do baseline)."""
-        checkbox_selector = "//iframe[starts-with(@src,'https://newassets.hcaptcha.com/captcha/v1/') and contains(@src, 'frame=checkbox')]"
-        checkbox_frame = self.page.frame_locator(checkbox_selector)
-        checkbox_element = checkbox_frame.locator("//div[@id='checkbox']")
-        await self.click_by_mouse(checkbox_element)
+        if self._checkbox_locator is None:
+            self._checkbox_locator = self.page.frame_locator(_CHECKBOX_FRAME_SELECTOR).locator("#checkbox")
+        await self.click_by_mouse(self._checkbox_locator)
@@ -1,141 +1,324 @@
 import asyncio
+import binascii
+import functools
+import io
 import time
 import random
 import os
-import re
 from pathlib import Path
 from loguru import logger
 from typing import Union, Tuple, Optional
 from contextlib import suppress
-from playwright.async_api import Page, Frame, Locator, expect, FrameLocator
+import numpy as np
+from PIL import Image
+from playwright.async_api import Error as PlaywrightError, Page, Frame, Locator, FrameLocator, JSHandle
 from hcaptcha_challenger.models import ChallengeTypeEnum, RequestType
-from hcaptcha_challenger.agent.logger import LoggerHelper, log_method_call, ChallengeTracker
+from hcaptcha_challenger.helper.create_coordinate_grid import create_coordinate_grid
+from hcaptcha_challenger.agent.logger import LoggerHelper, log_method_call, ChallengeTracker, classify_error
+from hcaptcha_challenger.agent.pilot.navigation import _CHALLENGE_VIEW_XPATH
+
+# Captura da challenge-view: no Chromium o Playwright delega ao Page.captureScreenshot do CDP,
+# então pedir JPEG faz a codificação no navegador (bem mais barata que PNG) e encolhe o tráfego
+_VIEW_SCREENSHOT = {"type": "jpeg", "quality": 80}
+
+# Espera imagens e canvas da challenge-view ficarem prontos (MutationObserver para o canvas)
+_IMAGES_READY_JS = """
+async () => {
+    const imgs = Array.from(document.querySelectorAll(".challenge-view img"));
+    const canvas = Array.from(document.querySelectorAll(".challenge-view canvas"));
+    const promises = [];
+    imgs.forEach(img => {
+        if (!(img.complete && img.naturalWidth > 0)) {
+            promises.push(new Promise(resolve => {
+                img.onload = resolve;
+                img.onerror = resolve;
+            }));
+        }
+    });
+    canvas.forEach(c => {
+        if (!(c.width > 0 && c.height > 0)) {
+            promises.push(new Promise(resolve => {
+                const observer = new MutationObserver(() => {
+                    if (c.width > 0 && c.height > 0) {
+                        observer.disconnect();
+                        resolve();
+                    }
+                });
+                observer.observe(c, { attributes: true, attributeFilter: ['width', 'height'] });
+                setTimeout(() => { observer.disconnect(); resolve(); }, 2000);
+            }));
+        }
+    });
+    if (promises.length > 0) await Promise.all(promises);
+    await new Promise(r => setTimeout(r, 400));
+}
+"""
+
+# Burst direto do canvas da challenge-view: n quadros a cada dt ms numa única chamada.
+# Só vale quando o canvas ocupa a view inteira (o grid projeta o quadro sobre o bbox da view);
+# canvas ausente, menor ou "tainted" (toDataURL lança SecurityError) devolve null.
+_CANVAS_BURST_JS = """
+async ([n, dt]) => {
+    const view = document.querySelector(".challenge-view");
+    const c = view && view.querySelector("canvas");
+    if (!c) return null;
+    const v = view.getBoundingClientRect(), r = c.getBoundingClientRect();
+    if (Math.abs(v.width - r.width) > 2 || Math.abs(v.height - r.height) > 2) return null;
+    const out = [];
+    try {
+        for (let i = 0; i < n; i++) {
+            if (i) await new Promise(res => setTimeout(res, dt));
+            out.push(c.toDataURL("image/jpeg", 0.8));
+        }
+    } catch (e) {
+        return null;
+    }
+    return out;
+}
+"""
+
+# Botão de envio em todas as variantes conhecidas, numa só consulta (só a primeira ocorrência visível)
+_SUBMIT_SELECTOR = (
+    "div[class*='button-submit'], button:has-text('Verify'), :text('Submit'), :text('Verify')"
+    " >> visible=true"
+)
+
+def _challenge_handler(func):
+    """
+    Escopo de um handle_*: começa sem verificação de envio pendente e, ao sair por
+    qualquer caminho (timeout, erro, cancelamento), não deixa a de uma rodada abortada
+    viva para relatar um erro velho no desafio seguinte, nem o handle da função de
+    prontidão preso no frame.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        await self._cancel_pending_submit()
+        try:
+            return await func(self, *args, **kwargs)
+        finally:
+            try:
+                await self._cancel_pending_submit()
+            finally:
+                await self._dispose_images_ready_fn()
+
+    return wrapper
+
 
 class PilotChallenges:
     def __init__(self, arm):
         self.arm = arm
         self.tracker = ChallengeTracker()
+        # Bytes da última captura da challenge-view: servem de chave do ImageCache sem reler o disco
+        self.last_view_bytes: Optional[bytes] = None
+        # Handle da função _IMAGES_READY_JS já compilada no contexto do frame (reavaliada após navegação)
+        self._images_ready_fn: Optional[Tuple[Frame, JSHandle]] = None
+        # Locator da challenge-view por frame e seu bbox: a geometria só muda depois de um submit
+        self._view_locator: Optional[Tuple[Frame, Locator]] = None
+        self._cached_bbox: Optional[dict] = None
+        # Verificação pós-envio em curso: sobrepõe-se à espera de renderização da rodada seguinte
+        self._pending_submit: Optional[asyncio.Task] = None
+        # Gravações em disco dos grids (só depuração): sobrepostas à chamada da IA
+        self._pending_writes: list[asyncio.Future] = []
 
     def get_tracker(self):
         return self.tracker
 
+    def _challenge_view(self, frame: Frame) -> Locator:
+        cached = self._view_locator
+        if cached is None or cached[0] is not frame:
+            cached = self._view_locator = (frame, frame.locator(_CHALLENGE_VIEW_XPATH))
+        return cached[1]
+
+    async def _view_bbox(self, frame: Frame) -> Optional[dict]:
+        """bbox da challenge-view, consultado ao navegador só uma vez entre dois submits."""
+        if self._cached_bbox is None:
+            self._cached_bbox = await self._challenge_view(frame).bounding_box()
+        self.arm.navigation.current_view_bbox = self._cached_bbox
+        return self._cached_bbox
+
     async def _wait_for_all_loaders_complete(self, frame: Frame):
         """Implementação da linha 240-260 do original: Garante que as imagens do desafio carregaram."""
-        await asyncio.sleep(self.arm.config.WAIT_FOR_CHALLENGE_VIEW_TO_RENDER_MS / 1000)
-        loading_indicators = frame.locator("//div[@class='loading-indicator']")
-        count = await loading_indicators.count()
-        if count == 0: return True
-        
-        for i in range(count):
-            try:
-                await expect(loading_indicators.nth(i)).to_have_attribute("style", re.compile(r"opacity:\s*0"), timeout=30000)
-            except: pass
+        await self.arm.navigation.wait_for_loaders(frame)
+        await self._settle_submit()
         return True
 
+    async def _wait_view_images_ready(self, frame: Frame):
+        """Invoca a função de prontidão por referência; só reenvia o código quando o contexto mudou."""
+        cached = self._images_ready_fn
+        if cached and cached[0] is frame:
+            try:
+                return await frame.evaluate("fn => fn()", cached[1])
+            except PlaywrightError:
+                pass
+        # Frame novo ou handle inválido: libera o anterior antes de substituí-lo
+        await self._dispose_images_ready_fn()
+        try:
+            # O Playwright invoca uma expressão que seja função: embrulhada, o handle guarda a função
+            handle = await frame.evaluate_handle(f"() => ({_IMAGES_READY_JS})")
+        except PlaywrightError:
+            return await frame.evaluate(_IMAGES_READY_JS)
+        self._images_ready_fn = (frame, handle)
+        return await frame.evaluate("fn => fn()", handle)
+
+    async def _dispose_images_ready_fn(self):
+        """Libera no navegador o handle da função de prontidão, se houver."""
+        cached, self._images_ready_fn = self._images_ready_fn, None
+        if cached is None:
+            return
+        # O contexto pode já ter sido destruído junto com o frame
+        with suppress(PlaywrightError):
+            await cached[1].dispose()
+
+    def _report_ai_error(self, error: Exception, model: Optional[str], available_keys: Optional[list]):
+        """Feedback de quota e log de erro do provedor, comum aos três tipos de desafio."""
+        config = self.arm.config
+        total_keys = len(config.GEMINI_API_KEYS) if config.GEMINI_API_KEYS else 1
+        current_key_idx = 1
+
+        if model and available_keys:
+            k0 = available_keys[0]
+            # Mesmo classificador do log_provider_error: quota e log nunca divergem
+            if classify_error(error) == "quota":
+                self.arm.core.quota_manager.mark_exhausted(k0, model)
+            else:
+                self.arm.core.quota_manager.mark_failure(k0, model)
+            current_key_idx = config.key_position(k0)
+
+        self.arm.log_provider_error(current_key_idx, total_keys, error)
+
     async def _capture_burst_frames(self, frame: FrameLocator | Frame, cache_key: Path, cid: int, count: int = 3) -> list[Path]:
         """
         Captura uma sequência de screenshots para desafios de movimento.
         """
-        screenshots = []
-        challenge_view = frame.locator("//div[@class='challenge-view']")
-        
-        for i in range(count):
-            path = cache_key.joinpath(f"{cache_key.name}_{cid}_burst_{i}.png")
-            path.parent.mkdir(parents=True, exist_ok=True)
-            await challenge_view.screenshot(type="png", path=path)
-            screenshots.append(path)
-            if i < count - 1:
-                await asyncio.sleep(0.2) # 200ms entre frames
-        
-        return screenshots
+        loop = asyncio.get_running_loop()
+        challenge_view = self._challenge_view(frame)
+        cache_key.mkdir(parents=True, exist_ok=True)
+
+        # Desafios em canvas: todos os quadros num único round-trip, cronometrados no navegador
+        frames = await self._capture_canvas_burst(frame, count)
+        if frames:
+            self.last_view_bytes = frames[-1]
+            paths = [cache_key.joinpath(f"{cache_key.name}_{cid}_burst_{i}.jpg") for i in range(count)]
+            await asyncio.gather(*(loop.run_in_executor(None, p.write_bytes, d) for p, d in zip(paths, frames)))
+            return paths
+
+        async def _capture(i: int) -> Path:
+            # Cada frame tem seu instante fixo (t = i * 200ms): captura e codificação se sobrepõem
+            await asyncio.sleep(0.2 * i)
+            path = cache_key.joinpath(f"{cache_key.name}_{cid}_burst_{i}.jpg")
+            data = await challenge_view.screenshot(**_VIEW_SCREENSHOT)
+            if i == count - 1:
+                self.last_view_bytes = data
+            # Os arquivos precisam estar no disco antes de seguirem para a IA
+            await loop.run_in_executor(None, path.write_bytes, data)
+            return path
+
+        return list(await asyncio.gather(*(_capture(i) for i in range(count))))
 
-    async def _capture_spatial_mapping(self, frame: Frame, cache_key: Path, cid: Union[int, str]) -> Tuple[Optional[Path], Optional[Path]]:
+    async def _capture_canvas_burst(self, frame: FrameLocator | Frame, count: int) -> Optional[list[bytes]]:
+        if not isinstance(frame, Frame):
+            return None
+        try:
+            urls = await frame.evaluate(_CANVAS_BURST_JS, [count, 200])
+        except PlaywrightError:
+            return None
+        if not urls or len(urls) != count:
+            return None
+        frames = [binascii.a2b_base64(u.partition(",")[2]) for u in urls]
+        # Canvas de tamanho zero serializa como "data:," (sem imagem)
+        return frames if all(frames) else None
+
+    async def _capture_spatial_mapping(self, frame: Frame, cache_key: Path, cid: Union[int, str]) -> Tuple[Optional[Path], Optional[bytes]]:
         """Implementação robusta da linha 270-340: Captura screenshot com MutationObserver e suporte a Canvas."""
-        await frame.evaluate("""
-            async () => {
-                const imgs = Array.from(document.querySelectorAll(".challenge-view img"));
-                const canvas = Array.from(document.querySelectorAll(".challenge-view canvas"));
-                const promises = [];
-                imgs.forEach(img => {
-                    if (!(img.complete && img.naturalWidth > 0)) {
-                        promises.push(new Promise(resolve => {
-                            img.onload = resolve;
-                            img.onerror = resolve;
-                        }));
-                    }
-                });
-                canvas.forEach(c => {
-                    if (!(c.width > 0 && c.height > 0)) {
-                        promises.push(new Promise(resolve => {
-                            const observer = new MutationObserver(() => {
-                                if (c.width > 0 && c.height > 0) {
-                                    observer.disconnect();
-                                    resolve();
-                                }
-                            });
-                            observer.observe(c, { attributes: true, attributeFilter: ['width', 'height'] });
-                            setTimeout(() => { observer.disconnect(); resolve(); }, 2000);
-                        }));
-                    }
-                });
-                if (promises.length > 0) await Promise.all(promises);
-                await new Promise(r => setTimeout(r, 400));
-            }
-        """)
+        await self._wait_view_images_ready(frame)
         
-        challenge_view = frame.locator("//div[@class='challenge-view']")
-        bbox = await challenge_view.bounding_box()
-        self.arm.navigation.current_view_bbox = bbox
-
-        screenshot_path = cache_key.joinpath(f"{cache_key.name}_{cid}_challenge_view.png")
+        challenge_view = self._challenge_view(frame)
+        screenshot_path = cache_key.joinpath(f"{cache_key.name}_{cid}_challenge_view.jpg")
         screenshot_path.parent.mkdir(parents=True, exist_ok=True)
-        await challenge_view.screenshot(type="png", path=screenshot_path, timeout=5000)
 
-        from hcaptcha_challenger.helper import create_coordinate_grid
-        import matplotlib.pyplot as plt
+        # bbox e captura são independentes depois que as imagens carregaram: os dois round-trips correm juntos
+        bbox, self.last_view_bytes = await asyncio.gather(
+            self._view_bbox(frame),
+            challenge_view.screenshot(timeout=5000, **_VIEW_SCREENSHOT),
+        )
+        screenshot_path.write_bytes(self.last_view_bytes)
+
         grid_img = create_coordinate_grid(
-            screenshot_path, bbox,
+            self.last_view_bytes, bbox,
             x_line_space_num=self.arm.config.coordinate_grid.x_line_space_num,
             y_line_space_num=self.arm.config.coordinate_grid.y_line_space_num,
             color=self.arm.config.coordinate_grid.color,
             adaptive_contrast=self.arm.config.coordinate_grid.adaptive_contrast,
         )
 
+        return screenshot_path, self._store_grid(grid_img, cache_key, cid)
+
+    def _store_grid(self, grid_img: np.ndarray, cache_key: Path, cid: Union[int, str]) -> bytes:
+        """Codifica o grid em memória (segue direto para a IA) e grava a cópia em disco em segundo plano."""
+        buf = io.BytesIO()
+        Image.fromarray(np.ascontiguousarray(grid_img)).save(buf, format="PNG", compress_level=1)
+        data = buf.getvalue()
         grid_path = cache_key.joinpath(f"{cache_key.name}_{cid}_spatial_helper.png")
-        plt.imsave(str(grid_path.resolve()), grid_img)
+        loop = asyncio.get_running_loop()
+        self._pending_writes.append(loop.run_in_executor(None, grid_path.write_bytes, data))
+        return data
 
-        return screenshot_path, grid_path
+    async def _flush_writes(self):
+        """Aguarda as gravações de depuração pendentes (chamado ao fim de cada rodada)."""
+        writes, self._pending_writes = self._pending_writes, []
+        if writes:
+            await asyncio.gather(*writes)
 
     async def _click_submit(self, frame):
         """Implementação da linha 980 do original: Clica no botão submit com simulação humana."""
-        selectors = [
-            "//div[@class='button-submit button']",
-            "//div[contains(@class, 'button-submit')]",
-            "text=Submit",
-            "text=Verify",
-            "button:has-text('Verify')"
-        ]
-        
-        for selector in selectors:
-            try:
-                btn = frame.locator(selector).first
-                if await btn.is_visible(timeout=1000):
-                    await asyncio.sleep(random.uniform(0.7, 1.4))
-                    await self.arm.actions.click_by_mouse(btn)
-                    
-                    await asyncio.sleep(2)
-                    with suppress(Exception):
-                        error_locator = frame.locator("//div[contains(@class, 'error-text')]")
-                        if await error_locator.is_visible(timeout=1000):
-                            LoggerHelper.log_error("hCaptcha recusou solução!", emoji='boom')
-                            return False
-                    
-                    LoggerHelper.log_info("Ação enviada. Aguardando veredito...", emoji='hourglass')
-                    return True
-            except: continue
-        return False
+        btn = frame.locator(_SUBMIT_SELECTOR).first
+        try:
+            # Uma única espera cobre todas as variantes do botão (antes: até 5 sondagens em série)
+            await btn.wait_for(state="visible", timeout=2000)
+            await asyncio.sleep(random.uniform(0.7, 1.4))
+            await self.arm.actions.click_by_mouse(btn)
+            # A próxima rodada pode reposicionar a challenge-view
+            self._cached_bbox = None
+        except PlaywrightError:
+            return False
+
+        # A checagem de recusa roda em segundo plano; a próxima rodada a aguarda após carregar
+        self._pending_submit = asyncio.create_task(self._check_submit_result(frame))
+        return True
+
+    async def _check_submit_result(self, frame) -> bool:
+        await asyncio.sleep(2)
+        # Roda solta em segundo plano: qualquer falha da sondagem (timeout incluso) é só "sem recusa visível"
+        with suppress(Exception):
+            error_locator = frame.locator("//div[contains(@class, 'error-text')]")
+            if await error_locator.is_visible(timeout=1000):
+                LoggerHelper.log_error("hCaptcha recusou solução!", emoji='boom')
+                return False
+
+        LoggerHelper.log_info("Ação enviada. Aguardando veredito...", emoji='hourglass')
+        return True
+
+    async def _settle_submit(self) -> Optional[bool]:
+        """Aguarda a verificação do último envio, se houver uma pendente."""
+        task, self._pending_submit = self._pending_submit, None
+        if task is None:
+            return None
+        return await task
+
+    async def _cancel_pending_submit(self):
+        """Cancela e aguarda a verificação de envio em voo, se houver."""
+        task, self._pending_submit = self._pending_submit, None
+        if task is None:
+            return
+        task.cancel()
+        # wait() não relança o cancelamento da task interna, só um cancelamento nosso
+        await asyncio.wait({task})
+        if not task.cancelled():
+            task.exception()
 
     @log_method_call(emoji='🧩', color='magenta')
+    @_challenge_handler
     async def handle_drag_drop(self, job_type: ChallengeTypeEnum):
         frame = await self.arm.navigation.get_challenge_frame_locator()
         if not frame: return False
@@ -143,6 +326,7 @@ class PilotChallenges:
         cache_key = self.arm.config.create_cache_key(self.arm.captcha_payload)
         user_prompt = self.arm._match_user_prompt(job_type)
         self.tracker.start_challenge(user_prompt)
+        self._cached_bbox = None
 
         for cid in range(self.arm.crumb_count):
             round_start = time.time()
@@ -151,10 +335,12 @@ class PilotChallenges:
             
             raw, projection = await self._capture_spatial_mapping(frame, cache_key, cid)
             
-            img_hash = self.arm.core.image_cache.get_hash(raw)
-            if img_hash and img_hash in self.arm.core.image_cache.cache:
+            image_cache = self.arm.core.image_cache
+            img_hash = image_cache.get_hash(self.last_view_bytes or raw)
+            cached = image_cache.cache.get(img_hash) if img_hash else None
+            if cached is not None:
                 LoggerHelper.log_info("Usando Cache (HIT 🎯)", emoji='kermit')
-                response = self.arm.core.image_cache.cache[img_hash]
+                response = cached
                 ai_duration = 0
                 model_used = "cache"
             else:
@@ -180,33 +366,14 @@ class PilotChallenges:
                     )
                     ai_duration = time.time() - start_ai
                     model_used = model
-                    if img_hash: self.arm.core.image_cache.cache[img_hash] = response
+                    if img_hash: image_cache.cache[img_hash] = response
                     
                     # Feedback de quota: Sucesso
                     if model and available_keys:
                         k0 = available_keys[0]
                         self.arm.core.quota_manager.mark_success(k0, model)
                 except Exception as e:
-                    # Feedback de quota: Erro (Portabilidade Premium)
-                    total_keys = len(self.arm.config.GEMINI_API_KEYS) if self.arm.config.GEMINI_API_KEYS else 1
-                    current_key_idx = 1
-                    
-                    if model and available_keys:
-                        k0 = available_keys[0]
-                        err_msg = str(e).lower()
-                        if "429" in err_msg or "exhausted" in err_msg:
-                            self.arm.core.quota_manager.mark_exhausted(k0, model)
-                        else:
-                            self.arm.core.quota_manager.mark_failure(k0, model)
-                        
-                        # Tentar encontrar o índice real no config original
-                        for i, key_obj in enumerate(self.arm.config.GEMINI_API_KEYS):
-                            val = key_obj.get_secret_value() if hasattr(key_obj, "get_secret_value") else str(key_obj)
-                            if val == k0:
-                                current_key_idx = i + 1
-                                break
-                    
-                    self.arm.log_provider_error(current_key_idx, total_keys, e)
+                    self._report_ai_error(e, model, available_keys)
                     raise e
 
             self.arm._log_ai_response(response, cid + 1, self.arm.crumb_count)
@@ -219,10 +386,14 @@ class PilotChallenges:
                     await self.arm.actions.perform_drag_drop(path, delay_ms=random.randint(15, 25))
                     await asyncio.sleep(random.uniform(0.5, 0.8))
 
+            await self._flush_writes()
             await self._click_submit(frame)
             self.tracker.log_round(cid+1, True, time.time()-round_start, ai_duration, len(response.paths))
 
+        await self._settle_submit()
+
     @log_method_call(emoji='🎯', color='cyan')
+    @_challenge_handler
     async def handle_label_select(self, job_type: ChallengeTypeEnum):
         frame = await self.arm.navigation.get_challenge_frame_locator()
         if not frame: return False
@@ -230,6 +401,7 @@ class PilotChallenges:
         cache_key = self.arm.config.create_cache_key(self.arm.captcha_payload)
         user_prompt = self.arm._match_user_prompt(job_type)
         self.tracker.start_challenge(user_prompt)
+        self._cached_bbox = None
 
         for cid in range(self.arm.crumb_count):
             round_start = time.time()
@@ -244,21 +416,15 @@ class PilotChallenges:
             is_motion = "motion" in real_prompt or "pattern" in real_prompt
             logger.info(f"DEBUG: is_motion={is_motion}")
             
-            # Garantir que bbox seja definido antes
-            bbox = await frame.locator("//div[@class='challenge-view']").bounding_box()
-            self.arm.navigation.current_view_bbox = bbox
-
             if is_motion:
                 LoggerHelper.log_info("Desafio de Movimento detectado! Ativando Burst Mode (3 frames)...", emoji='📸')
+                # O grid do burst precisa do bbox (o caminho estático o obtém em _capture_spatial_mapping)
+                bbox = await self._view_bbox(frame)
                 challenge_screenshots = await self._capture_burst_frames(frame, cache_key, cid, count=3)
                 
                 # Para grid, usamos o último frame do burst (bbox já definido acima)
-                
-                from hcaptcha_challenger.helper import create_coordinate_grid
-                import matplotlib.pyplot as plt
-                
                 grid_result = create_coordinate_grid(
-                    challenge_screenshots[-1], # Usa o último frame para o grid
+                    self.last_view_bytes, # Usa o último frame (já em memória) para o grid
                     bbox,
 
                     x_line_space_num=self.arm.config.coordinate_grid.x_line_space_num,
@@ -266,9 +432,7 @@ class PilotChallenges:
                     color=self.arm.config.coordinate_grid.color,
                     adaptive_contrast=self.arm.config.coordinate_grid.adaptive_contrast,
                 )
-                projection = cache_key.joinpath(f"{cache_key.name}_{cid}_spatial_helper.png")
-                projection.parent.mkdir(parents=True, exist_ok=True)
-                plt.imsave(str(projection.resolve()), grid_result)
+                projection = self._store_grid(grid_result, cache_key, cid)
                 
                 raw = challenge_screenshots # Passa a LISTA de paths
                 LoggerHelper.log_info(f"Burst Mode concluído: {len(raw)} frames capturados.", emoji='🎞️')
@@ -291,25 +455,7 @@ class PilotChallenges:
                     k0 = available_keys[0]
                     self.arm.core.quota_manager.mark_success(k0, model)
             except Exception as e:
-                # Feedback de quota: Erro (Portabilidade Premium)
-                total_keys = len(self.arm.config.GEMINI_API_KEYS) if self.arm.config.GEMINI_API_KEYS else 1
-                current_key_idx = 1
-                
-                if model and available_keys:
-                    k0 = available_keys[0]
-                    err_msg = str(e).lower()
-                    if "429" in err_msg or "exhausted" in err_msg:
-                        self.arm.core.quota_manager.mark_exhausted(k0, model)
-                    else:
-                        self.arm.core.quota_manager.mark_failure(k0, model)
-                    
-                    for i, key_obj in enumerate(self.arm.config.GEMINI_API_KEYS):
-                        val = key_obj.get_secret_value() if hasattr(key_obj, "get_secret_value") else str(key_obj)
-                        if val == k0:
-                            current_key_idx = i + 1
-                            break
-                
-                self.arm.log_provider_error(current_key_idx, total_keys, e)
+                self._report_ai_error(e, model, available_keys)
                 raise e
             
             self.arm._log_ai_response(response, cid + 1, self.arm.crumb_count)
@@ -324,10 +470,14 @@ class PilotChallenges:
                 await self.arm.page.mouse.click(point.x, point.y, delay=180)
                 await asyncio.sleep(random.uniform(0.4, 0.6))
 
+            await self._flush_writes()
             await self._click_submit(frame)
             self.tracker.log_round(cid+1, True, time.time()-round_start, ai_duration, len(points))
 
+        await self._settle_submit()
+
     @log_method_call(emoji='🖼️', color='green')
+    @_challenge_handler
     async def handle_binary(self):
         frame = await self.arm.navigation.get_challenge_frame_locator()
         if not frame: return False
@@ -335,6 +485,7 @@ class PilotChallenges:
         cache_key = self.arm.config.create_cache_key(self.arm.captcha_payload)
         user_prompt = self.arm._match_user_prompt(RequestType.IMAGE_LABEL_BINARY)
         self.tracker.start_challenge(user_prompt)
+        self._cached_bbox = None
 
         for cid in range(self.arm.crumb_count):
             round_start = time.time()
@@ -357,25 +508,7 @@ class PilotChallenges:
                     k0 = available_keys[0]
                     self.arm.core.quota_manager.mark_success(k0, model)
             except Exception as e:
-                # Feedback de quota: Erro (Portabilidade Premium)
-                total_keys = len(self.arm.config.GEMINI_API_KEYS) if self.arm.config.GEMINI_API_KEYS else 1
-                current_key_idx = 1
-                
-                if model and available_keys:
-                    k0 = available_keys[0]
-                    err_msg = str(e).lower()
-                    if "429" in err_msg or "exhausted" in err_msg:
-                        self.arm.core.quota_manager.mark_exhausted(k0, model)
-                    else:
-                        self.arm.core.quota_manager.mark_failure(k0, model)
-                    
-                    for i, key_obj in enumerate(self.arm.config.GEMINI_API_KEYS):
-                        val = key_obj.get_secret_value() if hasattr(key_obj, "get_secret_value") else str(key_obj)
-                        if val == k0:
-                            current_key_idx = i + 1
-                            break
-                
-                self.arm.log_provider_error(current_key_idx, total_keys, e)
+                self._report_ai_error(e, model, available_keys)
                 raise e
             
             matrix = response.convert_box_to_boolean_matrix()
@@ -390,6 +523,8 @@ class PilotChallenges:
             await self._click_submit(frame)
             self.tracker.log_round(cid+1, True, time.time()-round_start, ai_duration, sum(matrix))
 
+        await self._settle_submit()
+
 
     async def debug_find_captcha(self):
         """
@@ -424,7 +559,7 @@ class PilotChallenges:
                             await self.arm.actions.click_by_mouse(checkbox)
                             await asyncio.sleep(2) # Aguarda transição
                             return True
-            except:
+            except PlaywrightError:
                 continue
 
         # 3. Verificar por seletores de dados (data-sitekey, etc)
@@ -439,7 +574,7 @@ class PilotChallenges:
                 try: 
                     await self.arm.actions.click_checkbox() 
                     return True
-                except: pass
+                except PlaywrightError: pass
                 return True
 
         LoggerHelper.log_warning("Cockpit não localizado.")
@@ -1,28 +1,119 @@
 import asyncio
-import json
-import msgpack
-import hashlib
+import binascii
+import mmap
+import os
+import re
 import time
-from datetime import datetime
 from pathlib import Path
 from asyncio import Queue
-from typing import List, Optional, Any, Union
+from collections import OrderedDict
+from typing import List, Optional, Any, Tuple, Union
 from loguru import logger
 from playwright.async_api import Page, Response
 
 from hcaptcha_challenger.models import CaptchaResponse, CaptchaPayload, ChallengeSignal, RequestType, ChallengeTypeEnum
 from hcaptcha_challenger.agent.logger import LoggerHelper, NetworkLogger
 from hcaptcha_challenger.agent.quota_manager import QuotaManager
+from hcaptcha_challenger.utils import content_digest, loads_msgpack, timestamp_key, write_json
+
+# Decodifica o corpo binário do /getcaptcha/ com o hsw da página.
+# Entrada e saída trafegam em base64 (uma string) em vez de arrays JSON de inteiros
+_HSW_DECODE_JS = """
+async (b64) => {
+    try {
+        const bin = atob(b64);
+        const data = new Uint8Array(bin.length);
+        for (let i = 0; i < bin.length; i++) data[i] = bin.charCodeAt(i);
+        const res = await hsw(0, data);
+        const out = res instanceof Uint8Array ? res : Uint8Array.from(res);
+        let s = "";
+        for (let i = 0; i < out.length; i += 0x8000) {
+            s += String.fromCharCode.apply(null, out.subarray(i, i + 0x8000));
+        }
+        return btoa(s);
+    } catch (e) {
+        return null;
+    }
+}
+"""
+
+
+async def hsw_decode(context, raw_data: bytes) -> Optional[bytes]:
+    """Roda o hsw de `context` (Page ou Frame) sobre o corpo binário; None se a página não decodificou."""
+    result = await context.evaluate(_HSW_DECODE_JS, binascii.b2a_base64(raw_data, newline=False).decode("ascii"))
+    return binascii.a2b_base64(result) if isinstance(result, str) else None
+
+
+# Valores atuais dos campos de resposta do widget (o hCaptcha preenche os dois nomes)
+_READ_RESPONSE_TOKENS_JS = """
+() => Array.from(
+    document.querySelectorAll('[name="h-captcha-response"], [name="g-recaptcha-response"]'),
+    el => el.value
+)
+"""
+
+# Palavras-chave do prompt que forçam o roteamento: uma alternação compilada, varrida em C numa única passada
+_DRAG_KEYWORDS_RE = re.compile("drag|arraste|puzzle|segment|mova|piece")
+_VIDEO_KEYWORDS_RE = re.compile("video|clip")
 
 class ImageCache:
+    # Máximo de digests de arquivo memorizados (LRU)
+    MAX_FILE_DIGESTS = 1024
+
     def __init__(self):
         self.cache = {}
+        # caminho -> (tamanho, mtime_ns, digest): arquivo inalterado custa só um stat().
+        # Uma entrada por caminho: um arquivo regravado substitui a própria entrada em vez de acumular versões
+        self._file_digests: OrderedDict[str, Tuple[int, int, bytes]] = OrderedDict()
     
-    def get_hash(self, image_path: Path):
-        if not image_path or not image_path.exists():
+    def get_hash(self, image: Union[Path, bytes, None]) -> Optional[bytes]:
+        """
+        Chave do cache para uma captura: aceita os bytes já em memória (evita reler o disco)
+        ou o caminho do arquivo. Digest cru de 16 bytes (BLAKE3, ou BLAKE2b sem o pacote): só é usado como chave de dict.
+        """
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return content_digest(image)
+        if not image:
             return None
-        with open(image_path, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()
+        try:
+            st = image.stat()
+        except OSError:
+            return None
+
+        key = str(image)
+        entry = self._file_digests.get(key)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            self._file_digests.move_to_end(key)
+            return entry[2]
+
+        digest = self._hash_file(image, st.st_size)
+        self._store_digest(key, st, digest)
+        return digest
+
+    def write(self, path: Path, data: bytes) -> bytes:
+        """
+        Grava a captura em `path` e devolve seu digest, calculado sobre os bytes em memória.
+        O digest fica registrado para o caminho: um get_hash(path) posterior custa só um stat().
+        """
+        path.write_bytes(data)
+        digest = content_digest(data)
+        self._store_digest(str(path), path.stat(), digest)
+        return digest
+
+    def _store_digest(self, key: str, st: os.stat_result, digest: bytes) -> None:
+        self._file_digests[key] = (st.st_size, st.st_mtime_ns, digest)
+        self._file_digests.move_to_end(key)
+        if len(self._file_digests) > self.MAX_FILE_DIGESTS:
+            self._file_digests.popitem(last=False)
+
+    @staticmethod
+    def _hash_file(image: Path, size: int) -> bytes:
+        if size == 0:
+            return content_digest(b"")
+        with image.open("rb") as f:
+            # Mapeia o arquivo: o hash lê direto do page cache, sem copiar a imagem para um bytes
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return content_digest(mm)
 
 class PilotCore:
     def __init__(self, page: Page, arm, config):
@@ -31,8 +122,13 @@ class PilotCore:
         self.config = config
         
         self.captcha_payload_queue: Queue[Optional[CaptchaPayload]] = Queue()
-        self.captcha_response_queue: Queue[CaptchaResponse] = Queue()
+        # Só o veredito mais recente interessa: fila de uma posição, cada push substitui o anterior
+        self.captcha_response_queue: Queue[CaptchaResponse] = Queue(maxsize=1)
+        # Sinalizado sempre que qualquer uma das filas recebe um item: o agente espera um único objeto
+        self.verdict_event = asyncio.Event()
         self.cr_list: List[CaptchaResponse] = []
+        # Último token aprovado: (instante monotônico, URL da página, resposta)
+        self._last_pass: Optional[Tuple[float, str, CaptchaResponse]] = None
         
         # Infrastructure Resources
         self.quota_manager = QuotaManager(config.cache_dir)
@@ -50,17 +146,41 @@ class PilotCore:
         self.page.on("response", self.task_handler)
         self.page._h_handler = self.task_handler
 
+        # HSW já injetado nesta página (URLs e digests do código): o add_init_script persiste entre
+        # navegações, então cada versão do script só precisa ser injetada uma vez por página
+        if not hasattr(self.page, "_hsw_seen"):
+            self.page._hsw_seen = (set(), set())
+
+    def _push_response(self, cr: CaptchaResponse):
+        queue = self.captcha_response_queue
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(cr)
+        self.verdict_event.set()
+
+    def _push_payload(self, payload: Optional[CaptchaPayload]):
+        self.captcha_payload_queue.put_nowait(payload)
+        self.verdict_event.set()
+
     async def task_handler(self, response: Response):
         self.network_logger.log_request()
         
         # 1. HSW Injection (Dual Context)
         if response.url.endswith("/hsw.js"):
             try:
-                LoggerHelper.log_info("Injetando script HSW (Dual Context)...", emoji='inject')
+                seen_urls, seen_digests = self.page._hsw_seen
+                if response.url in seen_urls:
+                    return
                 hsw_text = await response.text()
-                await self.page.evaluate(hsw_text)
-                if response.frame: await response.frame.evaluate(hsw_text)
-                await self.page.add_init_script(hsw_text)
+                digest = content_digest(hsw_text.encode())
+                if digest not in seen_digests:
+                    LoggerHelper.log_info("Injetando script HSW (Dual Context)...", emoji='inject')
+                    await self.page.evaluate(hsw_text)
+                    if response.frame: await response.frame.evaluate(hsw_text)
+                    await self.page.add_init_script(hsw_text)
+                    seen_digests.add(digest)
+                # Só marca como visto após injetar: uma falha deixa a próxima resposta tentar de novo
+                seen_urls.add(response.url)
             except Exception as e:
                 logger.error(f"Erro ao injetar HSW: {e}")
                 
@@ -70,30 +190,29 @@ class PilotCore:
                 if response.headers.get("content-type") == "application/json":
                     data = await response.json()
                     if data.get("pass"):
-                        while not self.captcha_response_queue.empty(): self.captcha_response_queue.get_nowait()
-                        self.captcha_response_queue.put_nowait(CaptchaResponse(**data))
+                        self._push_response(CaptchaResponse(**data))
                     elif data.get("request_config"):
-                        self.captcha_payload_queue.put_nowait(CaptchaPayload(**data))
+                        self._push_payload(CaptchaPayload(**data))
                 else:
                     raw_data = await response.body()
                     context = response.frame if response.frame else self.page
                     has_hsw = await context.evaluate("() => typeof hsw === 'function'")
                     if not has_hsw: logger.warning("HSW ausente durante binário.")
                         
-                    result = await context.evaluate("async (data) => { try { const res = await hsw(0, new Uint8Array(data)); return Array.from(res); } catch(e) { return null; } }", list(raw_data))
-                    if result:
-                        unpacked = msgpack.unpackb(bytes(result))
-                        self.captcha_payload_queue.put_nowait(CaptchaPayload(**unpacked))
-                    else: self.captcha_payload_queue.put_nowait(None)
+                    decoded = await hsw_decode(context, raw_data)
+                    if decoded:
+                        unpacked = loads_msgpack(decoded)
+                        self._push_payload(CaptchaPayload(**unpacked))
+                    else: self._push_payload(None)
             except Exception as e:
                 logger.error(f"Erro no processador de Captcha (Get): {e}")
-                self.captcha_payload_queue.put_nowait(None)
+                self._push_payload(None)
                 
         # 3. CheckCaptcha Result
         elif "/checkcaptcha/" in response.url:
             try:
                 data = await response.json()
-                self.captcha_response_queue.put_nowait(CaptchaResponse(**data))
+                self._push_response(CaptchaResponse(**data))
             except: pass
 
     async def review_challenge_type(self) -> Optional[Union[RequestType, ChallengeTypeEnum]]:
@@ -106,21 +225,18 @@ class PilotCore:
             prompt = payload.get_requester_question().lower()
             
             # Soul Alignment: Verificação de questões ignoradas (Portado da linha 1160)
-            if self.config.ignore_request_questions:
-                for q in self.config.ignore_request_questions:
-                    if q in prompt:
-                        LoggerHelper.log_warning(f"Ignorando desafio por questão proibida: '{q}'", emoji='skip')
-                        await self.arm.navigation.refresh_challenge()
-                        return None
+            ignored = next((q for q in self.config.ignore_questions if q in prompt), None)
+            if ignored is not None:
+                LoggerHelper.log_warning(f"Ignorando desafio por questão proibida: '{ignored}'", emoji='skip')
+                await self.arm.navigation.refresh_challenge()
+                return None
 
             # Keyword Overrides (Soul Alignment: Refined to avoid leakage)
             # Apenas substitui se o prompt for EXTREMAMENTE específico ou se o tipo original for ambíguo
-            drag_keywords = ["drag", "arraste", "puzzle", "segment", "arraste-o", "mova", "piece"]
-            
             # Se já for um tipo de drag conhecido pela rede, não precisamos de override pro básico
             is_already_drag = payload.request_type in [RequestType.IMAGE_DRAG_DROP]
             
-            if any(k in prompt for k in drag_keywords) or is_already_drag:
+            if is_already_drag or _DRAG_KEYWORDS_RE.search(prompt):
                 # Se detectado por palavra-chave mas o tipo é visualmente outro (ex: select), logar aviso
                 if payload.request_type not in [RequestType.IMAGE_DRAG_DROP] and not is_already_drag:
                     LoggerHelper.log_warning(f"Override agressivo detectado: '{prompt}' (Tipo real: {payload.request_type})", emoji='⚠️')
@@ -139,8 +255,7 @@ class PilotCore:
                 self.arm.crumb_count = len(payload.tasklist)
                 return ChallengeTypeEnum.IMAGE_LABEL_SINGLE_SELECT
             
-            video_keywords = ["video", "clip"]
-            if any(k in prompt for k in video_keywords):
+            if _VIDEO_KEYWORDS_RE.search(prompt):
                  LoggerHelper.log_info(f"Detectado: Desafio de vídeo (não suportado, tentando como imagem): '{prompt}'", emoji='⚠️')
                  self.arm.crumb_count = 1
                  return ChallengeTypeEnum.IMAGE_LABEL_SINGLE_SELECT
@@ -171,13 +286,44 @@ class PilotCore:
             await self.arm.challenges.handle_label_select(ctype)
         return True
 
+    async def take_fresh_cached_response(self) -> Optional[CaptchaResponse]:
+        """
+        Consome o último token aprovado se ele ainda vale para a página atual: mesma URL,
+        dentro do `expiration` devolvido pelo hCaptcha, nenhuma resposta/payload pendente e o
+        campo de resposta do widget no DOM ainda contendo esse mesmo token.
+        Tokens do hCaptcha são de uso único: um token aprovado só é devolvido uma vez.
+        """
+        if self._last_pass is None:
+            return None
+        passed_at, url, cr = self._last_pass
+        if not cr.expiration or url != self.page.url or time.monotonic() - passed_at >= cr.expiration:
+            return None
+        # Algo chegou da rede depois do token: há um desafio novo em andamento
+        if not self.captcha_response_queue.empty() or not self.captcha_payload_queue.empty():
+            return None
+        try:
+            live_tokens = await self.page.evaluate(_READ_RESPONSE_TOKENS_JS)
+        except Exception:
+            return None
+        # Submit do formulário ou reset do widget limpam/trocam o campo
+        if not live_tokens or any(token != cr.generated_pass_UUID for token in live_tokens):
+            return None
+        self._last_pass = None
+        return cr
+
     def cache_validated_response(self, cr: CaptchaResponse):
         """Implementação da linha 1055-1065 do AgentV: Salva o token de sucesso."""
         if not cr.is_pass: return
         self.cr_list.append(cr)
+        self._last_pass = (time.monotonic(), self.page.url, cr)
         try:
-            current_time = datetime.now().strftime("%Y%m%d/%Y%m%d%H%M%S%f")
-            path = self.config.captcha_response_dir.joinpath(f"{current_time}.json")
+            path = self.config.captcha_response_dir.joinpath(f"{timestamp_key()}.json")
             path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text(json.dumps(cr.model_dump(mode="json", by_alias=True), indent=2, ensure_ascii=False), encoding="utf-8")
-        except: pass
+            # .json.zst só com compress_captcha_responses: tokens acumulam por toda a execução
+            write_json(
+                path,
+                cr.model_dump(mode="json", by_alias=True),
+                compress=self.config.compress_captcha_responses,
+            )
+        except OSError as e:
+            logger.debug(f"Falha ao salvar token aprovado: {e}")
@@ -1,57 +1,104 @@
-import re
 import uuid
 import asyncio
 import random
-from typing import Tuple, Optional, Union
+from typing import Dict, Tuple, Optional, Union
 from pathlib import Path
 from contextlib import suppress
-from playwright.async_api import Page, Frame, expect
+from playwright.async_api import Error as PlaywrightError, Page, Frame, Locator
 from loguru import logger
-import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image
 
 from hcaptcha_challenger.models import RequestType, ChallengeTypeEnum
 from hcaptcha_challenger.helper.create_coordinate_grid import create_coordinate_grid
 from hcaptcha_challenger.agent.logger import LoggerHelper
 
+# Seletores usados nos laços de busca do frame: definidos uma vez para o módulo inteiro
+_CHALLENGE_VIEW_XPATH = "//div[@class='challenge-view']"
+_CRUMB_XPATH = "//div[@class='Crumb']"
+_TASK_IMAGE_XPATH = "//div[@class='task-image']"
+_REFRESH_BUTTON_XPATH = "//div[@class='refresh button']"
+
+# Todos os loading-indicators concluídos: avaliado e reavaliado pelo próprio navegador (um único round-trip)
+_LOADERS_DONE_JS = (
+    "() => Array.from(document.querySelectorAll('.loading-indicator'))"
+    ".every(e => /opacity:\\s*0/.test(e.getAttribute('style') || ''))"
+)
+
 class PilotNavigation:
     def __init__(self, page: Page, config, arm):
         self.page = page
         self.config = config
         self.arm = arm
         self.current_view_bbox: Optional[dict] = None
+        # Último frame de desafio resolvido: ((URL da página, chave do payload), frame, URL do frame)
+        self._frame_cache: Optional[Tuple[Tuple[str, str], Frame, str]] = None
+        # Locator da challenge-view por frame: construído uma vez, reaproveitado a cada tentativa da busca
+        self._view_locators: Dict[Frame, Locator] = {}
         self._checkbox_selector = "//iframe[starts-with(@src,'https://newassets.hcaptcha.com/captcha/v1/') and contains(@src, 'frame=checkbox')]"
         self._challenge_selector = "//iframe[starts-with(@src,'https://newassets.hcaptcha.com/captcha/v1/') and contains(@src, 'frame=challenge')]"
 
+    def _challenge_view(self, frame: Frame) -> Locator:
+        locator = self._view_locators.get(frame)
+        if locator is None:
+            if len(self._view_locators) >= 8:
+                self._view_locators = {f: l for f, l in self._view_locators.items() if not f.is_detached()}
+            locator = self._view_locators[frame] = frame.locator(_CHALLENGE_VIEW_XPATH)
+        return locator
+
     async def get_challenge_frame(self) -> Optional[Frame]:
-        # Busca robusta (Recursiva + Fallbacks de URL)
+        # Mesmo desafio na mesma página: reaproveita o frame já localizado (compartilhado com get_challenge_frame_locator)
+        cached = self._cached_challenge_frame()
+        if cached is not None:
+            return cached
+
         for attempt in range(20):
-            candidate = self._find_frame_recursive(self.page.main_frame)
-            if candidate:
-                with suppress(Exception):
-                    if await candidate.locator("//div[@class='challenge-view']").is_visible(timeout=1000):
-                        return candidate
-            
-            # Fallback literal por URL
-            for frame in self.page.frames:
-                if "hcaptcha.com/captcha/v1/" in frame.url and "frame=challenge" in frame.url:
-                    with suppress(Exception):
-                        if await frame.locator("//div[@class='challenge-view']").is_visible(timeout=500):
-                            return frame
+            found = await self._scan_challenge_frames()
+            if found is not None:
+                return found
             
             if attempt % 5 == 0:
                 LoggerHelper.log_info(f"Procurando frame... Tentativa {attempt+1}/20")
-            await asyncio.sleep(1)
+            await self._await_frame_activity(1.0)
         return None
 
-    def _find_frame_recursive(self, frame: Frame, depth=0) -> Optional[Frame]:
-        if depth > 4: return None
-        for child in frame.child_frames:
-            if "frame=challenge" in child.url:
-                return child
-            found = self._find_frame_recursive(child, depth + 1)
-            if found: return found
+    async def _scan_challenge_frames(self) -> Optional[Frame]:
+        """Uma única passada por page.frames, que já lista os iframes aninhados em qualquer profundidade."""
+        for frame in self.page.frames:
+            if "frame=challenge" in frame.url:
+                with suppress(Exception):
+                    if await self._challenge_view(frame).is_visible(timeout=200):
+                        return self._remember_challenge_frame(frame)
         return None
 
+    async def _await_frame_activity(self, interval: float):
+        """
+        Espera orientada a eventos entre duas varreduras, limitada a `interval` segundos.
+        Com um frame de desafio já anexado, aguarda a challenge-view ficar visível dentro do próprio
+        navegador; sem nenhum, acorda assim que um frame for anexado ou navegar.
+        """
+        candidate = next((f for f in self.page.frames if "frame=challenge" in f.url), None)
+        if candidate is not None:
+            with suppress(PlaywrightError):
+                await self._challenge_view(candidate).wait_for(state="visible", timeout=interval * 1000)
+            return
+
+        changed = asyncio.get_running_loop().create_future()
+
+        def _on_frame(_frame: Frame):
+            if not changed.done():
+                changed.set_result(None)
+
+        self.page.on("frameattached", _on_frame)
+        self.page.on("framenavigated", _on_frame)
+        try:
+            await asyncio.wait_for(changed, timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.page.remove_listener("frameattached", _on_frame)
+            self.page.remove_listener("framenavigated", _on_frame)
+
     def validate_coordinate(self, x: int, y: int) -> bool:
         """Sanity check to prevent clicking way outside. Margem de 20% para flexibilidade oficial."""
         if not self.current_view_bbox:
@@ -69,20 +116,11 @@ class PilotNavigation:
     async def wait_for_loaders(self, frame: Frame) -> bool:
         """Implementação robusta da linha 240-260 do original."""
         await asyncio.sleep(self.config.WAIT_FOR_CHALLENGE_VIEW_TO_RENDER_MS / 1000)
-        loading_indicators = frame.locator("//div[@class='loading-indicator']")
-        count = await loading_indicators.count()
-        
-        if count == 0: 
-            return True
-        
-        for i in range(count):
-            try:
-                loader = loading_indicators.nth(i)
-                await expect(loader).to_have_attribute(
-                    "style", re.compile(r"opacity:\s*0"), timeout=30000
-                )
-            except:
-                pass
+        # opacity: 0 não conta como "hidden" para o Playwright, então a checagem é feita no próprio navegador
+        try:
+            await frame.wait_for_function(_LOADERS_DONE_JS, timeout=30000)
+        except PlaywrightError:
+            pass
         return True
 
     async def capture_grid(self, frame: Frame, cache_key: Path, cid: Union[int, str]) -> Tuple[Optional[Path], Optional[Path]]:
@@ -120,16 +158,16 @@ class PilotNavigation:
             }
         """)
         
-        challenge_view = frame.locator("//div[@class='challenge-view']")
+        challenge_view = self._challenge_view(frame)
         bbox = await challenge_view.bounding_box()
         self.current_view_bbox = bbox
         
         screenshot_path = cache_key.joinpath(f"{cache_key.name}_{cid}_challenge_view.png")
         screenshot_path.parent.mkdir(parents=True, exist_ok=True)
-        await challenge_view.screenshot(type="png", path=screenshot_path, timeout=10000)
+        view_bytes = await challenge_view.screenshot(type="png", path=screenshot_path, timeout=10000)
 
         grid_img = create_coordinate_grid(
-            screenshot_path,
+            view_bytes,
             bbox,
             x_line_space_num=self.config.coordinate_grid.x_line_space_num,
             y_line_space_num=self.config.coordinate_grid.y_line_space_num,
@@ -138,37 +176,51 @@ class PilotNavigation:
         )
 
         grid_path = cache_key.joinpath(f"{cache_key.name}_{cid}_spatial_helper.png")
-        plt.imsave(str(grid_path.resolve()), grid_img)
+        Image.fromarray(np.ascontiguousarray(grid_img)).save(grid_path, format="PNG", compress_level=1)
 
         return screenshot_path, grid_path
 
+    def _frame_cache_key(self) -> Tuple[str, str]:
+        payload = getattr(self.arm, "captcha_payload", None)
+        return self.page.url, payload.key if payload else ""
+
+    def _cached_challenge_frame(self) -> Optional[Frame]:
+        """Frame do desafio atual, se nenhuma navegação o invalidou (verificação local, sem CDP)."""
+        cached = self._frame_cache
+        if cached is None:
+            return None
+        key, frame, frame_url = cached
+        if key != self._frame_cache_key() or frame.is_detached() or frame.url != frame_url:
+            self._frame_cache = None
+            return None
+        return frame
+
+    def _remember_challenge_frame(self, frame: Frame) -> Frame:
+        self._frame_cache = (self._frame_cache_key(), frame, frame.url)
+        return frame
+
     async def get_challenge_frame_locator(self) -> Optional[Frame]:
         """Implementação otimizada: Busca exaustiva pelo frame de desafio sem esperas cegas."""
+        # Mesmo desafio na mesma página: reaproveita o frame já localizado
+        cached = self._cached_challenge_frame()
+        if cached is not None:
+            return cached
+
         # Tenta uma espera curta inicial de forma não-bloqueante pesada
         try:
             await self.page.wait_for_selector("iframe[src*='hcaptcha.com/captcha/v1/']", timeout=2000)
         except Exception: pass
 
         for attempt in range(30): # Mais tentativas, mas mais rápidas
-            candidate = self._find_frame_recursive(self.page.main_frame)
-            if candidate:
-                with suppress(Exception):
-                    # Check visibility quickly
-                    if await candidate.locator("//div[@class='challenge-view']").is_visible(timeout=200):
-                        return candidate
-            
-            # Fallback por URL (mais rápido que recursão em alguns casos)
-            for frame in self.page.frames:
-                if "hcaptcha.com/captcha/v1/" in frame.url and "frame=challenge" in frame.url:
-                    with suppress(Exception):
-                        if await frame.locator("//div[@class='challenge-view']").is_visible(timeout=200):
-                            return frame
+            found = await self._scan_challenge_frames()
+            if found is not None:
+                return found
             
             if attempt % 10 == 0:
                 LoggerHelper.log_info(f"Procurando cockpit... {attempt+1}/30")
             
-            # Sleep menor (250ms em vez de 1s) para ser mais responsivo
-            await asyncio.sleep(0.25)
+            # Acorda no evento do frame/visibilidade; 250ms é só o teto entre varreduras
+            await self._await_frame_activity(0.25)
         return None
 
 
@@ -177,20 +229,20 @@ class PilotNavigation:
         frame = await self.get_challenge_frame_locator()
         if not frame: return 1
         try:
-            return await frame.locator("//div[@class='Crumb']").count() or 1
-        except: return 1
+            return await frame.locator(_CRUMB_XPATH).count() or 1
+        except PlaywrightError: return 1
 
     async def check_challenge_type(self) -> Optional[Union[RequestType, ChallengeTypeEnum]]:
         """Implementação da linha 255-280 do original: Detecta o tipo de desafio por roteamento visual."""
         frame = await self.get_challenge_frame_locator()
         if not frame: return None
         
-        samples = frame.locator("//div[@class='task-image']")
+        samples = frame.locator(_TASK_IMAGE_XPATH)
         count = await samples.count()
         if count == 9: return RequestType.IMAGE_LABEL_BINARY
         
         # Roteamento Visual via IA (ChallengeRouter)
-        challenge_view = frame.locator("//div[@class='challenge-view']")
+        challenge_view = self._challenge_view(frame)
         cache_path = self.config.cache_dir.joinpath(f"challenge_view/_artifacts/{uuid.uuid4()}.png")
         cache_path.parent.mkdir(parents=True, exist_ok=True)
         await challenge_view.screenshot(path=cache_path)
@@ -202,11 +254,14 @@ class PilotNavigation:
         """Implementação da linha 235 do original: Recarrega o desafio."""
         frame = await self.get_challenge_frame_locator()
         if frame:
-            refresh_button = frame.locator("//div[@class='refresh button']")
+            refresh_button = frame.locator(_REFRESH_BUTTON_XPATH)
             if await refresh_button.is_visible():
                 await self.arm.actions.click_by_mouse(refresh_button)
                 await asyncio.sleep(2)
                 return True
+        # Reload descarta todos os frames: a próxima busca começa do zero
+        self._frame_cache = None
+        self._view_locators.clear()
         await self.page.reload()
         await asyncio.sleep(2)
         return True
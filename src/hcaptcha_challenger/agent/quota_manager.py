@@ -1,28 +1,56 @@
 # -*- coding: utf-8 -*-
 import sqlite3
+import functools
 import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
+from typing import List, Sequence, Tuple
 from loguru import logger
 from hcaptcha_challenger.agent.logger import LoggerHelper
 
+# RETURNING (SQLite >= 3.35) devolve o valor atualizado no mesmo comando do UPSERT
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+@functools.lru_cache(maxsize=256)
+def _key_id(api_key: str, model: str) -> str:
+    # Poucas chaves se repetem em toda chamada: o digest é calculado uma única vez por par
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    return f"{key_hash}_{model}"
+
+
 class QuotaManager:
     """
     Manages API key quotas using SQLite for concurrency safety.
     Tracks exhausted (429) and unstable keys.
     Resets daily at 05:00 BRT (08:00 UTC).
     """
+    # Decisões de is_exhausted memorizadas (LRU) e por quanto tempo valem, em segundos
+    MAX_DECISIONS = 256
+    DECISION_TTL = 1.0
+
     def __init__(self, cache_dir: Path = Path("tmp/.cache")):
         self.db_path = cache_dir.joinpath("quota_manager.db")
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Uma conexão persistente por instância; o lock serializa o uso entre threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        # Instante monotônico a partir do qual is_exhausted volta a consultar o reset diário
+        self._next_reset_check = 0.0
+        # key_id -> (esgotada?, validade monotônica): rajadas sobre a mesma chave não voltam ao SQLite
+        self._decisions: OrderedDict[str, Tuple[bool, float]] = OrderedDict()
         self._init_db()
         self._check_reset()
 
-    def _get_connection(self):
-        return sqlite3.connect(self.db_path, timeout=10)
-
     def _init_db(self):
-        with self._get_connection() as conn:
+        # WAL: leitores não bloqueiam o escritor e o commit não faz fsync do journal inteiro
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        with self._lock, self._conn as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS quotas (
                     key_id TEXT PRIMARY KEY,
@@ -42,15 +70,18 @@ class QuotaManager:
             conn.commit()
 
     def _generate_key_id(self, api_key: str, model: str) -> str:
-        key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:12]
-        return f"{key_hash}_{model}"
+        return _key_id(api_key, model)
 
     def _check_reset(self):
         """Reset quotas if it's past 08:00 UTC (05:00 BRT)."""
         now_utc = datetime.now(timezone.utc)
         reset_time_today = now_utc.replace(hour=8, minute=0, second=0, microsecond=0)
+
+        # Próxima verificação em até 60s, nunca depois da virada das 08:00 UTC
+        next_reset = reset_time_today if now_utc < reset_time_today else reset_time_today + timedelta(days=1)
+        self._next_reset_check = time.monotonic() + min(60.0, (next_reset - now_utc).total_seconds())
         
-        with self._get_connection() as conn:
+        with self._lock, self._conn as conn:
             cursor = conn.execute("SELECT value FROM metadata WHERE key = 'last_reset'")
             row = cursor.fetchone()
             last_reset_str = row[0] if row else None
@@ -66,61 +97,102 @@ class QuotaManager:
             if should_reset:
                 logger.debug("Reiniciando quotas de chaves API (Reset Diário às 05:00 BRT / 08:00 UTC)")
                 conn.execute("DELETE FROM quotas")
+                self._decisions.clear()
                 conn.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES ('last_reset', ?)", (now_utc.isoformat(),))
                 conn.commit()
 
     def is_exhausted(self, api_key: str, model: str) -> bool:
-        self._check_reset()
-        key_id = self._generate_key_id(api_key, model)
-        
-        with self._get_connection() as conn:
+        if time.monotonic() >= self._next_reset_check:
+            self._check_reset()
+        return self._is_exhausted_id(self._generate_key_id(api_key, model), time.monotonic())
+
+    def available_keys(self, api_keys: Sequence[str], model: str) -> List[str]:
+        """Chaves de `api_keys` ainda utilizáveis para `model`, na ordem original."""
+        now = time.monotonic()
+        if now >= self._next_reset_check:
+            self._check_reset()
+            now = time.monotonic()
+        # Uma verificação de reset e um relógio para o lote inteiro
+        return [k for k in api_keys if not self._is_exhausted_id(_key_id(k, model), now)]
+
+    def _is_exhausted_id(self, key_id: str, now: float) -> bool:
+        # Consulta, validade e despejo sob o mesmo lock: nenhuma thread vê o OrderedDict no meio de uma mutação
+        with self._lock:
+            decision = self._decisions.get(key_id)
+            if decision is not None and now < decision[1]:
+                self._decisions.move_to_end(key_id)
+                return decision[0]
+
+            exhausted, ttl = self._lookup_exhausted(key_id)
+            self._decisions[key_id] = (exhausted, now + ttl)
+            self._decisions.move_to_end(key_id)
+            if len(self._decisions) > self.MAX_DECISIONS:
+                self._decisions.popitem(last=False)
+            return exhausted
+
+    def _forget_decision(self, key_id: str):
+        with self._lock:
+            self._decisions.pop(key_id, None)
+
+    def _lookup_exhausted(self, key_id: str) -> Tuple[bool, float]:
+        """
+        Consulta o SQLite: (esgotada?, por quantos segundos a resposta pode ser reaproveitada).
+        Chamado com self._lock já adquirido.
+        """
+        with self._conn as conn:
             cursor = conn.execute("SELECT exhausted_at, failure_count, temp_exhausted_until FROM quotas WHERE key_id = ?", (key_id,))
             row = cursor.fetchone()
-            if row:
-                exhausted_at, failure_count, temp_exhausted_until = row
-                
-                # 1. Check daily exhaustion
-                if exhausted_at:
-                    return True
-                
-                # 2. Check temporary exhaustion (cooldown)
-                if temp_exhausted_until:
-                    until_dt = datetime.fromisoformat(temp_exhausted_until)
-                    if datetime.now(timezone.utc) < until_dt:
-                        return True
-                    else:
-                        # Cooldown expired, clear it
-                        conn.execute("UPDATE quotas SET temp_exhausted_until = NULL WHERE key_id = ?", (key_id,))
-                        conn.commit()
-
-                # 3. Check instability
-                if failure_count and failure_count >= 3:
-                    return True
-        return False
+            if row is None:
+                return False, self.DECISION_TTL
+            exhausted_at, failure_count, temp_exhausted_until = row
+            
+            # 1. Check daily exhaustion
+            if exhausted_at:
+                return True, self.DECISION_TTL
+            
+            # 2. Check temporary exhaustion (cooldown)
+            if temp_exhausted_until:
+                until_dt = datetime.fromisoformat(temp_exhausted_until)
+                remaining = (until_dt - datetime.now(timezone.utc)).total_seconds()
+                if remaining > 0:
+                    # Não memoriza além do fim do cooldown
+                    return True, min(self.DECISION_TTL, remaining)
+                else:
+                    # Cooldown expired, clear it
+                    conn.execute("UPDATE quotas SET temp_exhausted_until = NULL WHERE key_id = ?", (key_id,))
+                    conn.commit()
+
+            # 3. Check instability
+            if failure_count and failure_count >= 3:
+                return True, self.DECISION_TTL
+        return False, self.DECISION_TTL
 
     def mark_exhausted(self, api_key: str, model: str):
         """Marca uma chave como esgotada com backoff exponencial."""
         key_id = self._generate_key_id(api_key, model)
         
-        with self._get_connection() as conn:
-            # Obter contador atual
-            cursor = conn.execute("SELECT backoff_count FROM quotas WHERE key_id = ?", (key_id,))
-            row = cursor.fetchone()
-            current_count = row[0] if row else 0
-            new_count = current_count + 1
-            
-            # Backoff: 30s * 2^(n-1) -> 30, 60, 120, 240... max 960 (16min)
-            backoff_seconds = min(30 * (2 ** (new_count - 1)), 960)
-            until = (datetime.now(timezone.utc) + timedelta(seconds=backoff_seconds)).isoformat()
-            
-            conn.execute("""
+        # Backoff: 30s * 2^(n-1) -> 30, 60, 120, 240... max 960 (16min)
+        # Calculado no próprio UPSERT a partir do contador anterior: dispensa o SELECT prévio
+        first_until = (datetime.now(timezone.utc) + timedelta(seconds=30)).isoformat()
+        upsert = """
                 INSERT INTO quotas (key_id, temp_exhausted_until, backoff_count) 
-                VALUES (?, ?, ?)
+                VALUES (?, ?, 1)
                 ON CONFLICT(key_id) DO UPDATE SET 
-                    temp_exhausted_until = excluded.temp_exhausted_until,
-                    backoff_count = excluded.backoff_count
-            """, (key_id, until, new_count))
+                    backoff_count = quotas.backoff_count + 1,
+                    temp_exhausted_until = strftime(
+                        '%Y-%m-%dT%H:%M:%f+00:00', 'now',
+                        '+' || (30 << min(quotas.backoff_count, 5)) || ' seconds'
+                    )
+            """
+        with self._lock, self._conn as conn:
+            if _HAS_RETURNING:
+                new_count = conn.execute(upsert + " RETURNING backoff_count", (key_id, first_until)).fetchone()[0]
+            else:
+                conn.execute(upsert, (key_id, first_until))
+                new_count = conn.execute("SELECT backoff_count FROM quotas WHERE key_id = ?", (key_id,)).fetchone()[0]
             conn.commit()
+        backoff_seconds = 30 << min(new_count - 1, 5)
+        self._forget_decision(key_id)
             
         LoggerHelper.log_warning(
             f"Chave [[highlight]{key_id}[/]] esgotada por {backoff_seconds}s (Tentativa {new_count})", 
@@ -131,39 +203,43 @@ class QuotaManager:
         """Mark a key as exhausted for a specific duration (cooldown)."""
         key_id = self._generate_key_id(api_key, model)
         until = (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
-        with self._get_connection() as conn:
+        with self._lock, self._conn as conn:
             conn.execute("""
                 INSERT INTO quotas (key_id, temp_exhausted_until) 
                 VALUES (?, ?)
                 ON CONFLICT(key_id) DO UPDATE SET temp_exhausted_until = excluded.temp_exhausted_until
             """, (key_id, until))
             conn.commit()
+        self._forget_decision(key_id)
         LoggerHelper.log_info(f"Chave [[highlight]{key_id}[/]] marcada como ESGOTAMENTO TEMPORÁRIO por [bold]{seconds}s[/]", emoji='hourglass')
 
     def mark_failure(self, api_key: str, model: str):
         """Track non-429 failures to detect unstable keys."""
         key_id = self._generate_key_id(api_key, model)
         now = datetime.now(timezone.utc).isoformat()
-        with self._get_connection() as conn:
-            conn.execute("""
+        upsert = """
                 INSERT INTO quotas (key_id, failure_count, last_failure) 
                 VALUES (?, 1, ?)
                 ON CONFLICT(key_id) DO UPDATE SET 
                     failure_count = failure_count + 1,
                     last_failure = excluded.last_failure
-            """, (key_id, now))
+            """
+        with self._lock, self._conn as conn:
+            if _HAS_RETURNING:
+                count = conn.execute(upsert + " RETURNING failure_count", (key_id, now)).fetchone()[0]
+            else:
+                conn.execute(upsert, (key_id, now))
+                # Check if it just became unstable
+                count = conn.execute("SELECT failure_count FROM quotas WHERE key_id = ?", (key_id,)).fetchone()[0]
             conn.commit()
-            
-            # Check if it just became unstable
-            cursor = conn.execute("SELECT failure_count FROM quotas WHERE key_id = ?", (key_id,))
-            count = cursor.fetchone()[0]
-            if count >= 3:
-                LoggerHelper.log_error(f"Chave [[highlight]{key_id}[/]] marcada como INSTÁVEL após {count} falhas", emoji='boom')
+        self._forget_decision(key_id)
+        if count >= 3:
+            LoggerHelper.log_error(f"Chave [[highlight]{key_id}[/]] marcada como INSTÁVEL após {count} falhas", emoji='boom')
 
     def mark_success(self, api_key: str, model: str):
         """Reseta falhas e reduz backoff após sucesso."""
         key_id = self._generate_key_id(api_key, model)
-        with self._get_connection() as conn:
+        with self._lock, self._conn as conn:
             # Reduzir backoff count em 2 para recuperação rápida, mas gradual
             conn.execute("""
                 UPDATE quotas SET 
@@ -174,3 +250,4 @@ class QuotaManager:
                 WHERE key_id = ?
             """, (key_id,))
             conn.commit()
+        self._forget_decision(key_id)
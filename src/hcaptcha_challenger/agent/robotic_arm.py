@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import asyncio
-import hashlib
+import re
 import time
 from pathlib import Path
 from typing import Optional, Tuple, List, Union
@@ -8,22 +8,22 @@ from playwright.async_api import Page, Frame
 
 from hcaptcha_challenger.models import CaptchaPayload, ChallengeTypeEnum, RequestType
 from hcaptcha_challenger.skills import SkillManager
-from hcaptcha_challenger.agent.logger import LoggerHelper, MetricsLogger, console
+from hcaptcha_challenger.agent.logger import LoggerHelper, MetricsLogger, classify_error, console
 from hcaptcha_challenger.agent.pilot import PilotActions, PilotNavigation, PilotChallenges, PilotCore
+from hcaptcha_challenger.agent.pilot.core import ImageCache
 from hcaptcha_challenger.tools import ImageClassifier, ChallengeRouter, SpatialPathReasoner, SpatialPointReasoner
+from hcaptcha_challenger.utils import loads_json
 from rich.panel import Panel
 from rich.text import Text
 from rich import box
 
-class ImageCache:
-    def __init__(self):
-        self.cache = {}
-    
-    def get_hash(self, image_path: Path) -> Optional[str]:
-        if not image_path or not image_path.exists():
-            return None
-        with open(image_path, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()
+# Sequências de escape ANSI tradicionais
+_ANSI_ESCAPE = r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])'
+_ANSI_ESCAPE_RE = re.compile(_ANSI_ESCAPE)
+# Escapes e resíduos de códigos de cores sem prefixo (ex: [32m, ;40m, 0m) numa única passada
+_ANSI_RESIDUE_RE = re.compile(_ANSI_ESCAPE + r'|\[?\d+(?:;\d+)*m')
+# Caracteres de controle invisíveis (menos \t, \n e \r), removidos pelo str.translate em C
+_CONTROL_CHARS = dict.fromkeys(i for i in range(32) if i not in (9, 10, 13))
 
 class RoboticArm:
     """
@@ -41,6 +41,8 @@ class RoboticArm:
         self.metrics = MetricsLogger()
         self._skill_manager = SkillManager(agent_config=config)
         self._image_cache = ImageCache()
+        # (lista da config, chaves em texto): revalidado pela identidade da lista
+        self._api_key_cache: Optional[Tuple[object, List[str]]] = None
         
         # IA Reasoners (Support for Groq and Gemini)
         self._init_reasoners()
@@ -86,12 +88,22 @@ class RoboticArm:
                 model=self.config.SPATIAL_POINT_REASONER_MODEL,
             )
 
+    async def aclose(self):
+        """Fecha os clientes HTTP dos provedores de IA; no Groq os quatro reasoners compartilham o mesmo."""
+        for reasoner in (
+            self._image_classifier,
+            self._challenge_router,
+            self._spatial_path_reasoner,
+            self._spatial_point_reasoner,
+        ):
+            await reasoner.aclose()
+
     async def _get_available_model_and_keys(self, preferred_model: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
         """
         Retorna modelo e chaves não esgotadas baseado em prioridade.
         Portado das linhas 75-90 do original.
         """
-        api_keys = self.config.GEMINI_API_KEYS
+        api_keys = self._api_key_strings()
         
         # Prioridade de modelos (mais leves primeiro para garantir velocidade)
         model_priority = [
@@ -106,21 +118,24 @@ class RoboticArm:
             model_priority = [preferred_model] + [m for m in model_priority if m != preferred_model]
         
         for model in model_priority:
-            available_keys = []
-            for key in api_keys:
-                key_str = key.get_secret_value() if hasattr(key, "get_secret_value") else str(key)
-                if not self.core.quota_manager.is_exhausted(key_str, model):
-                    available_keys.append(key_str)
-            
+            available_keys = self.core.quota_manager.available_keys(api_keys, model)
             if available_keys:
                 return model, available_keys
         
         # Fallback
         if api_keys:
-            k0 = api_keys[0].get_secret_value() if hasattr(api_keys[0], "get_secret_value") else str(api_keys[0])
-            return model_priority[0], [k0]
+            return model_priority[0], [api_keys[0]]
         return None, []
 
+    def _api_key_strings(self) -> List[str]:
+        """Chaves da config como texto puro, materializadas uma vez enquanto a lista não mudar."""
+        api_keys = self.config.GEMINI_API_KEYS
+        cached = self._api_key_cache
+        if cached is None or cached[0] is not api_keys:
+            keys = [k.get_secret_value() if hasattr(k, "get_secret_value") else str(k) for k in api_keys]
+            cached = self._api_key_cache = (api_keys, keys)
+        return cached[1]
+
     def _match_user_prompt(self, job_type: ChallengeTypeEnum) -> str:
         """
         Obtém o prompt específico do skill manager.
@@ -153,7 +168,9 @@ class RoboticArm:
             
             output_path = cache_key.joinpath(f"{cache_key.name}_{cid}_binary_grid.png")
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            await challenge_container.screenshot(path=output_path, timeout=5000)
+            # Captura em memória e grava uma vez: o digest sai do buffer, sem reler o PNG do disco
+            data = await challenge_container.screenshot(timeout=5000)
+            self.core.image_cache.write(output_path, data)
             return output_path
         except Exception as e:
             LoggerHelper.log_error(f"Erro ao capturar imagem do desafio: {str(e)[:100]}")
@@ -192,27 +209,25 @@ class RoboticArm:
                         log_msg["Challenge Prompt"] = log_msg.pop("Challenge Propt")
                     LoggerHelper.log_json(log_msg, title=title)
                 else:
-                    import json
-                    import re
                     msg = str(log_msg).strip()
-                    # 1. Sequências de escape ANSI tradicionais
-                    msg = re.sub(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])', '', msg)
-                    # 2. Resíduos de códigos de cores sem prefixo (ex: [32m, ;40m, 0m)
-                    msg = re.sub(r'\[?\d+(?:;\d+)*m', '', msg)
+                    # Escapes ANSI e resíduos de códigos de cores
+                    msg = _ANSI_RESIDUE_RE.sub('', msg)
                     # Remove caracteres de controle invisíveis
-                    msg = "".join(ch for ch in msg if ord(ch) >= 32 or ch in "\n\r\t")
+                    msg = msg.translate(_CONTROL_CHARS)
                     
-                    if msg.startswith('{') or msg.startswith('['):
-
+                    # Só tenta o parse quando o texto abre e fecha como JSON: markdown ou JSON truncado
+                    # vão direto para o log em texto, sem pagar por uma exceção a cada linha
+                    if msg[:1] in ('{', '[') and msg.rstrip()[-1:] in ('}', ']'):
                         try:
-                            data = json.loads(msg)
+                            data = loads_json(msg)
+                        except ValueError:
+                            data = None
+                        if data is not None:
                             if isinstance(data, dict) and "Challenge Propt" in data:
                                 data["Challenge Prompt"] = data.pop("Challenge Propt")
                             LoggerHelper.log_json(data, title=title)
-                        except json.JSONDecodeError:
-                            LoggerHelper.log_info(f"[{title}] {msg[:200]}...")
-                    else:
-                        LoggerHelper.log_info(f"[{title}] {msg[:200]}...")
+                            return
+                    LoggerHelper.log_info(f"[{title}] {msg[:200]}...")
         except Exception as e:
             LoggerHelper.log_debug(f"Falha ao formatar log da IA: {e}")
             LoggerHelper.log_info(f"[{title}] {response}")
@@ -251,14 +266,14 @@ class RoboticArm:
         """
         Log de erro de provedor de IA portado das linhas 95-120 do original.
         """
-        error_msg = str(error).lower()
+        kind = classify_error(error)
         key_info = f"🔑 Chave {current_key_index}/{total_keys}"
-        
-        if "429" in error_msg or "quota" in error_msg or "exhausted" in error_msg:
+
+        if kind == "quota":
             LoggerHelper.log_error(f"{key_info}: Quota excedida", emoji='💸')
-        elif "500" in error_msg or "internal" in error_msg:
+        elif kind == "server":
             LoggerHelper.log_error(f"{key_info}: Erro interno do servidor", emoji='🔄')
-        elif "timeout" in error_msg:
+        elif kind == "timeout":
             LoggerHelper.log_warning(f"{key_info}: Timeout", emoji='⏰')
         else:
             LoggerHelper.log_error(f"{key_info}: {str(error)[:100]}", emoji='❌')
@@ -268,9 +283,7 @@ class RoboticArm:
         Resumo elegante de falha portado da funcionalidade premium original.
         """
         # REMOVER CÓDIGOS ANSI DO ERRO
-        import re
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        clean_error = ansi_escape.sub('', error)
+        clean_error = _ANSI_ESCAPE_RE.sub('', error)
         
         summary_text = Text()
         summary_text.append(f"⏱️  Duração: {duration:.1f}s\n", style="yellow")
@@ -1,17 +1,51 @@
 import math
 import random
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+
+@lru_cache(maxsize=16)
+def _bezier_basis(steps: int) -> np.ndarray:
+    """
+    Quadratic Bernstein basis ``[(1-t)^2, 2(1-t)t, t^2]`` for ``t = i / steps``,
+    shaped (steps + 1, 3). Only depends on `steps`, so it is built once (read-only).
+    """
+    t = np.arange(steps + 1) / steps
+    basis = np.stack(((1 - t) ** 2, 2 * (1 - t) * t, t**2), axis=1)
+    basis.flags.writeable = False
+    return basis
+
+
+@lru_cache(maxsize=16)
+def _delay_profile(steps: int) -> np.ndarray:
+    """
+    Deterministic part of the drag delays: 1.5x at the ends, 0.6x in the middle,
+    following an ease in-out curve. Built once per `steps` (read-only).
+    """
+    progress = np.arange(steps + 1) / steps
+
+    # Ease in-out function (slow start, fast middle, slow end), branchless:
+    # 2p^2 while accelerating (p < 0.5), 1 + 2(p - 1)^2 while decelerating
+    second_half = progress >= 0.5
+    factor = 2 * (progress - second_half) ** 2 + second_half
+
+    # Adjust delay based on position in the curve (1.5x at ends, 0.6x in middle)
+    delay_factor = 1.5 - 0.9 * factor
+    delay_factor.flags.writeable = False
+    return delay_factor
+
 
 def _generate_bezier_trajectory(
     start: Tuple[float, float], end: Tuple[float, float], steps: int
-) -> List[Tuple[float, float]]:
+) -> np.ndarray:
     """
     Generates a quadratic bezier curve trajectory between start and end points.
+    Returns an array of shape (steps + 1, 2) with the (x, y) of each point.
     """
-    points = []
-
     # Calculate distance between points
-    distance = math.sqrt((end[0] - start[0]) ** 2 + (end[1] - start[1]) ** 2)
+    distance = math.hypot(end[0] - start[0], end[1] - start[1])
 
     # Create control point(s) for the bezier curve
     # For longer distances, we use a higher control point offset
@@ -25,40 +59,44 @@ def _generate_bezier_trajectory(
     control_x = mid_x + random.uniform(-1, 1) * distance * offset_factor
     control_y = mid_y + random.uniform(-1, 1) * distance * offset_factor
 
-    # Generate points along the bezier curve
-    for i in range(steps + 1):
-        t = i / steps
-        # Quadratic bezier formula
-        x = (1 - t) ** 2 * start[0] + 2 * (1 - t) * t * control_x + t**2 * end[0]
-        y = (1 - t) ** 2 * start[1] + 2 * (1 - t) * t * control_y + t**2 * end[1]
-        points.append((x, y))
-
-    return points
+    # Evaluate the quadratic bezier for every t at once: cached basis x control points
+    control_points = np.array((start, (control_x, control_y), end), dtype=float)
+    return _bezier_basis(steps) @ control_points
 
 
-def _generate_dynamic_delays(steps: int, base_delay: int) -> List[float]:
+def _generate_dynamic_delays(steps: int, base_delay: int) -> np.ndarray:
     """
     Generates dynamic delays between mouse movements to simulate human-like acceleration/deceleration.
     """
-    delays = []
-
-    # Acceleration profile: slower at start and end, faster in the middle
-    for i in range(steps + 1):
-        progress = i / steps
-
-        # Ease in-out function (slow start, fast middle, slow end)
-        if progress < 0.5:
-            factor = 2 * progress * progress  # Accelerate
-        else:
-            progress = progress - 1
-            factor = 1 - (-2 * progress * progress)  # Decelerate
+    # Only the slight randomness (±10%) is drawn per call; the profile is cached.
+    # Scaled in place: the freshly drawn buffer becomes the result, no temporaries
+    delays = np.random.uniform(0.9, 1.1, steps + 1)
+    delays *= _delay_profile(steps)
+    delays *= base_delay
+    return delays
 
-        # Adjust delay based on position in the curve (1.5x at ends, 0.6x in middle)
-        delay_factor = 1.5 - 0.9 * factor
 
-        # Add slight randomness to delays (±10%)
-        random_factor = random.uniform(0.9, 1.1)
+@lru_cache(maxsize=16)
+def _drag_noise_scales(steps: int) -> np.ndarray:
+    """
+    Per-point noise amplitude for a drag of `steps + 1` points, shaped (steps + 1, 1):
+    0 in the first 70% of the movement, 0.2px up to 90%, 0.5px near the end.
+    Identical for a given `steps`, so it is built once and reused (read-only).
+    """
+    idx = np.arange(steps + 1)
+    scales = np.zeros(steps + 1)
+    scales[idx > steps * 0.7] = 0.2
+    scales[idx > steps * 0.9] = 0.5
+    scales = scales[:, None]
+    scales.flags.writeable = False
+    return scales
 
-        delays.append(base_delay * delay_factor * random_factor)
 
-    return delays
+def _generate_drag_noise(steps: int) -> np.ndarray:
+    """
+    Micro-adjustment noise for a drag trajectory of `steps + 1` points,
+    more pronounced near the end (see `_drag_noise_scales`).
+    """
+    noise = np.random.uniform(-1, 1, (steps + 1, 2))
+    noise *= _drag_noise_scales(steps)
+    return noise
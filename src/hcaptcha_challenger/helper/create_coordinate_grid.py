@@ -1,9 +1,13 @@
+import functools
 from pathlib import Path
-from typing import Union, TypedDict, Tuple, List
+from typing import Callable, Union, TypedDict, Tuple, List
 
 import cv2
-import matplotlib.pyplot as plt
+import matplotlib
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
 
 
 class FloatRect(TypedDict):
@@ -13,43 +17,99 @@ class FloatRect(TypedDict):
     height: float
 
 
-def _create_adaptive_contrast_grid(
-    image: np.ndarray,
+def _bbox_tuple(
     bbox: Union[FloatRect, Tuple[float, float, float, float], List[float]],
-    *,
-    x_line_space_num: int = 11,
-    y_line_space_num: int = 20,
-    tick_labels_size: int = 12,
-) -> np.ndarray:
-    """
-    Create coordinate grids with adaptive contrast colors.
+) -> Tuple[float, float, float, float]:
+    if isinstance(bbox, dict):
+        return bbox['x'], bbox['y'], bbox['width'], bbox['height']
+    x, y, width, height = bbox
+    return x, y, width, height
 
-    Args:
-        image: Input image (numpy array).
-        bbox: Bounding box of image in web page (x, y, width, height).
-        x_line_space_num: Number of vertical grid lines. Defaults to 11.
-        y_line_space_num: Number of horizontal grid lines. Defaults to 20.
-        tick_labels_size: Font size of the axis tick labels. Defaults to 12.
 
-    Returns:
-        Processed image with adaptive contrasting color coordinate grid.
-    """
-    img = image.copy()
+def _new_figure() -> Tuple[Figure, "matplotlib.axes.Axes"]:
+    # Standalone Agg figure: no pyplot backend selection or global figure registry,
+    # so nothing has to be closed afterwards
+    fig = Figure(figsize=(10, 10))
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
 
-    if isinstance(bbox, dict):
-        x, y = bbox['x'], bbox['y']
-        width, height = bbox['width'], bbox['height']
-    else:
-        x, y, width, height = bbox
 
-    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-    avg_brightness = np.mean(gray) / 255
+def _figure_to_rgb(fig: Figure) -> np.ndarray:
+    fig.canvas.draw()
+    # Get the RGBA buffer from the figure
+    buf = fig.canvas.buffer_rgba()  # type: ignore[attr-defined]
+    img_with_grid = np.frombuffer(buf, dtype=np.uint8)
+    img_with_grid = img_with_grid.reshape(fig.canvas.get_width_height()[::-1] + (4,))
 
-    grid_color = 'black' if avg_brightness > 0.5 else 'white'
+    # Convert RGBA to RGB
+    return cv2.cvtColor(img_with_grid, cv2.COLOR_RGBA2RGB)
 
-    cmap_name = 'hot' if avg_brightness < 0.5 else 'cool'
 
-    fig, ax = plt.subplots(figsize=(10, 10))
+@functools.lru_cache(maxsize=4)
+def _grid_overlay(
+    render: Callable[..., np.ndarray], *args
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Tuple[slice, slice]]:
+    """
+    Render the figure once over a black and once over a white image to recover the
+    overlay (ticks, labels, grid lines, patches) independently of the image content.
+
+    Matplotlib composites everything drawn above the image linearly, so for any image
+    ``I`` the rendered figure is ``base + gain * I``, where ``base`` is the render over
+    black and ``gain`` is how much of the image shows through at each pixel.
+
+    Returns:
+        ``(frame, base, gain, region)``: ``frame`` is the full uint8 render over black,
+        ``base`` and ``gain`` are float32 arrays cropped to ``region``, the slices of the
+        area the image is drawn into.
+    """
+    black = render(np.zeros((2, 2, 3), np.uint8), *args)
+    white = render(np.full((2, 2, 3), 255, np.uint8), *args)
+
+    base = black.astype(np.float32)
+    gain = (white.astype(np.float32) - base) / 255.0
+
+    visible = gain.max(axis=2) > 0
+    rows, cols = np.flatnonzero(visible.any(axis=1)), np.flatnonzero(visible.any(axis=0))
+    region = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+
+    # Only the image area depends on the input: keep the float planes for that crop
+    # and a ready-made uint8 frame for everything around it
+    base = np.ascontiguousarray(base[region])
+    gain = np.ascontiguousarray(gain[region])
+    for array in (black, base, gain):
+        array.setflags(write=False)
+    return black, base, gain, region
+
+
+def _compose_grid(render: Callable[..., np.ndarray], img: np.ndarray, *args) -> np.ndarray:
+    """Blend ``img`` under the cached overlay for ``(render, *args)``."""
+    frame, base, gain, region = _grid_overlay(render, *args)
+    h, w = base.shape[:2]
+
+    interpolation = cv2.INTER_AREA if img.shape[0] > h or img.shape[1] > w else cv2.INTER_LINEAR
+    fitted = cv2.resize(img, (w, h), interpolation=interpolation).astype(np.float32)
+
+    # Vectorized in place over the image area only; the rest of the frame is copied as is
+    np.multiply(fitted, gain, out=fitted)
+    np.add(fitted, base, out=fitted)
+    out = frame.copy()
+    out[region] = cv2.convertScaleAbs(fitted)
+    return out
+
+
+def _render_adaptive_contrast_grid(
+    img: np.ndarray,
+    x: float,
+    y: float,
+    width: float,
+    height: float,
+    x_line_space_num: int,
+    y_line_space_num: int,
+    tick_labels_size: int,
+    grid_color: str,
+    cmap_name: str,
+) -> np.ndarray:
+    fig, ax = _new_figure()
 
     ax.imshow(img, extent=(x, x + width, y + height, y))
 
@@ -80,14 +140,14 @@ def _create_adaptive_contrast_grid(
     ax.grid(True, color=grid_color, alpha=0.7, linestyle='-', linewidth=1.0)
 
     n_colors = x_line_space_num * y_line_space_num
-    colors = plt.cm.get_cmap(cmap_name, n_colors)
+    colors = matplotlib.colormaps[cmap_name].resampled(n_colors)
 
     for i, x_val in enumerate(x_ticks[:-1]):
         for j, y_val in enumerate(y_ticks[:-1]):
             color_idx = i + j * (x_line_space_num - 1)
             cell_color = colors(color_idx / n_colors)
             ax.add_patch(
-                plt.Rectangle(
+                Rectangle(
                     (x_val, y_val),  # type: ignore[arg-type]
                     x_ticks[i + 1] - x_val,  # type: ignore[arg-type]
                     y_ticks[j + 1] - y_val,  # type: ignore[arg-type]
@@ -103,23 +163,53 @@ def _create_adaptive_contrast_grid(
 
     ax.set_title('Adaptive Contrast Coordinate Grid', color=grid_color)
 
-    plt.tight_layout()
+    fig.tight_layout()
 
-    fig.canvas.draw()
-    # Get the RGBA buffer from the figure
-    buf = fig.canvas.buffer_rgba()  # type: ignore[attr-defined]
-    img_with_grid = np.frombuffer(buf, dtype=np.uint8)
-    img_with_grid = img_with_grid.reshape(fig.canvas.get_width_height()[::-1] + (4,))
+    return _figure_to_rgb(fig)
 
-    plt.close(fig)
 
-    img_with_grid = cv2.cvtColor(img_with_grid, cv2.COLOR_RGBA2RGB)
+def _create_adaptive_contrast_grid(
+    image: np.ndarray,
+    bbox: Union[FloatRect, Tuple[float, float, float, float], List[float]],
+    *,
+    x_line_space_num: int = 11,
+    y_line_space_num: int = 20,
+    tick_labels_size: int = 12,
+) -> np.ndarray:
+    """
+    Create coordinate grids with adaptive contrast colors.
 
-    return img_with_grid
+    Args:
+        image: Input image (numpy array).
+        bbox: Bounding box of image in web page (x, y, width, height).
+        x_line_space_num: Number of vertical grid lines. Defaults to 11.
+        y_line_space_num: Number of horizontal grid lines. Defaults to 20.
+        tick_labels_size: Font size of the axis tick labels. Defaults to 12.
+
+    Returns:
+        Processed image with adaptive contrasting color coordinate grid.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    avg_brightness = np.mean(gray) / 255
+
+    grid_color = 'black' if avg_brightness > 0.5 else 'white'
+
+    cmap_name = 'hot' if avg_brightness < 0.5 else 'cool'
+
+    return _compose_grid(
+        _render_adaptive_contrast_grid,
+        image,
+        *_bbox_tuple(bbox),
+        x_line_space_num,
+        y_line_space_num,
+        tick_labels_size,
+        grid_color,
+        cmap_name,
+    )
 
 
 def create_coordinate_grid(
-    image: Union[str, np.ndarray, Path],
+    image: Union[str, np.ndarray, Path, bytes],
     bbox: Union[FloatRect, Tuple[float, float, float, float], List[float]],
     *,
     x_line_space_num: int = 11,
@@ -132,7 +222,7 @@ def create_coordinate_grid(
     Convert a web image to a scientific-style coordinate system image.
 
     Args:
-        image: Input image (path or numpy array).
+        image: Input image (path, numpy array, or encoded PNG/JPEG bytes).
         bbox: Bounding box (x, y, width, height) of the image in the webpage.
         x_line_space_num: Number of vertical grid lines. Defaults to 11.
         y_line_space_num: Number of horizontal grid lines. Defaults to 20.
@@ -149,6 +239,12 @@ def create_coordinate_grid(
         if img is None:
             raise FileNotFoundError(f"Could not load image from {image}")
         img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    elif isinstance(image, (bytes, bytearray, memoryview)):
+        # Decode an in-memory capture directly, skipping the disk round-trip
+        img = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Could not decode image bytes")
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     else:
         img = image.copy()
 
@@ -162,15 +258,32 @@ def create_coordinate_grid(
             tick_labels_size=tick_labels_size,
         )
 
-    # Extract bbox parameters
-    if isinstance(bbox, dict):
-        x, y = bbox['x'], bbox['y']
-        width, height = bbox['width'], bbox['height']
-    else:
-        x, y, width, height = bbox
-
+    # The overlay only depends on the bbox and grid settings: it is rendered once per
+    # combination and the image is blended under it
+    return _compose_grid(
+        _render_coordinate_grid,
+        img,
+        *_bbox_tuple(bbox),
+        x_line_space_num,
+        y_line_space_num,
+        tick_labels_size,
+        color,
+    )
+
+
+def _render_coordinate_grid(
+    img: np.ndarray,
+    x: float,
+    y: float,
+    width: float,
+    height: float,
+    x_line_space_num: int,
+    y_line_space_num: int,
+    tick_labels_size: int,
+    color: str,
+) -> np.ndarray:
     # Create figure with appropriate size
-    fig, ax = plt.subplots(figsize=(10, 10))
+    fig, ax = _new_figure()
 
     # Display the image
     ax.imshow(img, extent=(x, x + width, y + height, y))  # Note the y-axis inversion
@@ -213,19 +326,7 @@ def create_coordinate_grid(
     ax.set_title('Image with Coordinate Grid')
 
     # Tight layout
-    plt.tight_layout()
+    fig.tight_layout()
 
     # Convert matplotlib figure to numpy array
-    fig.canvas.draw()
-    # Get the RGBA buffer from the figure
-    buf = fig.canvas.buffer_rgba()  # type: ignore[attr-defined]
-    img_with_grid = np.frombuffer(buf, dtype=np.uint8)
-    img_with_grid = img_with_grid.reshape(fig.canvas.get_width_height()[::-1] + (4,))
-
-    # Close the figure to free memory
-    plt.close(fig)
-
-    # Convert RGBA to RGB
-    img_with_grid = cv2.cvtColor(img_with_grid, cv2.COLOR_RGBA2RGB)
-
-    return img_with_grid
+    return _figure_to_rgb(fig)
@@ -11,7 +11,7 @@ from enum import Enum
 from typing import Literal, List, Dict, Any, Union
 from uuid import uuid4
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 # Known Unicode homoglyphs mapping (legacy, kept for reference)
 BAD_CODE = {
@@ -152,6 +152,9 @@ class CaptchaPayload(BaseModel):
     normalized: bool | None = Field(default=None)
     c: Token = Field(default_factory=dict)
 
+    # Serialized JSON snapshot, memoized by hcaptcha_challenger.agent.config.create_cache_key
+    _cached_json: bytes | None = PrivateAttr(default=None)
+
     def get_requester_question(self, language: str = "en") -> str:
         rq = self.requester_question.get(language, "unknown")
         return normalize_unicode_text(rq)
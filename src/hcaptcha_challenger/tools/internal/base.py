@@ -84,6 +84,12 @@ class Reasoner(ABC, Generic[ModelT, ResponseT]):
         """
         raise NotImplementedError
 
+    async def aclose(self) -> None:
+        """Release the provider's network resources, if it holds any."""
+        aclose_fn = getattr(self._provider, "aclose", None)
+        if aclose_fn is not None and callable(aclose_fn):
+            await aclose_fn()
+
     def cache_response(self, path: Path) -> None:
         """
         Cache the last response to a file.
@@ -5,34 +5,67 @@ GeminiProvider - Google Gemini API implementation.
 This provider wraps the google-genai SDK to provide image-based content generation.
 """
 import asyncio
-import json
+import io
+import mimetypes
+import re
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Type, TypeVar, cast
+from typing import List, Optional, Tuple, Type, TypeVar, cast
 
 from google import genai
 from google.genai import types, errors
 from loguru import logger
 from pydantic import BaseModel
-from tenacity import retry, stop_after_attempt, wait_fixed
-from hcaptcha_challenger.agent.logger import LoggerHelper
+from hcaptcha_challenger.agent.logger import LoggerHelper, classify_error
 
 from hcaptcha_challenger.models import THINKING_LEVEL_MODELS
+from hcaptcha_challenger.utils import content_digest, dumps_json, image_mime_type, loads_json
 from hcaptcha_challenger.agent.quota_manager import QuotaManager
 
 ResponseT = TypeVar("ResponseT", bound=BaseModel)
 
+# Cooldown hints in 429 responses: "retry in Xs" or "retryDelay: 'Xs'"
+_RETRY_IN_RE = re.compile(r"retry in (\d+\.?\d*)s")
+_RETRY_DELAY_RE = re.compile(r"retryDelay':\s*'(\d+)s'")
+
+
+class _PooledClient:
+    """A pooled genai.Client and how many providers currently hold it."""
+
+    __slots__ = ("client", "refs")
+
+    def __init__(self, client: genai.Client):
+        self.client = client
+        self.refs = 0
+
+
+# One client per (event loop, API key): rotating back to a key reuses its warm HTTP
+# session instead of rebuilding the client, while aio sessions never cross event loops.
+# Weakly keyed, so the pool of a finished loop goes away with it
+_CLIENT_POOLS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, _PooledClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
 
 def extract_first_json_block(text: str) -> dict | None:
     """Extract the first JSON code block from text."""
-    import re
-
     pattern = r"```json\s*([\s\S]*?)```"
     matches = re.findall(pattern, text)
     if matches:
-        return json.loads(matches[0])
+        return loads_json(matches[0])
     return None
 
 
+def _read_exact(path: Path, size: int) -> bytes:
+    """Read a file whose size is already known in one unbuffered, right-sized read."""
+    with open(path, "rb", buffering=0) as f:
+        data = f.read(size)
+        # Grew since the stat(): read the rest so nothing is silently dropped
+        return data + f.read() if len(data) == size else data
+
+
 class GeminiProvider:
     """
     Gemini-based chat provider implementation.
@@ -41,6 +74,16 @@ class GeminiProvider:
     swap out for other providers in the future.
     """
 
+    # Uploads in flight at once: keeps a multi-file request from flooding the shared client session
+    MAX_CONCURRENT_UPLOADS = 4
+    # Remote files remembered per content digest, so retries of the same capture skip the upload
+    MAX_CACHED_UPLOADS = 64
+    # Media sent inline with the request, up to this many bytes in total (Gemini caps a request
+    # at 20 MB, the rest is headroom for prompt and schema); anything beyond goes through files.upload
+    MAX_INLINE_BYTES = 18_000_000
+    # Attempts per request; every failure rotates key/model before the next one (no wait)
+    MAX_ATTEMPTS = 30
+
     def __init__(self, api_key: str | List[str], model: str | List[str]):
         """
         Initialize the Gemini provider.
@@ -61,9 +104,13 @@ class GeminiProvider:
         
         self._key_index = 0
         self._model_index = 0
-        self._client: genai.Client | None = None
         self._response: types.GenerateContentResponse | None = None
         self._quota_manager = QuotaManager()
+        self._upload_sem = asyncio.Semaphore(self.MAX_CONCURRENT_UPLOADS)
+        # (content digest, mime type) -> uploaded file; files belong to the key that uploaded them
+        self._upload_cache: OrderedDict[Tuple[bytes, str], types.File] = OrderedDict()
+        # (id of the event loop, API key) -> (that loop's pool, pooled client) held by this provider
+        self._leases: dict[Tuple[int, str], Tuple[dict, _PooledClient]] = {}
 
     @property
     def model(self) -> str:
@@ -74,7 +121,7 @@ class GeminiProvider:
         """Rotate to the next API key in the list. If all keys used, rotate model."""
         if len(self._api_keys) > 1:
             self._key_index = (self._key_index + 1) % len(self._api_keys)
-            self._client = None  # Force client re-initialization
+            self._upload_cache.clear()  # Uploaded files are only visible to the key that created them
             LoggerHelper.log_info(f"Rotacionando chave API Gemini. Novo índice: {self._key_index}", emoji='refresh')
             
             # If we wrapped around to the first key, rotate the model too
@@ -92,28 +139,145 @@ class GeminiProvider:
 
     @property
     def client(self) -> genai.Client:
-        """Lazy-initialize the Gemini client."""
-        if self._client is None:
-            self._client = genai.Client(api_key=self._api_keys[self._key_index])
-        return self._client
+        """
+        Gemini client for the current API key on the running event loop, created on
+        first use and then pooled. The provider holds a reference until `aclose()`.
+        """
+        api_key = self._api_keys[self._key_index]
+        loop = asyncio.get_running_loop()
+        # No await between lookup and insert, so concurrent tasks cannot build it twice
+        pool = _CLIENT_POOLS.get(loop)
+        if pool is None:
+            pool = _CLIENT_POOLS[loop] = {}
+        entry = pool.get(api_key)
+        if entry is None:
+            entry = pool[api_key] = _PooledClient(genai.Client(api_key=api_key))
+        lease = (id(loop), api_key)
+        if lease not in self._leases:
+            entry.refs += 1
+            self._leases[lease] = (pool, entry)
+        return entry.client
+
+    async def aclose(self) -> None:
+        """
+        Release the pooled clients this provider acquired. A client is closed once its
+        last holder releases it; clients other providers still use stay open.
+        """
+        running_id = id(asyncio.get_running_loop())
+        leases, self._leases = self._leases, {}
+        for (loop_id, api_key), (pool, entry) in leases.items():
+            entry.refs -= 1
+            if entry.refs > 0:
+                continue
+            if pool.get(api_key) is entry:
+                del pool[api_key]
+            # The aio session belongs to its own loop; from any other loop only the sync side can be closed
+            if loop_id == running_id:
+                await entry.client.aio.aclose()
+            entry.client.close()
 
     @property
     def last_response(self) -> types.GenerateContentResponse | None:
         """Get the last response for debugging/caching purposes."""
         return self._response
 
-    async def _upload_files(self, files: List[Path]) -> list[types.File]:
-        """Upload multiple files concurrently."""
-        valid_files = [f for f in files if f and Path(f).exists()]
-        if not valid_files:
+    async def _bounded_upload(self, file: Path | io.IOBase, config: types.UploadFileConfig | None = None) -> types.File:
+        """Upload one file, waiting for a free slot in the upload semaphore."""
+        async with self._upload_sem:
+            return await self.client.aio.files.upload(file=file, config=config)
+
+    def _cached_upload(self, key: Tuple[bytes, str]) -> Optional[types.File]:
+        """Previously uploaded file for `key`, unless it is about to expire on the server."""
+        cached = self._upload_cache.get(key)
+        if cached is None:
+            return None
+        expires = cached.expiration_time
+        if expires is not None and expires - datetime.now(timezone.utc) < timedelta(minutes=5):
+            del self._upload_cache[key]
+            return None
+        self._upload_cache.move_to_end(key)
+        return cached
+
+    async def _upload_one(self, f: Path | bytes) -> types.File:
+        """Upload a single file (path or encoded image bytes), reusing an earlier upload of the same content."""
+        if isinstance(f, (bytes, bytearray)):
+            data = f
+            mime_type = image_mime_type(f)
+        else:
+            data = await asyncio.to_thread(Path(f).read_bytes)
+            mime_type = None
+
+        key = (content_digest(data), mime_type or "")
+        cached = self._cached_upload(key)
+        if cached is not None:
+            return cached
+
+        if mime_type is None:
+            uploaded = await self._bounded_upload(f)
+        else:
+            uploaded = await self._bounded_upload(io.BytesIO(data), types.UploadFileConfig(mime_type=mime_type))
+
+        self._upload_cache[key] = uploaded
+        if len(self._upload_cache) > self.MAX_CACHED_UPLOADS:
+            self._upload_cache.popitem(last=False)
+        return uploaded
+
+    async def _upload_files(self, files: List[Path | bytes]) -> list[types.File]:
+        """Upload multiple files (paths or encoded image bytes) concurrently, in input order."""
+        upload_tasks = [
+            self._upload_one(f)
+            for f in files
+            if isinstance(f, (bytes, bytearray)) or (f and Path(f).exists())
+        ]
+        if not upload_tasks:
             return []
-        upload_tasks = [self.client.aio.files.upload(file=f) for f in valid_files]
         return list(await asyncio.gather(*upload_tasks))
 
+    async def _media_parts(self, media: List[Path | bytes]) -> List[types.Part]:
+        """
+        Build the request parts for `media`, in order. Small inputs are embedded inline,
+        skipping the upload round-trip; what does not fit MAX_INLINE_BYTES is uploaded.
+        """
+        parts: List[types.Part | None] = []
+        to_upload: dict[int, Path | bytes] = {}
+        budget = self.MAX_INLINE_BYTES
+        for f in media:
+            if isinstance(f, (bytes, bytearray)):
+                data, mime_type = f, image_mime_type(f)
+            elif f:
+                path = Path(f)
+                # One stat() doubles as the existence check and sizes the read buffer
+                try:
+                    size = path.stat().st_size
+                except OSError:
+                    continue
+                if size > budget:
+                    to_upload[len(parts)] = f
+                    parts.append(None)
+                    continue
+                data = await asyncio.to_thread(_read_exact, path, size)
+                mime_type = mimetypes.guess_type(path.name)[0] or image_mime_type(data)
+            else:
+                continue
+
+            if len(data) > budget:
+                to_upload[len(parts)] = f
+                parts.append(None)
+                continue
+            budget -= len(data)
+            parts.append(types.Part.from_bytes(data=bytes(data), mime_type=mime_type))
+
+        if to_upload:
+            uploaded = self._files_to_parts(await self._upload_files(list(to_upload.values())))
+            for index, part in zip(to_upload, uploaded):
+                parts[index] = part
+        return cast(List[types.Part], parts)
+
     @staticmethod
-    def _files_to_parts(files: List[types.File]) -> List[types.Part]:
-        """Convert uploaded files to parts."""
-        return [types.Part.from_uri(file_uri=f.uri, mime_type=f.mime_type) for f in files]
+    def _files_to_parts(files: List[types.File]) -> Tuple[types.Part, ...]:
+        """Convert uploaded files to parts (read once by the caller, so a tuple is enough)."""
+        from_uri = types.Part.from_uri
+        return tuple(from_uri(file_uri=f.uri, mime_type=f.mime_type) for f in files)
 
     def _set_thinking_config(self, config: types.GenerateContentConfig) -> None:
         """Configure thinking settings based on model capabilities."""
@@ -126,17 +290,10 @@ class GeminiProvider:
                 include_thoughts=False, thinking_level=thinking_level
             )
 
-    @retry(
-        stop=stop_after_attempt(30),  # 3 cycles of (keys * models)
-        wait=wait_fixed(0),           # 0s wait between attempts (instant rotation)
-        before_sleep=lambda retry_state: LoggerHelper.log_provider_error(
-            retry_state.attempt_number, 30, retry_state.outcome.exception()
-        ),
-    )
     async def generate_with_media(
         self,
         *,
-        media: List[Path],
+        media: List[Path | bytes],
         response_schema: Type[ResponseT],
         user_prompt: str | None = None,
         description: str | None = None,
@@ -146,7 +303,7 @@ class GeminiProvider:
         Generate content with media inputs (images/videos).
 
         Args:
-            media: List of media file paths to include in the request.
+            media: List of media file paths (or encoded image bytes) to include in the request.
             user_prompt: User-provided prompt/instructions.
             description: System instruction/description for the model.
             response_schema: Pydantic model class for structured output.
@@ -154,16 +311,50 @@ class GeminiProvider:
 
         Returns:
             Parsed response matching the response_schema type.
+
+        Each failed attempt has already rotated the key/model, so the next one starts
+        right away; after MAX_ATTEMPTS the last error is raised.
         """
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                return await self._generate_once(
+                    media=media,
+                    response_schema=response_schema,
+                    user_prompt=user_prompt,
+                    description=description,
+                )
+            except Exception as e:
+                if attempt == self.MAX_ATTEMPTS:
+                    raise
+                LoggerHelper.log_provider_error(attempt, self.MAX_ATTEMPTS, e)
+        raise AssertionError("unreachable")
+
+    async def _generate_once(
+        self,
+        *,
+        media: List[Path | bytes],
+        response_schema: Type[ResponseT],
+        user_prompt: str | None,
+        description: str | None,
+    ) -> ResponseT:
+        """Single attempt of generate_with_media with the current key and model."""
         # Check if current key/model is already known to be exhausted or unstable
         if self._quota_manager.is_exhausted(self._api_keys[self._key_index], self.model):
             LoggerHelper.log_info(f"Pulando chave esgotada/instável para o modelo [{self.model}]", emoji='hourglass')
             self.rotate_key()
-            raise errors.ClientError("Pre-checked RESOURCE_EXHAUSTED/UNSTABLE (Quota Manager)")
+            raise errors.ClientError(
+                429,
+                {
+                    "error": {
+                        "code": 429,
+                        "message": "Pre-checked RESOURCE_EXHAUSTED/UNSTABLE (Quota Manager)",
+                        "status": "RESOURCE_EXHAUSTED",
+                    }
+                },
+            )
 
-        # Upload files
-        uploaded_files = await self._upload_files(media)
-        parts = self._files_to_parts(uploaded_files)
+        # Inline media (uploads only what exceeds the inline budget)
+        parts = await self._media_parts(media)
 
         # Add user prompt if provided
         if user_prompt and isinstance(user_prompt, str):
@@ -191,16 +382,12 @@ class GeminiProvider:
             )
         except errors.ClientError as e:
             # If 429 RESOURCE_EXHAUSTED, rotate key for the next retry
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                # Try to extract retry delay (cooldown)
+            if classify_error(e) == "quota":
+                # Try to extract retry delay (cooldown); only quota errors need the message text
+                err_s = str(e)
                 retry_seconds = 0
                 try:
-                    # Look for "retry in Xs" or "retryDelay: 'Xs'"
-                    import re
-                    match = re.search(r"retry in (\d+\.?\d*)s", str(e))
-                    if not match:
-                        match = re.search(r"retryDelay':\s*'(\d+)s'", str(e))
-                    
+                    match = _RETRY_IN_RE.search(err_s) or _RETRY_DELAY_RE.search(err_s)
                     if match:
                         retry_seconds = int(float(match.group(1))) + 1 # Add 1s buffer
                 except Exception:
@@ -228,10 +415,13 @@ class GeminiProvider:
         # Parse response
         if self._response.parsed:
             parsed = self._response.parsed
+            # The SDK already validated against response_schema: hand that instance back as is
+            if isinstance(parsed, response_schema):
+                return parsed
             if isinstance(parsed, BaseModel):
-                return response_schema(**parsed.model_dump())
+                return response_schema.model_validate(parsed, from_attributes=True)
             if isinstance(parsed, dict):
-                return response_schema(**cast(dict[str, object], parsed))
+                return response_schema.model_validate(parsed)
 
         # Fallback to JSON extraction
         if response_text := self._response.text:
@@ -244,7 +434,7 @@ class GeminiProvider:
     async def generate_with_images(
         self,
         *,
-        images: List[Path],
+        images: List[Path | bytes],
         response_schema: Type[ResponseT],
         user_prompt: str | None = None,
         description: str | None = None,
@@ -265,9 +455,6 @@ class GeminiProvider:
             return
         try:
             path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text(
-                json.dumps(self._response.model_dump(mode="json"), indent=2, ensure_ascii=False),
-                encoding="utf-8",
-            )
+            path.write_bytes(dumps_json(self._response.model_dump(mode="json")))
         except Exception as e:
             LoggerHelper.log_warning(f"Falha ao salvar cache de resposta: {e}")
@@ -5,8 +5,9 @@ GroqProvider - Groq API implementation using Llama 3.2 Vision.
 This provider uses httpx to call the Groq API, providing a high-quota 
 alternative to Gemini for image-based content generation.
 """
-import base64
-import json
+import asyncio
+import functools
+import re
 from pathlib import Path
 from typing import List, Type, TypeVar, Any
 
@@ -15,10 +16,46 @@ from loguru import logger
 from pydantic import BaseModel
 from tenacity import retry, stop_after_attempt, wait_fixed
 from hcaptcha_challenger.agent.logger import LoggerHelper
+from hcaptcha_challenger.utils import b64encode_str, dumps_json, image_mime_type, loads_json
 
 ResponseT = TypeVar("ResponseT", bound=BaseModel)
 
 
+_DIGIT_PAIR_RE = re.compile(r"(\d)(\d)")
+
+
+def _normalize_box_2d(values: list) -> list:
+    """
+    Coerce a box_2d answer to at most two values: "01" -> 0, 1 and "3" -> 3.
+    Anything else is kept as-is for the schema to validate.
+    """
+    normalized = []
+    for val in values:
+        match val:
+            case str() if pair := _DIGIT_PAIR_RE.fullmatch(val):
+                normalized += (int(pair[1]), int(pair[2]))
+            case str() if val.isdigit():
+                normalized.append(int(val))
+            case _:
+                normalized.append(val)
+        # Only the first two values are kept: stop as soon as they are known
+        if len(normalized) >= 2:
+            break
+    return normalized[:2]
+
+
+@functools.lru_cache(maxsize=64)
+def _schema_instruction_for(schema_cls: Type[BaseModel] | None) -> str:
+    """
+    Schema hint appended to the prompt; built once per class, as compact JSON.
+    Empty for anything that is not a pydantic model, so callers need no type check.
+    """
+    if not (isinstance(schema_cls, type) and issubclass(schema_cls, BaseModel)):
+        return ""
+    schema = dumps_json(schema_cls.model_json_schema(), indent=False).decode("utf-8")
+    return f" You must respond with a JSON object matching this schema: {schema}"
+
+
 class GroqProvider:
     """
     Groq-based chat provider implementation.
@@ -44,17 +81,23 @@ class GroqProvider:
         
         self._key_index = 0
         self._model_index = 0
+        # Current key/model and request headers as plain attributes, refreshed only on rotation
+        self.api_key: str = self._api_keys[0]
+        self.model: str = self._models[0]
+        self._headers = self._build_headers(self.api_key)
         self._response_data: dict | None = None
+        self._client: httpx.AsyncClient | None = None
 
-    @property
-    def model(self) -> str:
-        """Get the current active model name."""
-        return self._models[self._model_index]
+    @staticmethod
+    def _build_headers(api_key: str) -> dict[str, str]:
+        return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
 
     def rotate_key(self):
         """Rotate to the next API key in the list. If all keys used, rotate model."""
         if len(self._api_keys) > 1:
             self._key_index = (self._key_index + 1) % len(self._api_keys)
+            self.api_key = self._api_keys[self._key_index]
+            self._headers = self._build_headers(self.api_key)
             LoggerHelper.log_info(f"Rotacionando chave API Groq. Novo índice: {self._key_index}", emoji='refresh')
             
             # If we wrapped around to the first key, rotate the model too
@@ -68,28 +111,56 @@ class GroqProvider:
         """Rotate to the next model in the list."""
         if len(self._models) > 1:
             self._model_index = (self._model_index + 1) % len(self._models)
+            self.model = self._models[self._model_index]
             LoggerHelper.log_info(f"Rotacionando modelo Groq. Novo modelo: {self.model}", emoji='refresh')
 
     @property
-    def api_key(self) -> str:
-        return self._api_keys[self._key_index]
+    def client(self) -> httpx.AsyncClient:
+        """
+        Lazy-initialize the shared HTTP client.
 
-    def _encode_image(self, image_path: Path) -> str:
-        """Encode image to base64 string."""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
+        One client for every request keeps the TLS session alive, and HTTP/2 lets
+        concurrent requests share a single connection. The key travels in the
+        per-request headers, so rotation does not touch the client.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=60.0,
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # Each image is encoded in a single b64encode_str call on purpose. Captures are well
+    # under a megabyte, and SIMD base64 encoders reach full speed only on a whole buffer.
+    # A chunked/streaming encoder would pay the per-call setup and Python loop overhead
+    # for every chunk and would still need to join the pieces into one data URL string.
+    @staticmethod
+    def _image_url(image: Path | bytes) -> str | None:
+        """Build a data URL from an image path or encoded image bytes."""
+        if isinstance(image, (bytes, bytearray)):
+            return f"data:{image_mime_type(image)};base64,{b64encode_str(image)}"
+        try:
+            raw = image.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Groq supports data URLs for images
+        mime_type = "image/png" if image.suffix.lower() == ".png" else "image/jpeg"
+        encoded = b64encode_str(raw)
+        # Release the raw file before building the URL: at most two image-sized buffers alive at once
+        del raw
+        return f"data:{mime_type};base64,{encoded}"
 
-    @retry(
-        stop=stop_after_attempt(15),  # 3 cycles of (keys * models)
-        wait=wait_fixed(5),
-        before_sleep=lambda retry_state: LoggerHelper.log_provider_error(
-            retry_state.attempt_number, 15, retry_state.outcome.exception()
-        ),
-    )
     async def generate_with_images(
         self,
         *,
-        images: List[Path],
+        images: List[Path | bytes],
         response_schema: Type[ResponseT],
         user_prompt: str | None = None,
         description: str | None = None,
@@ -97,26 +168,32 @@ class GroqProvider:
     ) -> ResponseT:
         """
         Generate content with image inputs using Groq API.
+
+        Images are read and base64-encoded once here; only the request itself is retried.
         """
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        messages = await self._build_messages(images, response_schema, user_prompt, description)
+        return await self._request(messages, response_schema)
 
+    async def _build_messages(
+        self,
+        images: List[Path | bytes],
+        response_schema: Type[ResponseT],
+        user_prompt: str | None,
+        description: str | None,
+    ) -> list[dict]:
+        """Chat messages for a request: prompt, images as data URLs and the JSON instructions."""
         content = []
         if user_prompt:
             content.append({"type": "text", "text": user_prompt})
         
-        for img_path in images:
-            if img_path.exists():
-                base64_image = self._encode_image(img_path)
-                # Groq supports data URLs for images
-                mime_type = "image/png" if img_path.suffix.lower() == ".png" else "image/jpeg"
+        # Tiles are independent: read and encode them in worker threads, in input order
+        image_urls = await asyncio.gather(*(asyncio.to_thread(self._image_url, image) for image in images))
+        for image_url in image_urls:
+            if image_url:
                 content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:{mime_type};base64,{base64_image}"
+                        "url": image_url
                     }
                 })
 
@@ -128,18 +205,28 @@ class GroqProvider:
 
         # Groq requires that if response_format is json_object, the prompt must contain "JSON"
         # We also inject the schema to ensure the model uses the correct keys
-        schema_instruction = ""
-        if response_schema and issubclass(response_schema, BaseModel):
-            try:
-                schema = response_schema.model_json_schema()
-                schema_instruction = f" You must respond with a JSON object matching this schema: {json.dumps(schema)}"
-            except Exception as e:
-                logger.warning(f"Failed to generate JSON schema: {e}")
+        try:
+            schema_instruction = _schema_instruction_for(response_schema)
+        except Exception as e:
+            schema_instruction = ""
+            logger.warning(f"Failed to generate JSON schema: {e}")
 
         if "JSON" not in (description or "") and "JSON" not in (user_prompt or ""):
             messages.append({"role": "user", "content": f"Please respond in JSON format.{schema_instruction}"})
         elif schema_instruction:
              messages.append({"role": "user", "content": f"Ensure the response follows this JSON schema: {schema_instruction}"})
+        return messages
+
+    @retry(
+        stop=stop_after_attempt(15),  # 3 cycles of (keys * models)
+        wait=wait_fixed(5),
+        before_sleep=lambda retry_state: LoggerHelper.log_provider_error(
+            retry_state.attempt_number, 15, retry_state.outcome.exception()
+        ),
+    )
+    async def _request(self, messages: list[dict], response_schema: Type[ResponseT]) -> ResponseT:
+        """Send the prepared messages with the current key and model, and parse the answer."""
+        url = "https://api.groq.com/openai/v1/chat/completions"
 
         payload = {
             "model": self.model,
@@ -149,42 +236,32 @@ class GroqProvider:
             "max_tokens": 1024,
         }
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(url, headers=headers, json=payload)
-            
-            if response.status_code == 429:
-                LoggerHelper.log_warning(f"Quota da API Groq Esgotada (429) para o índice de chave {self._key_index}", emoji='skull')
-                self.rotate_key()
-                response.raise_for_status()
-            
-            if response.status_code >= 400:
-                LoggerHelper.log_error(f"Erro na API Groq ({response.status_code}): {response.text}")
-                if response.status_code == 400:
-                    LoggerHelper.log_error("Verifique se o modelo suporta visão ou se o prompt é válido.")
-                response.raise_for_status()
-            self._response_data = response.json()
+        # Payload is dominated by base64 images: serialize it with orjson when available
+        response = await self.client.post(url, headers=self._headers, content=dumps_json(payload, indent=False))
+
+        if response.status_code == 429:
+            LoggerHelper.log_warning(f"Quota da API Groq Esgotada (429) para o índice de chave {self._key_index}", emoji='skull')
+            self.rotate_key()
+            response.raise_for_status()
+
+        if response.status_code >= 400:
+            LoggerHelper.log_error(f"Erro na API Groq ({response.status_code}): {response.text}")
+            if response.status_code == 400:
+                LoggerHelper.log_error("Verifique se o modelo suporta visão ou se o prompt é válido.")
+            response.raise_for_status()
+        self._response_data = loads_json(response.content)
 
         # Extract content
         result_text = self._response_data["choices"][0]["message"]["content"]
         try:
-            result_json = json.loads(result_text)
+            result_json = loads_json(result_text)
             
             # Normalize coordinates for ImageBinaryChallenge (box_2d format)
             # The model sometimes returns ["01"] instead of [0, 1]
             if "coordinates" in result_json and isinstance(result_json["coordinates"], list):
                 for coord in result_json["coordinates"]:
                     if "box_2d" in coord and isinstance(coord["box_2d"], list):
-                        normalized = []
-                        for val in coord["box_2d"]:
-                            if isinstance(val, str):
-                                # Convert "01" to [0, 1] or "12" to [1, 2]
-                                if len(val) == 2 and val.isdigit():
-                                    normalized.extend([int(val[0]), int(val[1])])
-                                else:
-                                    normalized.append(int(val) if val.isdigit() else val)
-                            else:
-                                normalized.append(val)
-                        coord["box_2d"] = normalized[:2] if len(normalized) >= 2 else normalized
+                        coord["box_2d"] = _normalize_box_2d(coord["box_2d"])
             
             return response_schema(**result_json)
         except Exception as e:
@@ -197,9 +274,6 @@ class GroqProvider:
             return
         try:
             path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text(
-                json.dumps(self._response_data, indent=2, ensure_ascii=False),
-                encoding="utf-8",
-            )
+            path.write_bytes(dumps_json(self._response_data))
         except Exception as e:
             LoggerHelper.log_warning(f"Falha ao salvar cache de resposta: {e}")
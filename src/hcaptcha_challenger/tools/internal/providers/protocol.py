@@ -30,7 +30,7 @@ class ChatProvider(Protocol[ResponseT]):
     async def generate_with_images(
         self,
         *,
-        images: List[Path],
+        images: List[Path | bytes],
         response_schema: type[ResponseT],
         user_prompt: str | None = None,
         description: str | None = None,
@@ -40,7 +40,7 @@ class ChatProvider(Protocol[ResponseT]):
         Generate content with image inputs.
 
         Args:
-            images: List of image file paths to include in the request.
+            images: List of image file paths (or encoded image bytes) to include in the request.
             response_schema: Pydantic model class for structured output.
             user_prompt: User-provided prompt/instructions.
             description: System instruction/description for the model.
@@ -52,7 +52,7 @@ class ChatProvider(Protocol[ResponseT]):
     async def generate_with_media(
         self,
         *,
-        media: List[Path],
+        media: List[Path | bytes],
         response_schema: type[ResponseT],
         user_prompt: str | None = None,
         description: str | None = None,
@@ -62,7 +62,7 @@ class ChatProvider(Protocol[ResponseT]):
         Generate content with media inputs (images/videos).
 
         Args:
-            media: List of media file paths to include in the request.
+            media: List of media file paths (or encoded image bytes) to include in the request.
             response_schema: Pydantic model class for structured output.
             user_prompt: User-provided prompt/instructions.
             description: System instruction/description for the model.
@@ -31,7 +31,7 @@ class SpatialReasoner(Reasoner[SCoTModelType, ResponseT], ABC):
         self,
         *,
         challenge_screenshot: Path | List[Path],
-        grid_divisions: Path,
+        grid_divisions: Path | bytes,
         auxiliary_information: str | None = None,
         response_schema: type[ResponseT],
         **kwargs,
@@ -41,7 +41,7 @@ class SpatialReasoner(Reasoner[SCoTModelType, ResponseT], ABC):
 
         Args:
             challenge_screenshot: Path(s) to the challenge image(s).
-            grid_divisions: Path to the grid overlay image.
+            grid_divisions: Path to the grid overlay image, or its encoded bytes.
             auxiliary_information: Optional user prompt with additional context.
             thinking_level: Override for thinking level.
             response_schema: Pydantic model for structured output.
@@ -52,9 +52,9 @@ class SpatialReasoner(Reasoner[SCoTModelType, ResponseT], ABC):
             Parsed response matching the response_schema.
         """
         if isinstance(challenge_screenshot, list):
-             images: List[Path] = challenge_screenshot + [grid_divisions]
+             images: List[Path | bytes] = challenge_screenshot + [grid_divisions]
         else:
-             images: List[Path] = [challenge_screenshot, grid_divisions]
+             images: List[Path | bytes] = [challenge_screenshot, grid_divisions]
 
         return await self._provider.generate_with_images(
             images=images,
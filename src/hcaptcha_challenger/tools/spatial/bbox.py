@@ -30,7 +30,7 @@ class SpatialBboxReasoner(SpatialReasoner[ImageBboxChallenge]):
         self,
         *,
         challenge_screenshot: Union[str, Path],
-        grid_divisions: Union[str, Path],
+        grid_divisions: Union[str, Path, bytes],
         auxiliary_information: str | None = None,
         **kwargs,
     ) -> ImageBboxChallenge:
@@ -39,7 +39,7 @@ class SpatialBboxReasoner(SpatialReasoner[ImageBboxChallenge]):
 
         Args:
             challenge_screenshot: Path to the challenge image.
-            grid_divisions: Path to the grid overlay image.
+            grid_divisions: Path to the grid overlay image, or its encoded bytes.
             auxiliary_information: Optional challenge prompt or context.
             thinking_level: Thinking level for the model (default: HIGH).
             **kwargs: Additional options passed to the provider.
@@ -49,7 +49,7 @@ class SpatialBboxReasoner(SpatialReasoner[ImageBboxChallenge]):
         """
         return await self._invoke_spatial(
             challenge_screenshot=Path(challenge_screenshot),
-            grid_divisions=Path(grid_divisions),
+            grid_divisions=grid_divisions if isinstance(grid_divisions, bytes) else Path(grid_divisions),
             auxiliary_information=auxiliary_information,
             response_schema=ImageBboxChallenge,
             **kwargs,
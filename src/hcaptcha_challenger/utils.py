@@ -5,31 +5,183 @@
 # Description:
 from __future__ import annotations
 
+import base64
+import functools
+import hashlib
+import json
 import os
 import random
 import string
 import sys
+import threading
+import time
 import uuid
 from pathlib import Path
-from typing import Literal
+from typing import Any, Literal
 
-import pytz
 from loguru import logger
+from rich.logging import RichHandler
+
+import msgpack
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import ormsgpack
+except ImportError:  # ormsgpack is optional, fall back to msgpack
+    ormsgpack = None
+
+try:
+    import pybase64
+except ImportError:  # pybase64 is optional, fall back to the stdlib encoder
+    pybase64 = None
+
+try:
+    import blake3
+except ImportError:  # blake3 is optional, fall back to hashlib's BLAKE2b
+    blake3 = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, only needed for compressed JSON files
+    zstandard = None
+
+# zstd contexts are not safe to share between threads: one compressor per thread
+_zstd_local = threading.local()
+
+
+def dumps_json(data: Any, *, indent: bool = True) -> bytes:
+    """
+    Serialize `data` to UTF-8 JSON bytes.
+
+    Uses orjson when it is installed and the stdlib `json` module otherwise.
+    Non-ASCII characters are written as-is, mirroring `ensure_ascii=False`; without
+    `indent` the output is compact (no whitespace after separators) either way.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if indent:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads_json(data: str | bytes) -> Any:
+    """
+    Parse a JSON document.
+
+    Uses orjson when it is installed and the stdlib `json` module otherwise.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def b64encode_str(data: bytes | bytearray | memoryview) -> str:
+    """
+    Base64-encode `data` to an ASCII `str`.
+
+    Uses pybase64's SIMD encoder when it is installed and the stdlib `base64` module otherwise.
+    """
+    if pybase64 is not None:
+        return pybase64.b64encode_as_string(data)
+    return base64.b64encode(data).decode("ascii")
+
+
+def content_digest(data: bytes | bytearray | memoryview | Any) -> bytes:
+    """
+    16-byte digest of a buffer (bytes, memoryview, mmap), for in-process cache keys.
+
+    Uses BLAKE3 when it is installed and BLAKE2b otherwise, so digests are not
+    comparable across environments and must not be persisted.
+    """
+    if blake3 is not None:
+        return blake3.blake3(data).digest(length=16)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def write_json(path: Path, data: Any, *, compress: bool = False) -> Path:
+    """
+    Write `data` as indented JSON to `path` and return the file actually written.
+
+    With `compress=True` the document is compressed with zstd (level 1) and stored as
+    `<name>.zst`; this requires the optional zstandard package.
+    """
+    payload = dumps_json(data)
+    if not compress:
+        path.write_bytes(payload)
+        return path
+    if zstandard is None:
+        raise RuntimeError("zstandard is required to write compressed JSON")
+
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=1)
+    path = path.with_name(f"{path.name}.zst")
+    path.write_bytes(compressor.compress(payload))
+    return path
+
+
+def read_json(path: Path) -> Any:
+    """Load a file written by `write_json`, compressed (`.zst`) or not."""
+    raw = path.read_bytes()
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        raw = zstandard.ZstdDecompressor().decompress(raw)
+    return loads_json(raw)
+
+
+def loads_msgpack(data: bytes) -> Any:
+    """
+    Decode a MessagePack document.
+
+    Uses ormsgpack when it is installed and `msgpack` otherwise.
+    """
+    if ormsgpack is not None:
+        return ormsgpack.unpackb(data)
+    return msgpack.unpackb(data)
+
+
+def image_mime_type(data: bytes) -> str:
+    """Guess the MIME type of an encoded image from its signature (PNG, otherwise JPEG)."""
+    return "image/png" if data[:8] == b"\x89PNG\r\n\x1a\n" else "image/jpeg"
+
+
+@functools.lru_cache(maxsize=1)
+def _local_second(epoch_second: int) -> str:
+    return time.strftime("%Y%m%d%H%M%S", time.localtime(epoch_second))
+
+
+def timestamp_key() -> str:
+    """
+    Local-time cache key in the form `YYYYMMDD/YYYYMMDDHHMMSSffffff`.
+
+    Same output as `datetime.now().strftime("%Y%m%d/%Y%m%d%H%M%S%f")`, but the
+    formatted second is reused and only the microseconds are rendered per call.
+    """
+    ns = time.time_ns()
+    stamp = _local_second(ns // 1_000_000_000)
+    return f"{stamp[:8]}/{stamp}{ns // 1000 % 1_000_000:06d}"
+
+
+# Record layout of the persistent (file) log sinks
+_PERSISTENT_LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
 
 
 def init_log(**sink_channel):
     """
     Initialize the log configuration using Rich + Loguru
     """
-    import os
-    import sys
-    import pytz
-    from loguru import logger
-    from rich.logging import RichHandler
+    # Imported here: agent.logger imports this module
     from hcaptcha_challenger.agent.logger import console
-    
+
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
-    shanghai_tz = pytz.timezone("Asia/Shanghai")
 
     # Clear existing loguru handlers
     logger.remove()
@@ -48,10 +200,6 @@ def init_log(**sink_channel):
     )
 
     # File sinks (Persistent logs)
-    persistent_format = (
-        "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
-    )
-
     if error_sink := sink_channel.get("error"):
         logger.add(
             sink=error_sink,
@@ -59,8 +207,9 @@ def init_log(**sink_channel):
             rotation="5 MB",
             retention="7 days",
             encoding="utf8",
-            format=persistent_format,
-            filter=lambda record: record["time"].replace(tzinfo=pytz.UTC).astimezone(shanghai_tz),
+            format=_PERSISTENT_LOG_FORMAT,
+            # Writes happen on loguru's worker thread, off the caller's path
+            enqueue=True,
         )
 
     if runtime_sink := sink_channel.get("runtime"):
@@ -70,8 +219,9 @@ def init_log(**sink_channel):
             rotation="5 MB",
             retention="7 days",
             encoding="utf8",
-            format=persistent_format,
-            filter=lambda record: record["time"].replace(tzinfo=pytz.UTC).astimezone(shanghai_tz),
+            format=_PERSISTENT_LOG_FORMAT,
+            # Writes happen on loguru's worker thread, off the caller's path
+            enqueue=True,
         )
 
     return logger
@@ -113,9 +263,10 @@ class SiteKey:
         except ValueError:
             raise ValueError(f"sitekey is a string in UUID format, but you entered `{site_key}`")
 
-    @staticmethod
-    def choice():
-        ks = [
+    # Demo URLs for `choice`, formatted once at class creation
+    _CHOICE_URLS: tuple[str, ...] = tuple(
+        f"https://accounts.hcaptcha.com/demo?sitekey={k}"
+        for k in (
             "f5561ba9-8f1e-40ca-9b5b-a0b3f719ef34",
             "91e4137f-95af-4bc9-97af-cdcedce21c8c",
             "a5f74b19-9e45-40e0-b45d-47ff91b7a6c2",
@@ -124,16 +275,30 @@ class SiteKey:
             "c86d730b-300a-444c-a8c5-5312e7a93628",
             "edc4ce89-8903-4906-80b1-7440ad9a69c8",
             "adafb813-8b5c-473f-9de3-485b4ad5aa09",
-        ]
-        k = random.choice(ks)
-        return f"https://accounts.hcaptcha.com/demo?sitekey={k}"
+        )
+    )
+
+    @staticmethod
+    def choice():
+        return random.choice(SiteKey._CHOICE_URLS)
 
 
 def load_desc(path: Path, substitutions: dict[str, str] | None = None) -> str:
-    """Load a tool description from a file, with optional substitutions."""
-    description = path.read_text(encoding="utf-8")
+    """
+    Load a tool description from a file, with optional substitutions.
+
+    Results are memoized per file version: a repeated load costs one stat() as long
+    as the file is not rewritten.
+    """
+    key = tuple(sorted(substitutions.items())) if substitutions else ()
+    return _load_desc(str(path), path.stat().st_mtime_ns, key)
+
+
+@functools.lru_cache(maxsize=128)
+def _load_desc(path: str, mtime_ns: int, substitutions: tuple[tuple[str, str], ...]) -> str:
+    description = Path(path).read_text(encoding="utf-8")
     if substitutions:
-        description = string.Template(description).safe_substitute(substitutions)
+        description = string.Template(description).safe_substitute(dict(substitutions))
     if description and isinstance(description, str):
         description = description.strip()
     return description
@@ -0,0 +1,17 @@
+import asyncio
+import sys
+
+import pytest
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional, tests then run on the default asyncio loop
+    uvloop = None
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy():
+    """Run async tests on uvloop when it is installed (not available on Windows)."""
+    if uvloop is not None and sys.platform != "win32":
+        return uvloop.EventLoopPolicy()
+    return asyncio.DefaultEventLoopPolicy()
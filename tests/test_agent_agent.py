@@ -0,0 +1,102 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from hcaptcha_challenger.agent.agent import AgentV, _drain_queue
+from hcaptcha_challenger.agent.pilot.core import PilotCore
+from hcaptcha_challenger.models import CaptchaResponse
+
+
+class _OpaqueQueue:
+    """Exposes only the public Queue API, as if asyncio's internals had changed."""
+
+    def __init__(self, items):
+        self._inner = asyncio.Queue()
+        for item in items:
+            self._inner.put_nowait(item)
+
+    def empty(self):
+        return self._inner.empty()
+
+    def get_nowait(self):
+        return self._inner.get_nowait()
+
+
+async def test_drain_queue_empties_and_releases_join():
+    q = asyncio.Queue()
+    for i in range(3):
+        q.put_nowait(i)
+
+    _drain_queue(q)
+
+    assert q.empty()
+    # Unfinished-task bookkeeping is reset too, so join() does not wait for the dropped items
+    await asyncio.wait_for(q.join(), timeout=1)
+    q.put_nowait("next")
+    assert q.get_nowait() == "next"
+
+
+async def test_drain_queue_keeps_maxsize_usable():
+    q = asyncio.Queue(maxsize=1)
+    q.put_nowait("stale")
+
+    _drain_queue(q)
+
+    q.put_nowait("fresh")
+    assert q.full()
+    assert await q.get() == "fresh"
+
+
+async def test_drain_queue_on_empty_queue():
+    q = asyncio.Queue()
+    _drain_queue(q)
+    await asyncio.wait_for(q.join(), timeout=1)
+
+
+def test_drain_queue_falls_back_to_public_api():
+    q = _OpaqueQueue(["a", "b"])
+    _drain_queue(q)
+    assert q.empty()
+
+
+def _agent_with_core(response_timeout: float) -> AgentV:
+    core = object.__new__(PilotCore)
+    core.captcha_response_queue = asyncio.Queue(maxsize=1)
+    core.captcha_payload_queue = asyncio.Queue()
+    core.verdict_event = asyncio.Event()
+    agent = object.__new__(AgentV)
+    agent.core = core
+    agent.config = SimpleNamespace(RESPONSE_TIMEOUT=response_timeout)
+    return agent
+
+
+async def test_await_verdict_wakes_on_response_event():
+    agent = _agent_with_core(5)
+    cr = CaptchaResponse(**{"pass": True})
+    asyncio.get_running_loop().call_later(0.05, agent.core._push_response, cr)
+
+    started = time.monotonic()
+    assert await agent._await_verdict() == ("response", cr)
+    assert time.monotonic() - started < 1
+
+
+async def test_await_verdict_returns_payload():
+    agent = _agent_with_core(5)
+    asyncio.get_running_loop().call_later(0.05, agent.core._push_payload, None)
+    assert await agent._await_verdict() == ("payload", None)
+
+
+async def test_await_verdict_prefers_response_over_payload():
+    agent = _agent_with_core(5)
+    cr = CaptchaResponse(**{"pass": False})
+    agent.core._push_payload(None)
+    agent.core._push_response(cr)
+    assert await agent._await_verdict() == ("response", cr)
+
+
+async def test_await_verdict_times_out():
+    agent = _agent_with_core(0.1)
+
+    started = time.monotonic()
+    assert await agent._await_verdict() is None
+    assert 0.1 <= time.monotonic() - started < 1
@@ -0,0 +1,132 @@
+import asyncio
+import io
+import threading
+from types import SimpleNamespace
+
+import pytest
+from tenacity import Future, RetryError
+
+from hcaptcha_challenger.agent import logger as hc_logger
+from hcaptcha_challenger.agent.logger import (
+    BufferedConsole,
+    LoggerHelper,
+    MetricsLogger,
+    classify_error,
+    flush_logs,
+)
+
+
+def _capture(monkeypatch):
+    out = io.StringIO()
+    capture = BufferedConsole(file=out, width=200, color_system=None, theme=hc_logger.custom_theme)
+    monkeypatch.setattr(hc_logger, "console", capture)
+    return out
+
+
+def test_flush_logs_waits_for_queued_lines(monkeypatch):
+    out = _capture(monkeypatch)
+    for i in range(50):
+        LoggerHelper.log_info(f"line {i}")
+
+    flush_logs()
+
+    assert out.getvalue().count("line ") == 50
+    assert out.getvalue().rstrip().endswith("line 49")
+
+
+def test_log_error_is_written_after_queued_lines_before_returning(monkeypatch):
+    out = _capture(monkeypatch)
+    LoggerHelper.log_info("before")
+
+    LoggerHelper.log_error("boom")
+
+    text = out.getvalue()
+    assert "boom" in text
+    assert text.index("before") < text.index("boom")
+
+
+def test_log_step_rounds_percentage(monkeypatch):
+    out = _capture(monkeypatch)
+
+    LoggerHelper.log_step(2, 3, "round")
+    flush_logs()
+
+    assert "67% (Round 2/3)" in out.getvalue()
+
+
+def test_metrics_view_reflects_counters(monkeypatch):
+    _capture(monkeypatch)
+    metrics = MetricsLogger()
+
+    metrics.log_challenge_result(True, 1.0)
+    metrics.log_challenge_result(False, 2.0)
+    metrics.log_ai_call(0.5)
+    metrics.log_error("timeout")
+
+    assert metrics.counters.challenges_total == 2
+    assert metrics.metrics == {
+        "challenges": {"total": 2, "success": 1, "failed": 1},
+        "ai_calls": {"total": 1, "total_time": 0.5},
+        "errors": {"timeout": 1},
+    }
+
+
+def test_write_fragments_are_per_thread(monkeypatch):
+    out = _capture(monkeypatch)
+    console = hc_logger.console
+    ready, resume = threading.Event(), threading.Event()
+
+    def other_thread():
+        console.write("other-")
+        ready.set()
+        resume.wait(1)
+        console.writeln("line")
+
+    worker = threading.Thread(target=other_thread)
+    worker.start()
+    ready.wait(1)
+    console.write("main-")
+    console.writeln("line")
+    resume.set()
+    worker.join()
+    flush_logs()
+
+    lines = out.getvalue().split()
+    assert sorted(lines) == ["main-line", "other-line"]
+
+
+class _StatusError(Exception):
+    def __init__(self, message="", code=None, status_code=None):
+        super().__init__(message)
+        if code is not None:
+            self.code = code
+        if status_code is not None:
+            self.response = SimpleNamespace(status_code=status_code)
+
+
+@pytest.mark.parametrize(
+    "exc, kind",
+    [
+        (_StatusError(code=429), "quota"),
+        (_StatusError(status_code=429), "quota"),
+        (_StatusError(code=503), "server"),
+        (_StatusError(status_code=500), "server"),
+        # A status wins over the message text
+        (_StatusError("quota exhausted", code=400), "other"),
+        (asyncio.TimeoutError(), "timeout"),
+        (TimeoutError(), "timeout"),
+        (RuntimeError("RESOURCE_EXHAUSTED"), "quota"),
+        (RuntimeError("Quota exceeded for model"), "quota"),
+        (RuntimeError("500 INTERNAL"), "server"),
+        (RuntimeError("read Timeout"), "timeout"),
+        (RuntimeError("schema mismatch"), "other"),
+    ],
+)
+def test_classify_error_buckets(exc, kind):
+    assert classify_error(exc) == kind
+
+
+def test_classify_error_unwraps_retry_error():
+    attempt = Future(attempt_number=3)
+    attempt.set_exception(_StatusError(code=429))
+    assert classify_error(RetryError(attempt)) == "quota"
@@ -0,0 +1,64 @@
+import pytest
+
+from hcaptcha_challenger.agent.pilot.actions import PilotActions
+
+
+class _Mouse:
+    def __init__(self):
+        self.clicks = []
+
+    async def move(self, x, y, steps=1):
+        pass
+
+    async def click(self, x, y, delay=0):
+        self.clicks.append((x, y))
+
+
+class _Page:
+    def __init__(self):
+        self.mouse = _Mouse()
+
+
+class _MovingLocator:
+    def __init__(self, *boxes):
+        self.boxes = list(boxes)
+        self.queries = 0
+
+    async def bounding_box(self):
+        self.queries += 1
+        return self.boxes.pop(0)
+
+
+async def test_click_by_mouse_requeries_bbox_every_click():
+    page = _Page()
+    actions = PilotActions(page, arm=None)
+    # The element moved between clicks (reload, reflow, re-rendered frame)
+    locator = _MovingLocator({"x": 0, "y": 0, "width": 10, "height": 10}, {"x": 300, "y": 200, "width": 10, "height": 10})
+
+    await actions.click_by_mouse(locator)
+    await actions.click_by_mouse(locator)
+
+    assert locator.queries == 2
+    (x1, y1), (x2, y2) = page.mouse.clicks
+    assert (x1, y1) == pytest.approx((5, 5), abs=2)
+    assert (x2, y2) == pytest.approx((305, 205), abs=2)
+
+
+async def test_click_by_mouse_with_coords_skips_bounding_box():
+    page = _Page()
+    actions = PilotActions(page, arm=None)
+    locator = _MovingLocator()
+
+    await actions.click_by_mouse(locator, coords=(50, 60))
+
+    assert locator.queries == 0
+    assert page.mouse.clicks[0] == pytest.approx((50, 60), abs=2)
+
+
+async def test_click_by_mouse_without_bbox_does_not_click():
+    page = _Page()
+    actions = PilotActions(page, arm=None)
+
+    await actions.click_by_mouse(_MovingLocator(None))
+
+    assert page.mouse.clicks == []
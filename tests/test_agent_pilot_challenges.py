@@ -0,0 +1,145 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from playwright.async_api import Error as PlaywrightError
+
+from hcaptcha_challenger.agent.pilot.challenges import PilotChallenges, _IMAGES_READY_JS, _challenge_handler
+
+class FakeHandle:
+    def __init__(self):
+        self.disposed = False
+
+    async def dispose(self):
+        self.disposed = True
+
+
+class FakeFrame:
+    """
+    Mimics Playwright's evaluation semantics: an expression that evaluates to a
+    function is called, and the handle/result holds what the function returned.
+    """
+
+    def __init__(self):
+        self.ready_calls = 0
+        self.sent_source = []
+
+    def _run(self, expression: str, arg=None):
+        self.sent_source.append(expression)
+        if expression == f"() => ({_IMAGES_READY_JS})":
+            return FakeHandle()
+        if expression == _IMAGES_READY_JS:
+            self.ready_calls += 1
+            return None
+        if expression == "fn => fn()":
+            if not isinstance(arg, FakeHandle) or arg.disposed:
+                raise PlaywrightError("fn is not a function")
+            self.ready_calls += 1
+            return None
+        raise AssertionError(f"unexpected expression: {expression[:40]}")
+
+    async def evaluate_handle(self, expression: str, arg=None):
+        return self._run(expression, arg)
+
+    async def evaluate(self, expression: str, arg=None):
+        return self._run(expression, arg)
+
+
+async def test_wait_view_images_ready_calls_cached_function():
+    challenges = PilotChallenges(SimpleNamespace())
+    frame = FakeFrame()
+
+    await challenges._wait_view_images_ready(frame)
+    await challenges._wait_view_images_ready(frame)
+
+    assert frame.ready_calls == 2
+    # The script source is sent once; the second round only calls the cached handle
+    assert sum(_IMAGES_READY_JS in src for src in frame.sent_source) == 1
+
+
+async def test_wait_view_images_ready_recompiles_for_new_frame():
+    challenges = PilotChallenges(SimpleNamespace())
+    first, second = FakeFrame(), FakeFrame()
+
+    await challenges._wait_view_images_ready(first)
+    old_handle = challenges._images_ready_fn[1]
+    await challenges._wait_view_images_ready(second)
+
+    assert first.ready_calls == 1
+    assert second.ready_calls == 1
+    assert old_handle.disposed
+    assert not challenges._images_ready_fn[1].disposed
+
+
+async def test_wait_view_images_ready_replaces_stale_handle():
+    challenges = PilotChallenges(SimpleNamespace())
+    frame = FakeFrame()
+    # A handle from a navigated-away context no longer resolves to the function
+    stale = FakeHandle()
+    stale.disposed = True
+    challenges._images_ready_fn = (frame, stale)
+
+    await challenges._wait_view_images_ready(frame)
+
+    assert frame.ready_calls == 1
+    assert challenges._images_ready_fn[0] is frame
+    assert challenges._images_ready_fn[1] is not stale
+
+
+async def test_challenge_handler_disposes_images_ready_handle():
+    challenges = PilotChallenges(SimpleNamespace())
+    frame = FakeFrame()
+
+    @_challenge_handler
+    async def handler(self):
+        await self._wait_view_images_ready(frame)
+        return self._images_ready_fn[1]
+
+    handle = await handler(challenges)
+
+    assert handle.disposed
+    assert challenges._images_ready_fn is None
+
+
+async def test_challenge_handler_cancels_pending_submit_on_error():
+    challenges = PilotChallenges(SimpleNamespace())
+
+    @_challenge_handler
+    async def failing_handler(self):
+        self._pending_submit = asyncio.create_task(asyncio.sleep(30))
+        raise asyncio.TimeoutError
+
+    with pytest.raises(asyncio.TimeoutError):
+        await failing_handler(challenges)
+
+    assert challenges._pending_submit is None
+    assert all(t.done() for t in asyncio.all_tasks() if t is not asyncio.current_task())
+
+
+async def test_challenge_handler_drops_leftover_submit_check():
+    challenges = PilotChallenges(SimpleNamespace())
+    leftover = asyncio.create_task(asyncio.sleep(30))
+    challenges._pending_submit = leftover
+
+    @_challenge_handler
+    async def handler(self):
+        return self._pending_submit
+
+    assert await handler(challenges) is None
+    assert leftover.cancelled()
+
+
+async def test_check_submit_result_survives_probe_timeout(monkeypatch):
+    class _TimeoutLocator:
+        async def is_visible(self, timeout=None):
+            raise asyncio.TimeoutError
+
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    frame = SimpleNamespace(locator=lambda selector: _TimeoutLocator())
+    challenges = PilotChallenges(SimpleNamespace())
+
+    assert await challenges._check_submit_result(frame) is True
+
+
+async def _no_sleep(_delay):
+    return None
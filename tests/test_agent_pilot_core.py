@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from hcaptcha_challenger.agent.pilot.core import ImageCache, PilotCore
+from hcaptcha_challenger.models import CaptchaResponse
+from hcaptcha_challenger.utils import content_digest
+
+
+def _bump_mtime(path):
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_get_hash_of_bytes_matches_content_digest():
+    assert ImageCache().get_hash(b"png-bytes") == content_digest(b"png-bytes")
+    assert len(ImageCache().get_hash(b"png-bytes")) == 16
+
+
+
+def test_get_hash_of_file_reads_through_mmap(tmp_path):
+    image = tmp_path.joinpath("challenge.png")
+    image.write_bytes(b"\x89PNG" + bytes(range(256)) * 64)
+    empty = tmp_path.joinpath("empty.png")
+    empty.write_bytes(b"")
+
+    cache = ImageCache()
+    assert cache.get_hash(image) == content_digest(image.read_bytes())
+    # Zero-length files cannot be mmapped
+    assert cache.get_hash(empty) == content_digest(b"")
+
+
+def test_get_hash_of_missing_file_or_none(tmp_path):
+    cache = ImageCache()
+    assert cache.get_hash(None) is None
+    assert cache.get_hash(tmp_path.joinpath("missing.png")) is None
+
+
+def test_write_memoizes_digest_for_path(tmp_path, monkeypatch):
+    image = tmp_path.joinpath("challenge.png")
+    cache = ImageCache()
+
+    digest = cache.write(image, b"first")
+    assert image.read_bytes() == b"first"
+    assert digest == content_digest(b"first")
+
+    # An unchanged file is answered from the memo, without reading it again
+    monkeypatch.setattr(ImageCache, "_hash_file", staticmethod(lambda *_: pytest.fail("file was re-hashed")))
+    assert cache.get_hash(image) == digest
+
+
+def test_rewritten_file_is_rehashed(tmp_path):
+    image = tmp_path.joinpath("challenge.png")
+    cache = ImageCache()
+    cache.write(image, b"first")
+
+    image.write_bytes(b"second")
+    _bump_mtime(image)
+
+    assert cache.get_hash(image) == content_digest(b"second")
+    assert len(cache._file_digests) == 1
+
+
+def test_file_digests_are_bounded_lru(tmp_path, monkeypatch):
+    monkeypatch.setattr(ImageCache, "MAX_FILE_DIGESTS", 2)
+    cache = ImageCache()
+    paths = [tmp_path.joinpath(f"{i}.png") for i in range(3)]
+
+    cache.write(paths[0], b"0")
+    cache.write(paths[1], b"1")
+    cache.get_hash(paths[0])  # memo hit refreshes paths[0]
+    cache.write(paths[2], b"2")
+
+    assert list(cache._file_digests) == [str(paths[0]), str(paths[2])]
+
+
+class _TokenPage:
+    def __init__(self, url, tokens):
+        self.url = url
+        self.tokens = tokens
+
+    async def evaluate(self, expression, arg=None):
+        return self.tokens
+
+
+def _core_with_pass(page, token="P1_token", expiration=120):
+    core = object.__new__(PilotCore)
+    core.page = page
+    core.captcha_response_queue = asyncio.Queue(maxsize=1)
+    core.captcha_payload_queue = asyncio.Queue()
+    cr = CaptchaResponse(**{"pass": True, "generated_pass_UUID": token, "expiration": expiration})
+    core._last_pass = (time.monotonic(), page.url, cr)
+    return core, cr
+
+
+async def test_fresh_cached_response_is_single_use():
+    core, cr = _core_with_pass(_TokenPage("https://a.test/", ["P1_token", "P1_token"]))
+
+    assert await core.take_fresh_cached_response() is cr
+    assert await core.take_fresh_cached_response() is None
+
+
+@pytest.mark.parametrize("live_tokens", [[], [""], ["P1_other"], ["P1_token", ""]])
+async def test_fresh_cached_response_requires_live_token_in_dom(live_tokens):
+    core, _ = _core_with_pass(_TokenPage("https://a.test/", live_tokens))
+    assert await core.take_fresh_cached_response() is None
+
+
+async def test_fresh_cached_response_rejected_with_pending_network_data():
+    core, _ = _core_with_pass(_TokenPage("https://a.test/", ["P1_token"]))
+    core.captcha_payload_queue.put_nowait(None)
+    assert await core.take_fresh_cached_response() is None
+
+
+async def test_fresh_cached_response_rejected_after_navigation_or_expiry():
+    page = _TokenPage("https://a.test/", ["P1_token"])
+    core, _ = _core_with_pass(page)
+    page.url = "https://a.test/next"
+    assert await core.take_fresh_cached_response() is None
+
+    core, _ = _core_with_pass(_TokenPage("https://a.test/", ["P1_token"]), expiration=0)
+    assert await core.take_fresh_cached_response() is None
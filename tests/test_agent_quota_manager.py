@@ -0,0 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pytest
+
+from hcaptcha_challenger.agent import quota_manager
+from hcaptcha_challenger.agent.quota_manager import QuotaManager, _key_id
+
+MODEL = "gemini-2.5-flash"
+
+
+@pytest.fixture
+def qm(tmp_path):
+    manager = QuotaManager(cache_dir=tmp_path)
+    yield manager
+    manager._conn.close()
+
+
+@pytest.fixture(params=[True, False], ids=["returning", "select-fallback"])
+def has_returning(request, monkeypatch):
+    # False exercises the path taken on SQLite < 3.35, which has no RETURNING
+    monkeypatch.setattr(quota_manager, "_HAS_RETURNING", request.param)
+    return request.param
+
+
+def _row(qm: QuotaManager, api_key: str):
+    return qm._conn.execute(
+        "SELECT backoff_count, temp_exhausted_until, failure_count FROM quotas WHERE key_id = ?",
+        (_key_id(api_key, MODEL),),
+    ).fetchone()
+
+
+def test_connection_is_persistent_and_in_wal_mode(qm):
+    conn = qm._conn
+    qm.mark_failure("key-a", MODEL)
+    qm.is_exhausted("key-a", MODEL)
+
+    assert qm._conn is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_mark_exhausted_backoff_ladder(qm, has_returning):
+    expected = [30, 60, 120, 240, 480, 960, 960]
+    for attempt, seconds in enumerate(expected, start=1):
+        qm.mark_exhausted("key-a", MODEL)
+        backoff_count, until, _ = _row(qm, "key-a")
+        remaining = (datetime.fromisoformat(until) - datetime.now(timezone.utc)).total_seconds()
+
+        assert backoff_count == attempt
+        assert seconds - 2 < remaining <= seconds
+
+    assert qm.is_exhausted("key-a", MODEL)
+
+
+def test_mark_success_clears_failures_and_lowers_backoff(qm):
+    for _ in range(3):
+        qm.mark_exhausted("key-a", MODEL)
+    qm.mark_success("key-a", MODEL)
+
+    backoff_count, until, failure_count = _row(qm, "key-a")
+    assert (backoff_count, until, failure_count) == (1, None, 0)
+    assert not qm.is_exhausted("key-a", MODEL)
+
+
+def test_mark_failure_counts_and_flags_unstable_key(qm, has_returning):
+    for _ in range(2):
+        qm.mark_failure("key-a", MODEL)
+    assert _row(qm, "key-a")[2] == 2
+    assert not qm.is_exhausted("key-a", MODEL)
+
+    qm.mark_failure("key-a", MODEL)
+    assert _row(qm, "key-a")[2] == 3
+    assert qm.is_exhausted("key-a", MODEL)
+
+
+def test_decision_is_reused_until_ttl_expires(qm):
+    key_id = _key_id("key-a", MODEL)
+    assert qm._is_exhausted_id(key_id, 100.0) is False
+
+    # Written behind the manager's back: only a fresh lookup can see it
+    with qm._conn:
+        qm._conn.execute(
+            "INSERT INTO quotas (key_id, exhausted_at) VALUES (?, ?)",
+            (key_id, datetime.now(timezone.utc).isoformat()),
+        )
+
+    assert qm._is_exhausted_id(key_id, 100.0 + qm.DECISION_TTL / 2) is False
+    assert qm._is_exhausted_id(key_id, 100.0 + qm.DECISION_TTL) is True
+
+
+def test_mark_calls_invalidate_cached_decision(qm):
+    assert qm.is_exhausted("key-a", MODEL) is False
+    qm.mark_temporary_exhaustion("key-a", MODEL, 60)
+    assert qm.is_exhausted("key-a", MODEL) is True
+
+
+def test_decisions_are_bounded_lru(qm):
+    qm.MAX_DECISIONS = 2
+    ids = [_key_id(f"key-{i}", MODEL) for i in range(3)]
+
+    qm._is_exhausted_id(ids[0], 0.0)
+    qm._is_exhausted_id(ids[1], 0.0)
+    qm._is_exhausted_id(ids[0], 0.0)  # cache hit refreshes ids[0]
+    qm._is_exhausted_id(ids[2], 0.0)
+
+    assert list(qm._decisions) == [ids[0], ids[2]]
+
+
+def test_concurrent_lookups_keep_decisions_consistent(qm):
+    qm.MAX_DECISIONS = 8
+    api_keys = [f"key-{i}" for i in range(32)]
+    qm.mark_exhausted("key-3", MODEL)
+
+    def worker(offset):
+        for i in range(200):
+            key = api_keys[(i + offset) % len(api_keys)]
+            assert qm._is_exhausted_id(_key_id(key, MODEL), float(i)) is (key == "key-3")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(worker, range(8)))
+
+    assert len(qm._decisions) <= qm.MAX_DECISIONS
+
+
+def test_available_keys_keeps_order_and_skips_exhausted(qm):
+    qm.mark_exhausted("key-b", MODEL)
+    assert qm.available_keys(["key-a", "key-b", "key-c"], MODEL) == ["key-a", "key-c"]
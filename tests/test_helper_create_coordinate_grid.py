@@ -5,9 +5,17 @@ from concurrent.futures import as_completed, ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
+import pytest
 from PIL import Image
 
-from hcaptcha_challenger.helper.create_coordinate_grid import create_coordinate_grid, FloatRect
+from hcaptcha_challenger.helper.create_coordinate_grid import (
+    create_coordinate_grid,
+    FloatRect,
+    _bbox_tuple,
+    _compose_grid,
+    _render_adaptive_contrast_grid,
+    _render_coordinate_grid,
+)
 
 BASE_PATH = Path(__file__).parent.joinpath("challenge_view")
 DATASET_IMAGE_DRAG_DROP = BASE_PATH / "image_drag_drop"
@@ -133,5 +141,25 @@ def test_create_coordinate_grid_parallel(max_workers: int = None):
     )
 
 
+@pytest.mark.parametrize(
+    "render, style",
+    [(_render_coordinate_grid, ("gray",)), (_render_adaptive_contrast_grid, ("white", "viridis"))],
+)
+def test_cached_overlay_matches_direct_render(render, style):
+    """The cached overlay blend must reproduce a full matplotlib render of the same grid."""
+    # Smooth content: matplotlib and cv2 resample differently, which only shows on noise
+    ramp = np.linspace(0, 255, 501, dtype=np.float32)
+    img = np.dstack([np.tile(ramp, (431, 1)), np.tile(ramp[::-1], (431, 1)), np.full((431, 501), 96)])
+    img = img.astype(np.uint8)
+    args = (*_bbox_tuple(DEFAULT_BBOX), 11, 20, 10, *style)
+
+    expected = render(img, *args)
+    blended = _compose_grid(render, img, *args)
+
+    assert blended.shape == expected.shape
+    assert np.abs(blended.astype(np.int16) - expected.astype(np.int16)).max() <= 3
+
+
+
 if __name__ == "__main__":
     test_create_coordinate_grid_parallel()
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from hcaptcha_challenger.tools.internal.providers import gemini
+from hcaptcha_challenger.tools.internal.providers.groq import GroqProvider
+
+
+class _FakeGenaiClient:
+    def __init__(self):
+        self.closed_async = self.closed_sync = False
+
+        async def aclose():
+            self.closed_async = True
+
+        self.aio = SimpleNamespace(aclose=aclose)
+
+    def close(self):
+        self.closed_sync = True
+
+
+@pytest.fixture
+def fake_genai(monkeypatch):
+    created = []
+
+    def factory(api_key):
+        client = _FakeGenaiClient()
+        created.append(client)
+        return client
+
+    monkeypatch.setattr(gemini.genai, "Client", factory)
+    return created
+
+
+async def test_gemini_aclose_releases_only_own_clients(fake_genai):
+    first = gemini.GeminiProvider(api_key=["key-a", "key-b"], model="gemini-2.5-flash")
+    second = gemini.GeminiProvider(api_key="key-a", model="gemini-2.5-flash")
+
+    shared = first.client
+    assert second.client is shared  # same loop and key: pooled
+    first.rotate_key()
+    own = first.client
+
+    await first.aclose()
+    assert own.closed_async and own.closed_sync
+    # Still held by the second provider, possibly mid-request
+    assert not shared.closed_async and not shared.closed_sync
+
+    await second.aclose()
+    assert shared.closed_async and shared.closed_sync
+    assert gemini._CLIENT_POOLS[asyncio.get_running_loop()] == {}
+
+
+def test_gemini_pool_is_per_event_loop(fake_genai):
+    provider = gemini.GeminiProvider(api_key="key-a", model="gemini-2.5-flash")
+
+    async def get_client():
+        return provider.client
+
+    first, second = asyncio.run(get_client()), asyncio.run(get_client())
+
+    assert first is not second
+    assert len(fake_genai) == 2
+
+
+async def test_groq_aclose_closes_shared_client():
+    provider = GroqProvider(api_key="gsk-test", model="llama")
+    client = provider.client
+
+    await provider.aclose()
+    await provider.aclose()  # idempotent
+
+    assert client.is_closed
+    assert provider.client is not client
+    await provider.aclose()
@@ -0,0 +1,70 @@
+import pytest
+from google.genai import types
+
+from hcaptcha_challenger.tools.internal.providers.gemini import GeminiProvider
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the provider's QuotaManager writes under ./tmp
+    return GeminiProvider(api_key=["key-a", "key-b"], model="gemini-2.5-flash")
+
+
+def _fail_then_succeed(failures: int, calls: list):
+    async def generate_once(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= failures:
+            raise RuntimeError(f"attempt {len(calls)} failed")
+        return "parsed"
+
+    return generate_once
+
+
+async def test_generate_with_media_retries_until_success(provider, monkeypatch):
+    calls = []
+    monkeypatch.setattr(provider, "_generate_once", _fail_then_succeed(2, calls))
+
+    result = await provider.generate_with_media(media=[], response_schema=types.File)
+
+    assert result == "parsed"
+    assert len(calls) == 3
+
+
+async def test_generate_with_media_raises_last_error_after_max_attempts(provider, monkeypatch):
+    calls = []
+    provider.MAX_ATTEMPTS = 4
+    monkeypatch.setattr(provider, "_generate_once", _fail_then_succeed(10, calls))
+
+    with pytest.raises(RuntimeError, match="attempt 4 failed"):
+        await provider.generate_with_media(media=[], response_schema=types.File)
+    assert len(calls) == 4
+
+
+async def test_media_parts_inline_budget(provider, monkeypatch, tmp_path):
+    provider.MAX_INLINE_BYTES = 100
+    uploaded = []
+
+    async def upload_files(files):
+        uploaded.extend(files)
+        return [types.File(uri=f"files/{i}", mime_type="image/png") for i in range(len(files))]
+
+    monkeypatch.setattr(provider, "_upload_files", upload_files)
+    small_path = tmp_path.joinpath("small.png")
+    small_path.write_bytes(PNG + bytes(22))  # 30 bytes
+    large_path = tmp_path.joinpath("large.png")
+    large_path.write_bytes(PNG + bytes(192))  # 200 bytes, never inline
+    first, second = PNG + bytes(52), PNG + bytes(53)  # 60 and 61 bytes
+
+    parts = await provider._media_parts(
+        [first, second, small_path, tmp_path.joinpath("missing.png"), large_path]
+    )
+
+    # 60 inline, 61 > remaining 40 -> upload, 30 fits the remaining 40, missing skipped, 200 -> upload
+    assert [p.inline_data is not None for p in parts] == [True, False, True, False]
+    assert parts[0].inline_data.data == first
+    assert parts[2].inline_data.data == small_path.read_bytes()
+    assert parts[2].inline_data.mime_type == "image/png"
+    assert [p.file_data.file_uri for p in (parts[1], parts[3])] == ["files/0", "files/1"]
+    assert uploaded == [second, large_path]
@@ -0,0 +1,20 @@
+import pytest
+
+from hcaptcha_challenger.tools.internal.providers.groq import _normalize_box_2d
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    [
+        (["01"], [0, 1]),
+        (["3", "7"], [3, 7]),
+        (["12", "5"], [1, 2]),  # only the first two values are kept
+        (["4", "56"], [4, 5]),
+        ([2, "9"], [2, 9]),
+        (["123"], [123]),  # not a digit pair: one value
+        (["a", "1"], ["a", 1]),  # left for the schema to reject
+        ([], []),
+    ],
+)
+def test_normalize_box_2d(values, expected):
+    assert _normalize_box_2d(values) == expected
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import dotenv
 from loguru import logger
-from matplotlib import pyplot as plt
+from PIL import Image
 
 from hcaptcha_challenger import SpatialBboxReasoner
 from hcaptcha_challenger.helper import create_coordinate_grid, FloatRect
@@ -22,7 +22,7 @@ async def test_gemini_bbox_reasoning():
     bbox = FloatRect(x=0, y=0, width=501, height=431)
 
     grid_divisions_image = create_coordinate_grid(challenge_screenshot, bbox)
-    plt.imsave(str(grid_divisions_path.resolve()), grid_divisions_image)
+    Image.fromarray(grid_divisions_image).save(str(grid_divisions_path.resolve()), compress_level=1)
 
     results = await sbr(
         challenge_screenshot=challenge_screenshot, grid_divisions=grid_divisions_path
@@ -1,15 +1,17 @@
 import asyncio
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import dotenv
 import pytest
 from loguru import logger
-from matplotlib import pyplot as plt
+from PIL import Image
 
 from hcaptcha_challenger import SpatialPathReasoner
 from hcaptcha_challenger.helper import create_coordinate_grid, FloatRect
 from hcaptcha_challenger.helper.visualize_attention_points import show_answer_points
+from hcaptcha_challenger.models import ImageDragDropChallenge
 
 dotenv.load_dotenv()
 spr = SpatialPathReasoner(gemini_api_key=os.getenv("GEMINI_API_KEY"), model="gemini-3-pro-preview")
@@ -52,7 +54,7 @@ async def test_gemini_path_reasoning(challenge_screenshot: Path):
     bbox = FloatRect(x=0, y=0, width=500, height=430)
 
     grid_divisions_image = create_coordinate_grid(challenge_screenshot, bbox)
-    plt.imsave(str(grid_divisions_path.resolve()), grid_divisions_image)
+    Image.fromarray(grid_divisions_image).save(str(grid_divisions_path.resolve()), compress_level=1)
 
     results = await spr(
         challenge_screenshot=challenge_screenshot, grid_divisions=grid_divisions_path
@@ -71,10 +73,36 @@ async def test_gemini_path_reasoning(challenge_screenshot: Path):
 
     SHOW_ANSWER_DIR.mkdir(parents=True, exist_ok=True)
     save_path = SHOW_ANSWER_DIR.joinpath(challenge_screenshot.name)
-    plt.imsave(str(save_path), result)
+    Image.fromarray(result).save(str(save_path), compress_level=1)
     logger.info(f"Saved answer visualization to {save_path}")
 
 
+def _save_grid(challenge_screenshot: Path, bbox: FloatRect) -> Path:
+    """Render and save the coordinate grid (top-level so a worker process can run it)"""
+    grid_divisions_path = challenge_screenshot.parent.joinpath(
+        f'coordinate_grid_{challenge_screenshot.name}'
+    )
+    grid_divisions_image = create_coordinate_grid(challenge_screenshot, bbox)
+    Image.fromarray(grid_divisions_image).save(str(grid_divisions_path.resolve()), compress_level=1)
+    return grid_divisions_path
+
+
+def _save_answer(challenge_screenshot: Path, results: ImageDragDropChallenge, bbox: FloatRect) -> Path:
+    """Draw and save the answer visualization (top-level so a worker process can run it)"""
+    result = show_answer_points(
+        challenge_screenshot,
+        results,
+        bbox,
+        show_plot=False,
+        path_color='blue',
+        arrow_width=3,
+        alpha=0.7,
+    )
+    save_path = SHOW_ANSWER_DIR.joinpath(challenge_screenshot.name)
+    Image.fromarray(result).save(str(save_path), compress_level=1)
+    return save_path
+
+
 async def test_gemini_path_reasoning_concurrent():
     """Process all challenge screenshots concurrently using asyncio.gather"""
     challenge_screenshots = _collect_image_files()
@@ -82,40 +110,38 @@ async def test_gemini_path_reasoning_concurrent():
     if not challenge_screenshots:
         pytest.skip("No challenge screenshots found")
 
-    # noinspection DuplicatedCode
-    async def process_single_image(challenge_screenshot: Path):
-        """Process a single challenge screenshot"""
-        grid_divisions_path = challenge_screenshot.parent.joinpath(
-            f'coordinate_grid_{challenge_screenshot.name}'
-        )
-        bbox = FloatRect(x=0, y=0, width=500, height=430)
+    bbox = FloatRect(x=0, y=0, width=500, height=430)
+    loop = asyncio.get_running_loop()
+    SHOW_ANSWER_DIR.mkdir(parents=True, exist_ok=True)
 
-        grid_divisions_image = create_coordinate_grid(challenge_screenshot, bbox)
-        plt.imsave(str(grid_divisions_path.resolve()), grid_divisions_image)
+    # Matplotlib rendering is Python-heavy and holds the GIL: worker processes run the
+    # CPU-bound phases in parallel (each with its own pyplot state)
+    workers = min(4, os.cpu_count() or 1, len(challenge_screenshots))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Phase 1: grids
+        logger.info(f"Processing {len(challenge_screenshots)} images concurrently...")
+        grid_paths = await asyncio.gather(
+            *[loop.run_in_executor(pool, _save_grid, img, bbox) for img in challenge_screenshots]
+        )
 
-        results_ = await spr(
-            challenge_screenshot=challenge_screenshot, grid_divisions=grid_divisions_path
+        # Phase 2: the network-bound Gemini calls overlap
+        answers = await asyncio.gather(
+            *[
+                spr(challenge_screenshot=img, grid_divisions=grid)
+                for img, grid in zip(challenge_screenshots, grid_paths)
+            ]
         )
-        logger.debug(f'ToolInvokeMessage for {challenge_screenshot.name}: {results_.log_message}')
-
-        result = show_answer_points(
-            challenge_screenshot,
-            results_,
-            bbox,
-            show_plot=False,
-            path_color='blue',
-            arrow_width=3,
-            alpha=0.7,
+        for challenge_screenshot, results_ in zip(challenge_screenshots, answers):
+            logger.debug(f'ToolInvokeMessage for {challenge_screenshot.name}: {results_.log_message}')
+
+        # Phase 3: answer visualizations
+        await asyncio.gather(
+            *[
+                loop.run_in_executor(pool, _save_answer, img, results_, bbox)
+                for img, results_ in zip(challenge_screenshots, answers)
+            ]
         )
+    logger.info(f"Saved answer visualizations to {SHOW_ANSWER_DIR}")
 
-        SHOW_ANSWER_DIR.mkdir(parents=True, exist_ok=True)
-        save_path = SHOW_ANSWER_DIR.joinpath(challenge_screenshot.name)
-        plt.imsave(str(save_path), result)
-        logger.info(f"Saved answer visualization to {save_path}")
-
-        return challenge_screenshot.name
-
-    # Process all images concurrently
-    logger.info(f"Processing {len(challenge_screenshots)} images concurrently...")
-    results = await asyncio.gather(*[process_single_image(img) for img in challenge_screenshots])
+    results = [img.name for img in challenge_screenshots]
     logger.success(f"Successfully processed {len(results)} images concurrently: {results}")
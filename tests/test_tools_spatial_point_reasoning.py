@@ -5,7 +5,7 @@ from pathlib import Path
 import dotenv
 import pytest
 from loguru import logger
-from matplotlib import pyplot as plt
+from PIL import Image
 
 from hcaptcha_challenger import SpatialPointReasoner
 from hcaptcha_challenger.helper import create_coordinate_grid, FloatRect
@@ -50,7 +50,7 @@ async def test_gemini_point_reasoning(challenge_screenshot: Path):
     bbox = FloatRect(x=0, y=0, width=501, height=431)
 
     grid_divisions_image = create_coordinate_grid(challenge_screenshot, bbox)
-    plt.imsave(str(grid_divisions_path.resolve()), grid_divisions_image)
+    Image.fromarray(grid_divisions_image).save(str(grid_divisions_path.resolve()), compress_level=1)
 
     results = await spr(
         challenge_screenshot=challenge_screenshot, grid_divisions=grid_divisions_path
@@ -69,7 +69,7 @@ async def test_gemini_point_reasoning(challenge_screenshot: Path):
 
     SHOW_ANSWER_DIR.mkdir(parents=True, exist_ok=True)
     save_path = SHOW_ANSWER_DIR.joinpath(challenge_screenshot.name)
-    plt.imsave(str(save_path), result)
+    Image.fromarray(result).save(str(save_path), compress_level=1)
     logger.info(f"Saved answer visualization to {save_path}")
 
 
@@ -89,7 +89,7 @@ async def test_gemini_point_reasoning_concurrent():
         bbox = FloatRect(x=0, y=0, width=501, height=431)
 
         grid_divisions_image = create_coordinate_grid(challenge_screenshot, bbox)
-        plt.imsave(str(grid_divisions_path.resolve()), grid_divisions_image)
+        Image.fromarray(grid_divisions_image).save(str(grid_divisions_path.resolve()), compress_level=1)
 
         results_ = await spr(
             challenge_screenshot=challenge_screenshot, grid_divisions=grid_divisions_path
@@ -108,7 +108,7 @@ async def test_gemini_point_reasoning_concurrent():
 
         SHOW_ANSWER_DIR.mkdir(parents=True, exist_ok=True)
         save_path = SHOW_ANSWER_DIR.joinpath(challenge_screenshot.name)
-        plt.imsave(str(save_path), result)
+        Image.fromarray(result).save(str(save_path), compress_level=1)
         logger.info(f"Saved answer visualization to {save_path}")
 
         return challenge_screenshot.name
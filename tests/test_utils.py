@@ -0,0 +1,41 @@
+import re
+from datetime import datetime
+
+import pytest
+
+from hcaptcha_challenger import utils
+from hcaptcha_challenger.utils import read_json, timestamp_key, write_json
+
+DOCUMENT = {"pass": True, "generated_pass_UUID": "P1_token", "expiration": 120}
+
+
+def test_timestamp_key_matches_datetime_format():
+    before = datetime.now().strftime("%Y%m%d/%Y%m%d%H%M%S%f")
+    key = timestamp_key()
+    after = datetime.now().strftime("%Y%m%d/%Y%m%d%H%M%S%f")
+
+    assert re.fullmatch(r"\d{8}/\d{20}", key)
+    assert key[:8] == key[9:17]
+    assert before <= key <= after
+
+
+def test_write_json_is_plain_json_by_default(tmp_path):
+    path = write_json(tmp_path.joinpath("token.json"), DOCUMENT)
+
+    assert path == tmp_path.joinpath("token.json")
+    assert read_json(path) == DOCUMENT
+
+
+def test_write_json_compressed_round_trip(tmp_path):
+    pytest.importorskip("zstandard")
+    path = write_json(tmp_path.joinpath("token.json"), DOCUMENT, compress=True)
+
+    assert path.name == "token.json.zst"
+    assert not tmp_path.joinpath("token.json").exists()
+    assert read_json(path) == DOCUMENT
+
+
+def test_write_json_compressed_without_zstandard_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "zstandard", None)
+    with pytest.raises(RuntimeError):
+        write_json(tmp_path.joinpath("token.json"), DOCUMENT, compress=True)